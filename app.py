@@ -1,31 +1,367 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
-from zoneinfo import ZoneInfo
-import logging
+from datetime import datetime, timedelta, timezone as dt_timezone, tzinfo
+import dataclasses
+import hashlib
+import json
 import uuid
-import requests
+from urllib.parse import quote, urlsplit
 import os
 import math
+import tempfile
+import atexit
+import threading
+import time
+from functools import lru_cache
+
+from blob_store import BlobRef, BlobStore
+from events import EventBus
+from gazetteer import Gazetteer
+from history_store import record_epoch
+from json_provider import FastJSONProvider
+from logging_config import configure_logging, restart_listener
+import metrics
+from metrics import record_cache, span, timed
+from opening_hours import is_open, parse_periods
+from outbox import Outbox
+from profiling import install_profiling
+import schemas
+from ratelimit import BucketMap, BudgetExceeded, LatencyTracker, parse_limits
+from shared_cache import SharedCache
+from site_map import SiteMap
+from startup import Lazy, phase
+import startup
+from solo_model import SoloModel
+from tenancy import DEFAULT_TENANT, HashRing, TenantRegistry, TenantState, valid_tenant_id
+from textfeatures import content_hash, hamming, simhash
+import tz_lookup
+from tz_lookup import TimezoneIndex
+from wal import WALUnavailable, WriteAheadLog
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})  # adjust/restrict origins as needed
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-app.logger.setLevel(logging.DEBUG)
-app.logger.propagate = True
+# Configure logging (LOG_LEVEL, LOG_SAMPLE_RATE, LOG_MAX_FIELD_CHARS)
+configure_logging(app)
 
 # -------------------------- Environment keys --------------------------- #
 OPENCAGE_API_KEY = os.getenv("OPENCAGE_API_KEY")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") # Only for timezone lookup
+# Provider base URLs; override to point at local stand-ins (see benchmarks/fake_providers.py)
+OPENCAGE_BASE_URL = os.getenv("OPENCAGE_BASE_URL", "https://api.opencagedata.com").rstrip("/")
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+OUTBOUND_TIMEOUT_S = float(os.getenv("OUTBOUND_TIMEOUT_S", "12"))
+SOLO_MODEL_PATH = os.getenv("SOLO_MODEL_PATH", "solo_model.bin")
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "coalesce")  # "coalesce" (200) or "reject" (409)
+NEAR_DUPLICATE_MAX_BITS = int(os.getenv("NEAR_DUPLICATE_MAX_BITS", "10"))
+# /similar-responses only returns responses at least this similar (estimated Jaccard, 0..1)
+SIMILARITY_MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.1"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Cross-worker cache for provider lookups; set SHARED_CACHE_PATH="" to disable
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "backend_shared_cache.sqlite3")
+)
+GEOCODE_CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(30 * 24 * 3600)))
+PLACES_CACHE_TTL_S = float(os.getenv("PLACES_CACHE_TTL_S", str(24 * 3600)))
+# Details keep weekly opening periods (open status is computed per request), so they can live for days
+DETAILS_CACHE_TTL_S = float(os.getenv("DETAILS_CACHE_TTL_S", str(7 * 24 * 3600)))
+WEATHER_CACHE_TTL_S = float(os.getenv("WEATHER_CACHE_TTL_S", "600"))
+# timezone-boundary-builder GeoJSON for offline lat/lng -> timezone (python tz_lookup.py --fetch);
+# without it (or with TZ_BOUNDARIES_PATH="") provider data or UTC is used
+TZ_BOUNDARIES_PATH = os.getenv("TZ_BOUNDARIES_PATH", tz_lookup.DEFAULT_PATH)
+# Local gazetteer consulted before OpenCage; GAZETTEER_PATH="" disables it
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.tsv")
+)
+# Opt-in: name numeric lat/lng sent without 'location' after the gazetteer place within this many km
+GAZETTEER_REVERSE_KM = float(os.getenv("GAZETTEER_REVERSE_KM", "0"))
+# Without boundaries, a site takes the zone all gazetteer places within this many km agree on
+GAZETTEER_TZ_KM = float(os.getenv("GAZETTEER_TZ_KM", "50"))
+# Last resort for open status: the provider's fixed UTC offset ignores DST, so it is only
+# trusted this close to when the details were fetched
+DETAILS_OFFSET_MAX_AGE_S = float(os.getenv("DETAILS_OFFSET_MAX_AGE_S", str(6 * 3600)))
+# Write-ahead log for KCs, activities and history; unset WAL_DIR keeps state in memory only
+WAL_DIR = os.getenv("WAL_DIR", "")
+WAL_GROUP_COMMIT_MS = float(os.getenv("WAL_GROUP_COMMIT_MS", "2"))
+WAL_SNAPSHOT_EVERY = int(os.getenv("WAL_SNAPSHOT_EVERY", "100000"))
+# Set by gunicorn.conf.py with preload_app: the master must not hold the WAL, so the worker opens it
+WAL_OPEN_IN_WORKER = os.getenv("WAL_OPEN_IN_WORKER", "0") == "1"
+# How long a new worker waits for the WAL lock while the worker it replaces shuts down
+WAL_LOCK_TIMEOUT_S = float(os.getenv("WAL_LOCK_TIMEOUT_S", "10"))
+# Long student texts are moved out of history records into a content-addressed pack; BLOB_DIR="" disables.
+# WAL entries reference the pack, so with a WAL it lives next to the log by default (not in /tmp).
+BLOB_DIR = os.getenv(
+    "BLOB_DIR", os.path.join(WAL_DIR, "blobs") if WAL_DIR else os.path.join(tempfile.gettempdir(), "backend_blobs")
+)
+BLOB_INLINE_MAX_BYTES = int(os.getenv("BLOB_INLINE_MAX_BYTES", "1024"))
+# Tenant placement: with TENANT_NODES="a,b,c" and NODE_ID="b", this process only
+# serves tenants the consistent-hash ring assigns to "b" (others get 421).
+TENANT_NODES = [n.strip() for n in os.getenv("TENANT_NODES", "").split(",") if n.strip()]
+NODE_ID = os.getenv("NODE_ID", "")
+# Nearest-site map for Physical KCs (grid of SITE_MAP_CELL_DEG degrees; 0 disables)
+SITE_MAP_CELL_DEG = float(os.getenv("SITE_MAP_CELL_DEG", "0.005"))
+SITE_MAP_TTL_S = float(os.getenv("SITE_MAP_TTL_S", str(DETAILS_CACHE_TTL_S)))
+SITE_MAP_MAX_CELLS = int(os.getenv("SITE_MAP_MAX_CELLS", "50000"))
+SITE_MAP_SWEEP_S = float(os.getenv("SITE_MAP_SWEEP_S", "900"))
+SITE_MAP_FETCH_INTERVAL_S = float(os.getenv("SITE_MAP_FETCH_INTERVAL_S", "0.2"))
+SITE_MAP_RECENT_RECORDS = int(os.getenv("SITE_MAP_RECENT_RECORDS", "500"))
+# /events server-sent events: replay buffer, per-subscriber queue bound and keepalive interval.
+# A stream holds a server thread while open: keep EVENTS_MAX_SUBSCRIBERS (per worker process)
+# below the worker's thread count (gunicorn.conf.py sets it to half the threads).
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "1000"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+EVENTS_HEARTBEAT_S = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+EVENTS_MAX_STREAM_S = float(os.getenv("EVENTS_MAX_STREAM_S", "3600"))
+# Webhooks for approved assessments (outbox): only hosts in WEBHOOK_ALLOWED_HOSTS may be
+# registered; unset, webhooks are off (an open allowlist would let tenants reach internal hosts)
+WEBHOOK_ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()
+}
+WEBHOOK_TIMEOUT_S = float(os.getenv("WEBHOOK_TIMEOUT_S", "5"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_S = float(os.getenv("WEBHOOK_BACKOFF_S", "1"))
+WEBHOOK_BACKOFF_MAX_S = float(os.getenv("WEBHOOK_BACKOFF_MAX_S", "300"))
+WEBHOOK_DEAD_LETTER_MAX = int(os.getenv("WEBHOOK_DEAD_LETTER_MAX", "1000"))
+# Admission control ("endpoint=rate:burst" per second; "" disables a limit):
+# RATE_LIMITS apply per tenant and endpoint, OUTBOUND_BUDGETS per provider for the
+# whole process and OUTBOUND_TENANT_BUDGETS per tenant and provider. Outbound-heavy
+# endpoints are shed with 503 past SHED_MAX_INFLIGHT concurrent requests or while a
+# provider they call averages over SHED_UPSTREAM_LATENCY_S.
+RATE_LIMITS = parse_limits(os.getenv("RATE_LIMITS", "generate_reaction=5:30,store_history=20:100"))
+OUTBOUND_BUDGETS = parse_limits(os.getenv("OUTBOUND_BUDGETS", "google_places=10:50,opencage=5:20"))
+OUTBOUND_TENANT_BUDGETS = parse_limits(os.getenv("OUTBOUND_TENANT_BUDGETS", "google_places=2:20"))
+SHED_MAX_INFLIGHT = int(os.getenv("SHED_MAX_INFLIGHT", "32"))
+SHED_UPSTREAM_LATENCY_S = float(os.getenv("SHED_UPSTREAM_LATENCY_S", str(OUTBOUND_TIMEOUT_S / 2)))
+SHED_COOLDOWN_S = float(os.getenv("SHED_COOLDOWN_S", "5"))
+# Largest number of payloads accepted by one /analyze-response/batch call
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
 
 # --------------------------- In-memory stores -------------------------- #
-kc_store = {}
-activity_store = {}
-student_history = []
+# KCs, activities, history and their indexes are partitioned per tenant (tenancy.TenantState).
+tenants = TenantRegistry()
+_EMPTY_TENANT = TenantState("")  # served to reads for tenants with no data; never written
+tenant_ring = HashRing(TENANT_NODES) if TENANT_NODES else None
+# Provider lookups (geocode, places, weather) hold no tenant data and stay shared.
+shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+blob_store = None
+if BLOB_DIR:
+    try:
+        blob_store = BlobStore(BLOB_DIR)
+    except OSError as e:
+        app.logger.warning("Blob store not opened in %s; texts stay inline: %s", BLOB_DIR, e)
+
+_history_lock = threading.Lock()  # guards state changes and their WAL order
+_idempotency_lock = threading.Lock()  # guards Idempotency-Key reservations
+rate_limits = BucketMap(RATE_LIMITS)
+outbound_budgets = BucketMap(OUTBOUND_BUDGETS)
+outbound_tenant_budgets = BucketMap(OUTBOUND_TENANT_BUDGETS)
+upstream_latency = LatencyTracker(SHED_UPSTREAM_LATENCY_S, SHED_COOLDOWN_S)
+wal = None  # opened and replayed by open_wal() when WAL_DIR is set
+event_bus = EventBus(EVENTS_REPLAY_SIZE, EVENTS_MAX_SUBSCRIBERS)
+outbox = Outbox(
+    batch_size=WEBHOOK_BATCH_SIZE, max_attempts=WEBHOOK_MAX_ATTEMPTS, backoff_s=WEBHOOK_BACKOFF_S,
+    backoff_max_s=WEBHOOK_BACKOFF_MAX_S, dead_letter_max=WEBHOOK_DEAD_LETTER_MAX,
+)
+
+# ------------------- Model and catalogue assets (lazy) ------------------ #
+# Loaded on first use, or by warm_up() before gunicorn forks workers so that
+# every worker shares the parent's copy. .get() returns None if unavailable.
+def _load_solo_model():
+    # Built offline by train_solo.py from approved history; memory-mapped here.
+    if not os.path.exists(SOLO_MODEL_PATH):
+        return None
+    try:
+        model = SoloModel.load(SOLO_MODEL_PATH)
+    except Exception as e:
+        app.logger.warning("SOLO model not loaded from %s: %s", SOLO_MODEL_PATH, e)
+        return None
+    app.logger.info("SOLO model revision %s loaded for %d KCs", model.revision, len(model.kc_ids()))
+    return model
+
+
+def _load_timezone_index():
+    if not TZ_BOUNDARIES_PATH:
+        return None
+    if not os.path.exists(TZ_BOUNDARIES_PATH):
+        app.logger.info(
+            "No timezone boundaries at %s (run `python tz_lookup.py --fetch`); "
+            "coordinates resolve through provider data or UTC", TZ_BOUNDARIES_PATH,
+        )
+        return None
+    try:
+        return TimezoneIndex.load(TZ_BOUNDARIES_PATH)
+    except Exception as e:
+        app.logger.warning("Timezone boundaries not loaded from %s: %s", TZ_BOUNDARIES_PATH, e)
+        return None
+
+
+def _load_gazetteer():
+    if not GAZETTEER_PATH:
+        return None
+    try:
+        return Gazetteer.load(GAZETTEER_PATH)
+    except Exception as e:
+        app.logger.warning("Gazetteer not loaded from %s: %s", GAZETTEER_PATH, e)
+        return None
+
+
+solo_model = Lazy("solo_model", _load_solo_model)
+timezone_index = Lazy("timezone_index", _load_timezone_index)
+gazetteer = Lazy("gazetteer", _load_gazetteer)
+
+# ------------------------- Request instrumentation ------------------------- #
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+# ------------------------------- Tenancy -------------------------------- #
+_TENANTLESS_ENDPOINTS = {"home", "metrics_endpoint", "get_profile", "static"}
+
+
+@app.before_request
+def _resolve_tenant():
+    """Sets g.tenant_id from X-Tenant-ID (or tenant_id in the query/body) and enforces placement."""
+    if request.endpoint in _TENANTLESS_ENDPOINTS:
+        return None
+    tenant_id = request.headers.get("X-Tenant-ID") or request.args.get("tenant_id")
+    if not tenant_id and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and isinstance(body.get("tenant_id"), str):
+            tenant_id = body["tenant_id"]
+    tenant_id = tenant_id or DEFAULT_TENANT
+    if not valid_tenant_id(tenant_id):
+        return jsonify({"error": "tenant_id must be 1-64 letters, digits, '.', '_' or '-'"}), 400
+    g.tenant_id = tenant_id
+    if tenant_ring is not None and NODE_ID:
+        owner = tenant_ring.node_for(tenant_id)
+        if owner != NODE_ID:
+            response = jsonify({"error": "Tenant is served by another node", "tenant_id": tenant_id, "node": owner})
+            response.headers["X-Tenant-Node"] = owner
+            return response, 421
+    return None
+
+
+def _tenant(create: bool = False) -> TenantState:
+    """The request tenant's state; reads of a tenant with no data get an empty state."""
+    tenant_id = g.get("tenant_id", DEFAULT_TENANT)
+    if create:
+        return tenants.get_or_create(tenant_id)
+    return tenants.get(tenant_id) or _EMPTY_TENANT
+
+
+# --------------------------- Admission control --------------------------- #
+# Endpoints that may call paid providers, and the providers they call.
+_OUTBOUND_ENDPOINTS = {
+    "generate_reaction": ("google_places", "openweather"),
+    "store_history": ("opencage",),
+}
+_inflight_lock = threading.Lock()
+_inflight = 0
+
+
+@app.before_request
+def _admit_request():
+    """Fast 429/503 with Retry-After instead of queueing behind slow upstream calls."""
+    endpoint = request.endpoint
+    wait = rate_limits.take(endpoint, g.get("tenant_id", DEFAULT_TENANT))
+    if wait:
+        return _reject(429, "rate_limited", wait, "Rate limit exceeded for this tenant; retry later.")
+    providers = _OUTBOUND_ENDPOINTS.get(endpoint)
+    if providers is None:
+        return None
+    wait = upstream_latency.slow(providers)
+    if wait > 0:
+        return _reject(503, "upstream_slow", wait, "Upstream services are slow; retry later.")
+    global _inflight
+    with _inflight_lock:
+        admitted = not SHED_MAX_INFLIGHT or _inflight < SHED_MAX_INFLIGHT
+        if admitted:
+            _inflight += 1
+    if not admitted:
+        return _reject(503, "overloaded", 1.0, "Server is busy; retry later.")
+    g.admitted = True
+    return None
+
+
+@app.teardown_request
+def _release_request(_exc=None):
+    if g.pop("admitted", False):
+        global _inflight
+        with _inflight_lock:
+            _inflight -= 1
+
+
+def _reject(status: int, reason: str, retry_after: float, message: str):
+    metrics.shed_requests.inc(request.endpoint or "unmatched", reason)
+    retry_after = min(retry_after, 3600.0) if math.isfinite(retry_after) else 3600.0
+    response = jsonify({"error": message, "reason": reason, "retry_after": round(retry_after, 3)})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+@app.errorhandler(BudgetExceeded)
+def _budget_exceeded(e: BudgetExceeded):
+    """A provider budget ran out mid-request: a quota answer (429 tenant, 503 process), not a client error."""
+    if e.tenant is not None:
+        return _reject(429, "tenant_budget_exhausted", e.retry_after,
+                       f"This tenant's {e.provider} lookup budget is spent; retry later.")
+    return _reject(503, "budget_exhausted", e.retry_after, f"The {e.provider} lookup budget is spent; retry later.")
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.http_requests.observe(
+            time.perf_counter() - started, route, request.method, str(response.status_code)
+        )
+    return response
+
+
+metrics.registry.gauge(
+    "backend_store_size", "Entries per in-memory store.",
+    lambda: {
+        ("tenants",): len(tenants),
+        ("kc_store",): sum(len(t.kc_store) for t in tenants.states()),
+        ("activity_store",): sum(len(t.activity_store) for t in tenants.states()),
+        ("student_history",): sum(len(t.student_history) for t in tenants.states()),
+        ("similarity_index",): sum(len(t.similarity_index) for t in tenants.states()),
+        ("idempotency_responses",): sum(len(t.idempotency_responses) for t in tenants.states()),
+        ("shared_cache",): len(shared_cache) if shared_cache else 0,
+        ("blob_store",): len(blob_store) if blob_store else 0,
+        ("site_map",): len(site_map) if site_map else 0,
+        ("event_subscribers",): len(event_bus),
+        ("outbox",): len(outbox),
+    },
+    ("store",),
+)
+metrics.registry.gauge(
+    "backend_startup_seconds", "Time spent in each setup phase of this worker (module load, lazy assets).",
+    lambda: {(name,): seconds for name, seconds in startup.phases().items()},
+    ("phase",),
+)
+metrics.registry.gauge(
+    "backend_outbound_inflight_requests", "Admitted requests on outbound-heavy endpoints.",
+    lambda: {(): _inflight},
+)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition for this worker process."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+# Per-request profiling; registers nothing unless PROFILING_ENABLED is set.
+install_profiling(app)
 
 # ---------------------- Root route — health check ---------------------- #
 @app.route("/", methods=["GET"])
@@ -35,41 +371,17 @@ def home():
 # ---------------------- Learning Design Agent ------------------------- #
 @app.route("/submit_kc", methods=["POST"])
 def submit_kc():
-    data = request.get_json() or {}
-    kc_id = data.get("kc_id")
-
-    app.logger.info(f"/submit_kc payload received: {data}")
-
-    # Require teacher approval before storing
-    if not data.get("approved", False):
-        app.logger.warning("KC not submitted: approval required.")
-        return jsonify({
-            "status": "error",
-            "message": "KC not submitted: approval required."
-        }), 400
-
-    # Require explicit KC ID; do not auto-generate
-    if not kc_id:
-        app.logger.warning("KC not submitted: kc_id is required.")
-        return jsonify({
-            "status": "error",
-            "message": "kc_id is required."
-        }), 400
-
-    aligned_learning_objectives = data.get("aligned_learning_objectives")
-    aligned_competencies = data.get("aligned_competencies")
-
-    if aligned_learning_objectives is None or not isinstance(aligned_learning_objectives, list):
-        return jsonify({
-            "status": "error",
-            "message": "aligned_learning_objectives must be a list."
-        }), 400
-
-    if aligned_competencies is None or not isinstance(aligned_competencies, list):
-        return jsonify({
-            "status": "error",
-            "message": "aligned_competencies must be a list."
-        }), 400
+    data = request.get_json(silent=True)
+    app.logger.debug("/submit_kc payload received", extra={"fields": {"payload": data}})
+
+    # Teacher approval, an explicit KC ID (never auto-generated) and the alignment lists
+    values, errors = schemas.SUBMIT_KC.validate(data)
+    if errors:
+        app.logger.warning("Invalid /submit_kc payload: %s", errors[0]["message"])
+        return _status_error(errors)
+    kc_id = values["kc_id"]
+    aligned_learning_objectives = values["aligned_learning_objectives"]
+    aligned_competencies = values["aligned_competencies"]
 
     stored_kc = {
         "kc_id": kc_id,
@@ -83,9 +395,17 @@ def submit_kc():
         "media_context": data.get("media_context"),
     }
 
-    kc_store[kc_id] = stored_kc
-    app.logger.info(f"KC stored successfully: {kc_id}")
-    app.logger.info(f"Stored KC object: {stored_kc}")
+    with _history_lock:
+        state = _tenant(create=True)
+        lsn = _apply_then_log(
+            state.kc_store, kc_id, lambda: _apply_submit_kc(state, stored_kc),
+            "kc", {"tenant": g.tenant_id, "kc": stored_kc},
+        )
+    if not _wal_wait(lsn):
+        return _not_durable()
+    app.logger.info("KC stored successfully: %s", kc_id, extra={"fields": {"kc_id": kc_id}})
+    _publish_event("kc", stored_kc, kc_ids=(kc_id,))
+    _precompute_sites(_tenant(), stored_kc)
 
     return jsonify({
         "status": "success",
@@ -95,33 +415,42 @@ def submit_kc():
 
 @app.route("/list_kcs", methods=["GET"])
 def list_kcs():
-    return jsonify({"kcs": list(kc_store.values())}), 200
+    if _wants_ndjson():
+        return _ndjson_response(list(_tenant().kc_store.values()))
+    return jsonify({"kcs": list(_tenant().kc_store.values())}), 200
 
 
 @app.route("/submit_activity", methods=["POST"])
 def submit_activity():
-    data = request.get_json() or {}
-    learning_activity_id = data.get("learning_activity_id")
-
-    app.logger.info(f"/submit_activity payload received: {data}")
+    data = request.get_json(silent=True)
+    app.logger.debug("/submit_activity payload received", extra={"fields": {"payload": data}})
 
     # Require explicit learning activity ID; do not auto-generate
-    if not learning_activity_id:
-        app.logger.warning("Learning activity not submitted: learning_activity_id is required.")
-        return jsonify({
-            "status": "error",
-            "message": "learning_activity_id is required."
-        }), 400
+    values, errors = schemas.SUBMIT_ACTIVITY.validate(data)
+    if errors:
+        app.logger.warning("Invalid /submit_activity payload: %s", errors[0]["message"])
+        return _status_error(errors)
+    learning_activity_id = values["learning_activity_id"]
 
     stored_activity = {
         "learning_activity_id": learning_activity_id,
         "learning_activity_title": data.get("learning_activity_title"),
-        "related_kc_ids": data.get("related_kc_ids", []),
+        "related_kc_ids": values["related_kc_ids"],
     }
 
-    activity_store[learning_activity_id] = stored_activity
-    app.logger.info(f"Learning activity stored: {learning_activity_id}")
-    app.logger.info(f"Stored activity object: {stored_activity}")
+    with _history_lock:
+        state = _tenant(create=True)
+        lsn = _apply_then_log(
+            state.activity_store, learning_activity_id, lambda: _apply_submit_activity(state, stored_activity),
+            "activity", {"tenant": g.tenant_id, "activity": stored_activity},
+        )
+    if not _wal_wait(lsn):
+        return _not_durable()
+    app.logger.info(
+        "Learning activity stored: %s", learning_activity_id,
+        extra={"fields": {"learning_activity_id": learning_activity_id}},
+    )
+    _publish_event("activity", stored_activity, kc_ids=stored_activity.get("related_kc_ids") or ())
 
     return jsonify({
         "status": "success",
@@ -132,8 +461,10 @@ def submit_activity():
 
 @app.route("/list_activities", methods=["GET"])
 def list_activities():
+    if _wants_ndjson():
+        return _ndjson_response(list(_tenant().activity_store.values()))
     return jsonify({
-        "activities": list(activity_store.values())
+        "activities": list(_tenant().activity_store.values())
     }), 200
 
 
@@ -144,7 +475,7 @@ def get_kc():
     if not kc_id:
         return jsonify({"error": "kc_id parameter is required"}), 400
 
-    kc_data = kc_store.get(kc_id)
+    kc_data = _tenant().kc_store.get(kc_id)
     if not kc_data:
         return jsonify({"error": f"KC with ID {kc_id} not found"}), 404
 
@@ -167,7 +498,7 @@ def get_activity():
     if not learning_activity_id:
         return jsonify({"error": "learning_activity_id parameter is required"}), 400
 
-    activity_data = activity_store.get(learning_activity_id)
+    activity_data = _tenant().activity_store.get(learning_activity_id)
     if not activity_data:
         return jsonify({"error": f"Learning activity with ID {learning_activity_id} not found"}), 404
 
@@ -183,71 +514,159 @@ def get_student_history():
     student_id = request.args.get("student_id")
     kc_id = request.args.get("kc_id")
     latest = (request.args.get("latest", "") or "").lower() == "true"
+    include_text = (request.args.get("include_text", "true") or "").lower() not in {"false", "0", "no"}
 
     if not student_id:
         return jsonify({"error": "student_id is required"}), 400
 
-    results = [r for r in student_history if r.get("student_id") == student_id]
-    if kc_id:
-        results = [r for r in results if r.get("kc_id") == kc_id]
+    try:
+        since = _parse_time_param(request.args.get("since"))
+        until = _parse_time_param(request.args.get("until"))
+    except ValueError:
+        return jsonify({
+            "error": "since/until must be epoch seconds or ISO 8601 timestamps (UTC if no offset)"
+        }), 400
 
-    results_sorted = sorted(results, key=lambda r: r.get("timestamp") or "", reverse=True)
-    if latest and results_sorted:
-        results_sorted = [results_sorted[0]]
+    with span("history_lookup"):
+        results = _tenant().student_history.for_student(student_id, kc_id, since=since, until=until)
+        results_sorted = results[-1:] if latest else results[::-1]  # newest first
+
+    # HistoryRecord serializes as-is (offloaded texts are read during serialization);
+    # with include_text=false, texts are replaced by their size and digest.
+    project = None if include_text else _history_record_without_text
+    if _wants_ndjson():
+        return _ndjson_response(results_sorted, project)
+
+    if project is not None:
+        results_sorted = [project(record) for record in results_sorted]
+    return jsonify({"records": results_sorted}), 200
+
+
+_TEXT_FIELDS = ("student_response", "student_response_transcription")
+
+
+def _history_record_without_text(record):
+    # A copy of the record rather than a dict, so both forms serialize in the same field order.
+    changes = {}
+    for field in _TEXT_FIELDS:
+        value = getattr(record, field)
+        if isinstance(value, BlobRef):
+            changes[field] = value.describe()
+        elif value:
+            changes[field] = {"sha256": None, "bytes": len(value.encode("utf-8"))}
+    return dataclasses.replace(record, **changes)
+
+
+def _offload_texts(record: dict) -> None:
+    """Moves long student texts to the blob store, leaving a BlobRef in the record."""
+    if blob_store is None:
+        return
+    for field in _TEXT_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str) and len(value) > BLOB_INLINE_MAX_BYTES // 4 \
+                and len(value.encode("utf-8")) > BLOB_INLINE_MAX_BYTES:
+            try:
+                record[field] = blob_store.put(value)
+            except OSError as e:
+                app.logger.warning("Blob write failed; keeping %s inline: %s", field, e)
+
+
+def _parse_time_param(value: str | None) -> float | None:
+    """Epoch seconds from '1767225600' or an ISO 8601 string; raises ValueError."""
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        epoch = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(epoch):
+            raise ValueError(f"{value!r} is not a finite timestamp")
+        return epoch
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_zoneinfo("UTC"))
+    return dt.timestamp()
 
-    response = []
-    for record in results_sorted:
-        response.append({
-            "timestamp": record.get("timestamp"),
-            "timezone": record.get("timezone"),
-            "location": record.get("location"),
-            "lat": record.get("lat"),
-            "lng": record.get("lng"),
-            "kc_id": record.get("kc_id"),
-            "student_id": record.get("student_id"),
-            "learning_activity_id": record.get("learning_activity_id"),
-            "learning_activity_title": record.get("learning_activity_title"),
-            "SOLO_level": record.get("SOLO_level"),
-            "student_response": record.get("student_response"),
-            "student_response_type": record.get("student_response_type"),
-            "student_response_reference": record.get("student_response_reference"),
-            "student_response_transcription": record.get("student_response_transcription"),
-            "justification": record.get("justification"),
-            "misconceptions": record.get("misconceptions"),
-            "target_SOLO_level": record.get("target_SOLO_level"),
-            "location_required": record.get("location_required"),
-        })
 
-    return jsonify({"records": response}), 200
+# ---------------------- NDJSON streaming ------------------------------ #
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def _wants_ndjson() -> bool:
+    """Opt-in with ?format=ndjson or an Accept: application/x-ndjson header."""
+    if (request.args.get("format") or "").lower() == "ndjson":
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def _ndjson_response(items, project=None):
+    """Streams one JSON document per line; each item is serialized only when sent."""
+    def generate():
+        for item in items:
+            yield app.json.dumps(project(item) if project else item) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+# ---------------------- Request validation ---------------------------- #
+def _validation_error(errors: list[dict], **extra):
+    """400 with the first error as "error" (as before) and every error under "errors"."""
+    return jsonify({"error": errors[0]["message"], "errors": errors, **extra}), 400
+
+
+def _status_error(errors: list[dict]):
+    """Same for the Learning Design routes, which answer {"status": "error", "message": ...}."""
+    return jsonify({"status": "error", "message": errors[0]["message"], "errors": errors}), 400
 
 # ---------------------- Analyze Layer Agent --------------------------- #
 @app.route("/analyze-response", methods=["POST"])
 def analyze_response():
-    data = request.get_json() or {}
+    values, errors = schemas.ANALYZE_RESPONSE.validate(request.get_json(silent=True))
+    if errors:
+        return _validation_error(errors)
+    return jsonify(_analyze(values)), 200
 
-    kc_id = data.get("kc_id")
-    student_id = data.get("student_id") 
-    learning_activity_id = data.get("learning_activity_id")
-    learning_activity_title = data.get("learning_activity_title")
 
-    student_response = (data.get("student_response") or "").strip()
-    student_response_type = (data.get("student_response_type") or "text").strip().lower()
-    student_response_reference = data.get("student_response_reference")
-    student_response_transcription = (data.get("student_response_transcription") or "").strip()
+@app.route("/analyze-response/batch", methods=["POST"])
+def analyze_response_batch():
+    """
+    Analyzes {"items": [payload, ...]} in one call. Results are aligned with
+    the items: the analysis, or {"errors": [...]} for an invalid payload.
+    """
+    body = request.get_json(silent=True)
+    items = body.get("items") if isinstance(body, dict) else None
+    if not isinstance(items, list):
+        return jsonify({"error": "items must be a list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 413
+
+    results = [
+        {"errors": errors} if errors else _analyze(values)
+        for values, errors in schemas.ANALYZE_RESPONSE.validate_batch(items)
+    ]
+    return jsonify({"results": results}), 200
 
-    if not kc_id or not student_id:
-        return jsonify({"error": "kc_id and student_id are required"}), 400
 
-    if student_response_type not in {"text", "image", "pdf", "drawing", "notes"}:
-        return jsonify({
-            "error": "student_response_type must be one of: text, image, pdf, drawing, notes"
-        }), 400
+def _analyze(values: dict) -> dict:
+    """Placeholder SOLO classification of one validated /analyze-response payload."""
+    kc_id = values["kc_id"]
+    student_id = values["student_id"]
+    learning_activity_id = values["learning_activity_id"]
+    learning_activity_title = values["learning_activity_title"]
+    student_response = values["student_response"]
+    student_response_type = values["student_response_type"]
+    student_response_reference = values["student_response_reference"]
+    student_response_transcription = values["student_response_transcription"]
 
     # Use text if available; otherwise fall back to transcription
     response_text = (student_response or student_response_transcription).lower().strip()
 
     # The LLM should do the real classification using /get_kc and /get_activity.
-    # Placeholder logic only
+    # A trained per-KC model is used when available; otherwise placeholder logic only
+    model = solo_model.get() if response_text else None
+    prediction = model.predict(kc_id, response_text) if model is not None else None
+
     if not response_text:
         solo_level = "Pre-structural"
         justification = "No readable or transcribed student response was provided."
@@ -258,6 +677,13 @@ def analyze_response():
         solo_level = "Pre-structural"
         justification = "The response explicitly indicates lack of knowledge or recall."
         misconceptions = "No evidence of relevant understanding is shown."
+    elif prediction:
+        solo_level, probability = prediction
+        justification = (
+            f"Classified from previously approved assessments for this KC "
+            f"(model revision {model.revision}, confidence {probability:.2f})."
+        )
+        misconceptions = None
     elif "meaning" in response_text or "symbol" in response_text:
         solo_level = "Relational"
         justification = "The student connects elements to symbolic interpretation."
@@ -275,7 +701,7 @@ def analyze_response():
         justification = "The response is incomplete or off-topic."
         misconceptions = "No clear relevant reasoning is demonstrated."
 
-    return jsonify({
+    return {
         "kc_id": kc_id,
         "student_id": student_id,
         "learning_activity_id": learning_activity_id,
@@ -287,7 +713,44 @@ def analyze_response():
         "justification": justification,
         "misconceptions": misconceptions,
         "approved": False
-    }), 200
+    }
+
+# ---------------------- Similar Responses (POST) ---------------------- #
+@app.route("/similar-responses", methods=["POST"])
+def similar_responses():
+    """
+    Returns the approved responses for the same KC that are most similar
+    to the given student_response / student_response_transcription.
+    """
+    data = request.get_json(silent=True)
+    values, errors = schemas.SIMILAR_RESPONSES.validate(data)
+    text = _response_text(data) if isinstance(data, dict) else ""
+    if not text and isinstance(data, dict):
+        # Reported after kc_id and before k, as it always was
+        at = 1 if errors and errors[0]["field"] == "kc_id" else 0
+        errors.insert(at, {
+            "field": "student_response",
+            "message": "student_response or student_response_transcription is required",
+        })
+    if errors:
+        return _validation_error(errors)
+    kc_id = values["kc_id"]
+    k = max(1, min(values["k"], 50))
+
+    matches = []
+    for score, record in _tenant().similarity_index.query(kc_id, text, k=k, min_score=SIMILARITY_MIN_SCORE):
+        matches.append({
+            "similarity": round(score, 3),
+            "SOLO_level": record.get("SOLO_level"),
+            "justification": record.get("justification"),
+            "misconceptions": record.get("misconceptions"),
+            "learning_activity_id": record.get("learning_activity_id"),
+            "student_response_type": record.get("student_response_type"),
+            "student_response_summary": _summarize_student_response(record),
+            "timestamp": record.get("timestamp"),
+        })
+
+    return jsonify({"kc_id": kc_id, "matches": matches}), 200
 
 # ---------------------- Utilities ------------------------------------ #
 def haversine(lat1, lon1, lat2, lon2):
@@ -300,18 +763,69 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
 
 
+def _outbound_get(provider: str, url: str, params: dict, timeout: float | None = None):
+    """
+    requests.get with per-provider call counts and latency recorded in /metrics.
+    Raises BudgetExceeded without calling out when the provider's budget is spent.
+    """
+    import requests  # imported on first use: it is the slowest import of the app
+
+    tenant_id = None
+    wait = outbound_budgets.take(provider)
+    if not wait and has_request_context():
+        tenant_id = g.get("tenant_id", DEFAULT_TENANT)
+        wait = outbound_tenant_budgets.take(provider, tenant_id)
+    if wait:
+        metrics.outbound_requests.inc(provider, "budget_exhausted")
+        raise BudgetExceeded(provider, wait, tenant_id)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        r = requests.get(url, params=params, timeout=timeout or OUTBOUND_TIMEOUT_S)
+        outcome = str(r.status_code)
+        return r
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.outbound_requests.inc(provider, outcome)
+        metrics.outbound_seconds.observe(elapsed, provider)
+        upstream_latency.record(provider, elapsed)
+
+
+def _shared_cached(cache_name: str, key: str, ttl: float, loader):
+    """Looks `key` up in the cross-worker cache, loading and storing it on a miss."""
+    if shared_cache is None:
+        return loader()
+    return shared_cache.get_or_load(
+        f"{cache_name}:{key}", ttl, loader, on_lookup=lambda hit: record_cache(cache_name, hit)
+    )
+
+
+@timed("get_weather")
 def get_weather(lat, lng):
     """Return (condition, temp_f) or ('unknown', None) if unavailable."""
     if not OPENWEATHER_API_KEY:
         return "unknown", None
+    # ~1 km grid: nearby students share one weather lookup.
+    key = f"{round(float(lat), 2)},{round(float(lng), 2)}"
+    cached = _shared_cached("weather", key, WEATHER_CACHE_TTL_S, lambda: _fetch_weather(lat, lng))
+    if cached is None:
+        return "unknown", None
+    return cached[0], cached[1]
+
+
+def _fetch_weather(lat, lng):
+    """[condition, temp_f] from OpenWeather, or None on any failure."""
     try:
-        url = "https://api.openweathermap.org/data/2.5/weather"
-        response = requests.get(url, params={
+        url = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
+        response = _outbound_get("openweather", url, params={
             "lat": lat,
             "lon": lng,
             "appid": OPENWEATHER_API_KEY,
             "units": "imperial"
-        }, timeout=12)
+        })
         response.raise_for_status()
         data = response.json()
         main = (data.get("weather", [{}])[0].get("main") or "").lower()
@@ -326,9 +840,9 @@ def get_weather(lat, lng):
             condition = "stormy"
         else:
             condition = main or "unknown"
-        return condition, temp
+        return [condition, temp]
     except Exception:
-        return "unknown", None
+        return None
 
 # ---------------------- Location Normalization Helpers ---------------- #
 def _parse_latlng_from_string(s: str):
@@ -341,6 +855,7 @@ def _parse_latlng_from_string(s: str):
     except Exception:
         return None, None
 
+@timed("ensure_coordinates_and_location")
 def _ensure_coordinates_and_location(payload: dict):
     """
     Normalizes incoming location fields and returns:
@@ -348,7 +863,10 @@ def _ensure_coordinates_and_location(payload: dict):
     Priority:
       1) Numeric lat/lng.
       2) If 'location' is 'lat,lng' string → parse.
-      3) If 'location' is free-text → geocode via OpenCage (also get timezone).
+      3) If 'location' is free-text → local gazetteer, else geocode via OpenCage (also get timezone).
+    For 1) and 2) the timezone comes from the offline boundary index. With
+    GAZETTEER_REVERSE_KM set, numeric lat/lng without 'location' are named after
+    the nearest gazetteer place within that distance.
     """
     lat = payload.get("lat")
     lng = payload.get("lng")
@@ -359,7 +877,9 @@ def _ensure_coordinates_and_location(payload: dict):
         if lat is not None and lng is not None:
             flat = float(lat)
             flng = float(lng)
-            return flat, flng, (loc if isinstance(loc, str) else None), None
+            if not isinstance(loc, str) or not loc.strip():
+                loc = _gazetteer_name_near(flat, flng)
+            return flat, flng, loc, _timezone_at(flat, flng)
     except Exception:
         pass
 
@@ -367,46 +887,101 @@ def _ensure_coordinates_and_location(payload: dict):
     if isinstance(loc, str) and "," in loc:
         plat, plng = _parse_latlng_from_string(loc)
         if plat is not None and plng is not None:
-            return plat, plng, loc, None
+            return plat, plng, loc, _timezone_at(plat, plng)
 
     # 3) Geocode free-text
     if isinstance(loc, str) and loc.strip():
-        try:
-            oc_key = OPENCAGE_API_KEY
-            if not oc_key:
-                return None, None, loc, None
-            url = "https://api.opencagedata.com/geocode/v1/json"
-            params = {"q": loc, "key": oc_key, "no_annotations": 0, "limit": 1, "language": "es"}
-            r = requests.get(url, params=params, timeout=12)
-            if r.ok:
-                js = r.json() or {}
-                results = js.get("results", [])
-                if results:
-                    best = results[0]
-                    g = best.get("geometry", {})
-                    plat = float(g.get("lat"))
-                    plng = float(g.get("lng"))
-                    formatted = best.get("formatted", loc)
-                    tz_name = None
-                    ann = best.get("annotations", {})
-                    if "timezone" in ann and "name" in ann["timezone"]:
-                        tz_name = ann["timezone"]["name"]
-                    return plat, plng, formatted, tz_name
-        except Exception:
+        place = _gazetteer_lookup(loc)
+        if place is not None:
+            return place.lat, place.lng, place.formatted, place.timezone or _timezone_at(place.lat, place.lng)
+        if not OPENCAGE_API_KEY:
             return None, None, loc, None
+        key = " ".join(loc.lower().split())
+        geocoded = _shared_cached("geocode", key, GEOCODE_CACHE_TTL_S, lambda: _geocode_opencage(loc))
+        if geocoded:
+            plat, plng, formatted, tz_name = geocoded
+            return plat, plng, formatted, tz_name or _timezone_at(plat, plng)
+        return None, None, loc, None
 
     return None, None, (loc if isinstance(loc, str) else None), None
 
 
-def _now_in_timezone(tz_name: str | None):
-    """
-    Returns (timestamp_iso, tz_name_final). Falls back to UTC if tz_name is missing/invalid.
-    """
+def _gazetteer_lookup(loc: str):
+    places = gazetteer.get()
+    if places is None:
+        return None
+    with span("gazetteer_lookup"):
+        place = places.lookup(loc)
+    record_cache("gazetteer", place is not None)
+    return place
+
+
+def _gazetteer_name_near(lat: float, lng: float) -> str | None:
+    places = gazetteer.get() if GAZETTEER_REVERSE_KM > 0 else None
+    if places is None:
+        return None
+    place = places.nearest(lat, lng, GAZETTEER_REVERSE_KM)
+    return place.formatted if place else None
+
+
+def _gazetteer_timezone_near(lat: float, lng: float) -> str | None:
+    places = gazetteer.get() if GAZETTEER_TZ_KM > 0 else None
+    return places.timezone_near(lat, lng, GAZETTEER_TZ_KM) if places is not None else None
+
+
+def _geocode_opencage(loc: str):
+    """[lat, lng, formatted, tz_name] for a free-text place via OpenCage, or None."""
+    try:
+        url = f"{OPENCAGE_BASE_URL}/geocode/v1/json"
+        params = {"q": loc, "key": OPENCAGE_API_KEY, "no_annotations": 0, "limit": 1, "language": "es"}
+        r = _outbound_get("opencage", url, params=params)
+        if r.ok:
+            js = r.json() or {}
+            results = js.get("results", [])
+            if results:
+                best = results[0]
+                g = best.get("geometry", {})
+                plat = float(g.get("lat"))
+                plng = float(g.get("lng"))
+                formatted = best.get("formatted", loc)
+                tz_name = None
+                ann = best.get("annotations", {})
+                if "timezone" in ann and "name" in ann["timezone"]:
+                    tz_name = ann["timezone"]["name"]
+                return [plat, plng, formatted, tz_name]
+    except BudgetExceeded:
+        raise  # a quota, not an unresolvable location: answered 429/503 with Retry-After
+    except Exception:
+        pass
+    return None
+
+
+def _timezone_at(lat: float, lng: float) -> str | None:
+    """IANA timezone for coordinates from the offline index (no network), or None."""
+    index = timezone_index.get()
+    if index is None:
+        return None
+    with span("timezone_lookup"):
+        return index.timezone_at(lat, lng)
+
+
+@lru_cache(maxsize=512)
+def _zoneinfo(tz_name: str) -> tzinfo | None:
+    from zoneinfo import ZoneInfo
+
     try:
-        tz = ZoneInfo(tz_name) if tz_name else ZoneInfo("UTC")
+        return ZoneInfo(tz_name)
     except Exception:
-        tz = ZoneInfo("UTC")
-    dt = datetime.now(tz)
+        return None
+
+
+def _now_in_timezone(tz_name: str | None, epoch: float | None = None):
+    """
+    Returns (timestamp_iso, tz_name_final) for `epoch` (default: now).
+    Falls back to UTC if tz_name is missing/invalid.
+    """
+    tz = (_zoneinfo(tz_name) if tz_name else None) or _zoneinfo("UTC")
+    dt = datetime.fromtimestamp(time.time() if epoch is None else epoch, tz)
     return dt.strftime("%Y-%m-%dT%H:%M:%S%z"), str(tz)
 
 
@@ -454,17 +1029,35 @@ def _build_site_keywords(kc_title: str, kc_desc: str):
     return " ".join([b for b in base if b]).strip() or "learning material"
 
 def _nearby_rankby_distance(lat: float, lng: float, keyword: str, api_key: str):
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    # ~10 m grid: repeat lookups from the same spot share one upstream call.
+    key = f"{round(float(lat), 4)},{round(float(lng), 4)}:{keyword}"
+    return _shared_cached(
+        "places", key, PLACES_CACHE_TTL_S, lambda: _fetch_nearby_rankby_distance(lat, lng, keyword, api_key)
+    )
+
+def _fetch_nearby_rankby_distance(lat: float, lng: float, keyword: str, api_key: str):
+    url = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/nearbysearch/json"
     params = {
         "location": f"{lat},{lng}",
         "rankby": "distance",
         "keyword": keyword,
         "key": api_key
     }
-    r = requests.get(url, params=params, timeout=12)
+    r = _outbound_get("google_places", url, params=params)
     r.raise_for_status()
-    return (r.json() or {}).get("results", [])
+    results = (r.json() or {}).get("results", [])
+    # Keep only what _google_nearest_place reads, so cached entries stay small.
+    return [
+        {
+            "place_id": p.get("place_id"),
+            "name": p.get("name"),
+            "vicinity": p.get("vicinity"),
+            "geometry": {"location": (p.get("geometry") or {}).get("location", {})},
+        }
+        for p in results
+    ]
 
+@timed("google_nearest_place")
 def _google_nearest_place(lat: float, lng: float, keywords: str, api_key: str, exclude_city: str | None = None):
     """
     Returns the closest relevant place using rank-by-distance.
@@ -510,24 +1103,112 @@ def _google_nearest_place(lat: float, lng: float, keywords: str, api_key: str, e
         "lng": geom.get("lng")
     }
 
+@timed("google_place_details")
 def _google_place_details(place_id: str, api_key: str):
     if not (place_id and api_key):
         return {}
+    return _shared_cached(
+        "details", place_id, DETAILS_CACHE_TTL_S, lambda: _fetch_place_details(place_id, api_key)
+    ) or {}
+
+def _fetch_place_details(place_id: str, api_key: str):
     try:
-        url = "https://maps.googleapis.com/maps/api/place/details/json"
-        fields = "opening_hours,price_level,website,url"
-        r = requests.get(url, params={"place_id": place_id, "fields": fields, "key": api_key}, timeout=12)
+        url = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/details/json"
+        fields = "opening_hours,utc_offset,price_level,website,url"
+        r = _outbound_get("google_places", url, params={"place_id": place_id, "fields": fields, "key": api_key})
         if not r.ok:
-            return {}
+            return None
         res = (r.json() or {}).get("result", {})
         return {
-            "open_now": res.get("opening_hours", {}).get("open_now"),
+            "periods": parse_periods(res.get("opening_hours")),
+            "utc_offset_minutes": res.get("utc_offset_minutes", res.get("utc_offset")),
             "price_level": res.get("price_level"),
             "website": res.get("website"),
             "maps_url": res.get("url"),
+            "fetched_at": time.time(),  # utc_offset_minutes is only valid around this time
         }
     except Exception:
-        return {}
+        return None
+
+
+def _open_status(details: dict, lat: float | None, lng: float | None, epoch: float | None = None) -> str:
+    """
+    'open'/'closed' at `epoch` (default: now) from the stored weekly periods, else 'unknown'.
+    The site's zone is resolved by name (boundaries, then nearby gazetteer places), so
+    cached details stay correct across DST changes; the provider's fixed offset is used
+    only while the details are fresh.
+    """
+    periods = details.get("periods")
+    if not periods:
+        return "unknown"
+    at = time.time() if epoch is None else epoch
+    tz = None
+    if lat is not None and lng is not None:
+        tz_name = _timezone_at(lat, lng) or _gazetteer_timezone_near(lat, lng)
+        tz = _zoneinfo(tz_name) if tz_name else None
+    fetched_at = details.get("fetched_at")
+    if tz is None and details.get("utc_offset_minutes") is not None and fetched_at is not None \
+            and abs(at - fetched_at) <= DETAILS_OFFSET_MAX_AGE_S:
+        tz = dt_timezone(timedelta(minutes=details["utc_offset_minutes"]))
+    if tz is None:
+        return "unknown"
+    local_time = datetime.fromtimestamp(at, tz)
+    return "open" if is_open(periods, local_time) else "closed"
+
+
+def _site_query(kc_meta: dict) -> tuple[str, str | None]:
+    """Nearest-site query of a KC: (search keywords, city to exclude)."""
+    title = (kc_meta.get("title") or "").strip()
+    keywords = _build_site_keywords(title, (kc_meta.get("kc_description") or "").strip())
+    return keywords, (kc_meta.get("kc_city") or "").strip() or None
+
+
+def _fetch_nearest_site(lat: float, lng: float, keywords: str, exclude_city: str | None):
+    """(nearest place, details) from the provider, or None when no site was found."""
+    nearest = _google_nearest_place(lat, lng, keywords, GOOGLE_API_KEY, exclude_city=exclude_city)
+    if not nearest:
+        return None
+    return nearest, _google_place_details(nearest.get("place_id"), GOOGLE_API_KEY)
+
+
+def _nearest_site(kc_meta: dict, lat: float, lng: float):
+    """(nearest place, details) from the site map, falling back to a live lookup on a miss."""
+    query = _site_query(kc_meta)
+    if site_map is not None:
+        cell = site_map.lookup(query, lat, lng)
+        record_cache("site_map", cell is not None)
+        if cell is not None:
+            return cell.site, cell.details
+    found = _fetch_nearest_site(lat, lng, *query)
+    if found is None:
+        return None, {}
+    if site_map is not None:
+        site_map.put(query, lat, lng, *found)
+    return found
+
+
+def _precompute_sites(state: TenantState, kc_meta: dict) -> None:
+    """Queues site-map cells around the tenant's recent student coordinates for a Physical KC."""
+    if site_map is None or _media_context_category(kc_meta.get("media_context")) != "Physical":
+        return
+    coordinates = [
+        (r.lat, r.lng) for r in state.student_history.recent(SITE_MAP_RECENT_RECORDS)
+        if r.lat is not None and r.lng is not None
+    ]
+    queued = site_map.precompute(_site_query(kc_meta), coordinates)
+    app.logger.debug("Queued %d site-map cells for KC %s", queued, kc_meta.get("kc_id"))
+
+
+site_map = None
+if SITE_MAP_CELL_DEG > 0 and GOOGLE_API_KEY:
+    site_map = SiteMap(
+        lambda query, lat, lng: _fetch_nearest_site(lat, lng, *query),
+        cell_deg=SITE_MAP_CELL_DEG,
+        ttl_s=SITE_MAP_TTL_S,
+        max_cells=SITE_MAP_MAX_CELLS,
+        sweep_s=SITE_MAP_SWEEP_S,
+        fetch_interval_s=SITE_MAP_FETCH_INTERVAL_S,
+    )
 
 def _best_heritage_link(resource_name: str, details: dict, kc_title: str, last_location_label: str):
     """
@@ -538,11 +1219,11 @@ def _best_heritage_link(resource_name: str, details: dict, kc_title: str, last_l
         return details["website"]
     if resource_name and last_location_label:
         q = f"{resource_name} {last_location_label}"
-        return f"https://en.wikipedia.org/w/index.php?search={requests.utils.quote(q)}"
+        return f"https://en.wikipedia.org/w/index.php?search={quote(q)}"
     if resource_name:
-        return f"https://en.wikipedia.org/w/index.php?search={requests.utils.quote(resource_name)}"
+        return f"https://en.wikipedia.org/w/index.php?search={quote(resource_name)}"
     q = kc_title or "educational topic"
-    return f"https://en.wikipedia.org/w/index.php?search={requests.utils.quote(q)}"
+    return f"https://en.wikipedia.org/w/index.php?search={quote(q)}"
 
 def _solo_transition_prompt(current_level: str, target_level: str, kc_title: str, language: str = "es"):
     current = (current_level or "").lower()
@@ -583,63 +1264,56 @@ def store_history():
       - Accepts numeric lat/lng, a "lat,lng" string in 'location', or a free-text city/place.
       - If the linked KC media_context suggests drawing/note-taking style work,
         location is not required.
-      - If location is not required, timestamp/timezone/location may remain None.
+      - If location is not required, location may remain None and the timestamp is in UTC.
+      - Every record gets ts_epoch (UTC seconds) at ingest; history is ordered and
+        range-filtered by it.
     """
-    data = request.get_json() or {}
-    app.logger.info(f"/store-history payload: {data}")
-
-    approved = data.get("approved")
-    if not approved:
-        return jsonify({
-            "error": "Teacher approval required before storing analysis",
-            "hint": "Resend with 'approved': true once verified by a teacher."
-        }), 400
-
-    student_id = data.get("student_id")
-    kc_id = data.get("kc_id")
-    learning_activity_id = data.get("learning_activity_id")
-    learning_activity_title = data.get("learning_activity_title")
-    SOLO_level = data.get("SOLO_level")
-
-    if not student_id or not kc_id or not SOLO_level:
-        return jsonify({"error": "student_id, kc_id, and SOLO_level are required"}), 400
-
-    if not learning_activity_id:
-        return jsonify({"error": "learning_activity_id is required"}), 400
-
-    if not learning_activity_title:
-        return jsonify({"error": "learning_activity_title is required"}), 400
-
-    student_response = data.get("student_response")
-    student_response_type = (data.get("student_response_type") or "text").strip().lower()
-    student_response_reference = data.get("student_response_reference")
-    student_response_transcription = data.get("student_response_transcription")
-
-    if student_response_type not in {"text", "image", "pdf", "drawing", "notes"}:
-        return jsonify({
-            "error": "student_response_type must be one of: text, image, pdf, drawing, notes"
-        }), 400
-
-    justification = data.get("justification")
-    misconceptions = data.get("misconceptions")
-    target_SOLO_level = data.get("target_SOLO_level")
-
-    if not target_SOLO_level:
-        return jsonify({"error": "target_SOLO_level is required"}), 400
-    if justification is None:
-        return jsonify({"error": "justification is required"}), 400
-    if misconceptions is None:
-        return jsonify({"error": "misconceptions is required"}), 400
-
-    if not any([student_response, student_response_reference, student_response_transcription]):
-        return jsonify({
-            "error": (
-                "At least one of student_response, student_response_reference, "
-                "or student_response_transcription is required."
-            )
-        }), 400
-
-    kc_meta = kc_store.get(kc_id, {})
+    data = request.get_json(silent=True)
+    app.logger.debug("/store-history payload received", extra={"fields": {"payload": data}})
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if not idempotency_key:
+        return _store_history(data, None)
+    idempotency = (idempotency_key, _request_fingerprint(data))
+    replay = _reserve_idempotency_key(*idempotency)
+    if replay is not None:
+        return replay
+    try:
+        return _store_history(data, idempotency)
+    finally:
+        _release_idempotency_key(idempotency_key)
+
+
+def _store_history(data, idempotency: tuple[str, str] | None):
+    values, errors = schemas.STORE_HISTORY.validate(data)
+    if errors:
+        if errors[0]["field"] == "approved":
+            return _validation_error(errors, hint="Resend with 'approved': true once verified by a teacher.")
+        return _validation_error(errors)
+
+    student_id = values["student_id"]
+    kc_id = values["kc_id"]
+    learning_activity_id = values["learning_activity_id"]
+    learning_activity_title = values["learning_activity_title"]
+    SOLO_level = values["SOLO_level"]
+    student_response = values["student_response"]
+    student_response_type = values["student_response_type"]
+    student_response_reference = values["student_response_reference"]
+    student_response_transcription = values["student_response_transcription"]
+    justification = values["justification"]
+    misconceptions = values["misconceptions"]
+    target_SOLO_level = values["target_SOLO_level"]
+
+    fingerprint_key = (student_id, kc_id, learning_activity_id)
+    exact_hash = content_hash(student_response, student_response_transcription, student_response_reference)
+    near_hash = simhash(_response_text(data))
+
+    # Cheap pre-check so retried submissions skip geocoding entirely.
+    duplicate, _ = _find_duplicate(fingerprint_key, exact_hash, near_hash, SOLO_level)
+    if duplicate is not None:
+        return _duplicate_response(duplicate, idempotency)
+
+    kc_meta = _tenant().kc_store.get(kc_id, {})
     media_context = kc_meta.get("media_context")
     location_required = _location_required_from_media_context(media_context)
 
@@ -647,13 +1321,13 @@ def store_history():
     lng = None
     formatted_loc = data.get("location")
     tz_name_from_geo = None
-    timestamp_iso = None
-    tz_final = None
+    ts_epoch = time.time()
 
     if location_required:
         lat, lng, formatted_loc, tz_name_from_geo = _ensure_coordinates_and_location(data)
-        app.logger.info(
-            f"Normalized -> lat={lat}, lng={lng}, formatted='{formatted_loc}', tz='{tz_name_from_geo}'"
+        app.logger.debug(
+            "Normalized location",
+            extra={"fields": {"lat": lat, "lng": lng, "location": formatted_loc, "tz": tz_name_from_geo}},
         )
 
         if lat is None or lng is None:
@@ -665,10 +1339,11 @@ def store_history():
                 )
             }), 400
 
-        timestamp_iso, tz_final = _now_in_timezone(tz_name_from_geo)
+    timestamp_iso, tz_final = _now_in_timezone(tz_name_from_geo, ts_epoch)
 
     record = {
         "timestamp": timestamp_iso,
+        "ts_epoch": ts_epoch,
         "location": formatted_loc,
         "kc_id": kc_id,
         "student_id": student_id,
@@ -687,30 +1362,143 @@ def store_history():
         "timezone": tz_final,
         "approved": True,
         "location_required": location_required,
+        "near_duplicate": False,
     }
 
-    student_history.append(record)
+    state = _tenant(create=True)
+    signature = state.similarity_index.signature(_response_text(record))
+    _offload_texts(record)
+
+    with _history_lock:
+        duplicate, near_duplicate = _find_duplicate(fingerprint_key, exact_hash, near_hash, SOLO_level)
+        if duplicate is not None:
+            return _duplicate_response(duplicate, idempotency)
+        record["near_duplicate"] = near_duplicate
+        # Outbox: the event's sequence number is logged with the record it announces.
+        outbox_seq = outbox.allocate() if outbox.has_webhooks(state.tenant_id) else None
+        lsn = _wal_append("history", {
+            "tenant": state.tenant_id, "record": _wal_record(record), "fp": [exact_hash, near_hash],
+            "sig": list(signature), "outbox": outbox_seq,
+        })
+        record = _apply_store_history(state, record, exact_hash, near_hash)
+        if outbox_seq is not None:
+            _enqueue_outbox(outbox_seq, state.tenant_id, record, lsn)
+
+    state.similarity_index.add(kc_id, None, record, signature=signature)
+    if not _wal_wait(lsn):
+        return _not_durable()
+    if outbox_seq is not None:
+        outbox.notify()
+    _maybe_snapshot()
+    _publish_event("history", record, kc_ids=(record.kc_id,), student_id=record.student_id)
+
+    body = {"status": "ok", "stored": _stored_summary(record)}
+    _remember_idempotent_response(idempotency, body, 200)
+    return jsonify(body), 200
+
+
+def _stored_summary(record: dict) -> dict:
+    return {
+        "student_id": record.get("student_id"),
+        "kc_id": record.get("kc_id"),
+        "learning_activity_id": record.get("learning_activity_id"),
+        "learning_activity_title": record.get("learning_activity_title"),
+        "SOLO_level": record.get("SOLO_level"),
+        "approved": True,
+        "timestamp": record.get("timestamp"),
+        "ts_epoch": record.get("ts_epoch"),
+        "timezone": record.get("timezone"),
+        "location": record.get("location"),
+        "lat": record.get("lat"),
+        "lng": record.get("lng"),
+        "student_response_type": record.get("student_response_type"),
+        "student_response_reference": record.get("student_response_reference"),
+        "student_response_transcription": record.get("student_response_transcription"),
+        "location_required": record.get("location_required"),
+        "near_duplicate": record.get("near_duplicate", False),
+    }
+
+
+def _find_duplicate(key: tuple, exact_hash: str, near_hash: int, SOLO_level: str):
+    """
+    Returns (existing_record | None, is_near_duplicate) for a new submission.
+    An exact duplicate is the same normalized content with the same SOLO_level;
+    a near duplicate is a SimHash within NEAR_DUPLICATE_MAX_BITS of an earlier one.
+    """
+    near = False
+    for prev_hash, prev_simhash, prev_record in _tenant().submission_fingerprints.get(key, ()):
+        if prev_hash == exact_hash and prev_record.get("SOLO_level") == SOLO_level:
+            return prev_record, False
+        if near_hash and prev_simhash and hamming(near_hash, prev_simhash) <= NEAR_DUPLICATE_MAX_BITS:
+            near = True
+    return None, near
+
+
+def _duplicate_response(existing: dict, idempotency: tuple[str, str] | None):
+    app.logger.info(
+        "Duplicate submission for student_id=%s, kc_id=%s", existing.get("student_id"), existing.get("kc_id"),
+        extra={"fields": {"policy": DUPLICATE_POLICY}},
+    )
+    if DUPLICATE_POLICY == "reject":
+        body, status = {
+            "error": "Duplicate submission: identical response already stored for this student, KC and activity.",
+            "stored": _stored_summary(existing),
+        }, 409
+    else:
+        body, status = {"status": "duplicate", "stored": _stored_summary(existing)}, 200
+    _remember_idempotent_response(idempotency, body, status)
+    return jsonify(body), status
 
-    return jsonify({
-        "status": "ok",
-        "stored": {
-            "student_id": student_id,
-            "kc_id": kc_id,
-            "learning_activity_id": learning_activity_id,
-            "learning_activity_title": learning_activity_title,
-            "SOLO_level": SOLO_level,
-            "approved": True,
-            "timestamp": timestamp_iso,
-            "timezone": tz_final,
-            "location": formatted_loc,
-            "lat": lat,
-            "lng": lng,
-            "student_response_type": student_response_type,
-            "student_response_reference": student_response_reference,
-            "student_response_transcription": student_response_transcription,
-            "location_required": location_required,
-        }
-    }), 200
+
+def _request_fingerprint(data) -> str:
+    """Hash of the request body, independent of key order and whitespace."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _reserve_idempotency_key(idempotency_key: str, fingerprint: str):
+    """
+    None once the key is reserved for this request; otherwise the response to
+    send: the stored one for a retry, 422 if the key was used with a different
+    body, 409 while the first request with the key is still running.
+    """
+    idempotency_responses = _tenant(create=True).idempotency_responses
+    with _idempotency_lock:
+        entry = idempotency_responses.get(idempotency_key)
+        if entry is None:
+            idempotency_responses[idempotency_key] = (fingerprint, None, None)  # in flight
+    record_cache("idempotency", entry is not None)
+    if entry is None:
+        return None
+    stored_fingerprint, body, status = entry
+    if stored_fingerprint != fingerprint:
+        return jsonify({"error": "Idempotency-Key was already used with a different request body."}), 422
+    if body is None:
+        response = jsonify({"error": "A request with this Idempotency-Key is still in progress."})
+        response.headers["Retry-After"] = "1"
+        return response, 409
+    return jsonify(body), status
+
+
+def _release_idempotency_key(idempotency_key: str) -> None:
+    """Drops the reservation of a request that ended without a response to remember (e.g. 400, 503)."""
+    idempotency_responses = _tenant(create=True).idempotency_responses
+    with _idempotency_lock:
+        entry = idempotency_responses.get(idempotency_key)
+        if entry is not None and entry[1] is None:
+            del idempotency_responses[idempotency_key]
+
+
+def _remember_idempotent_response(idempotency: tuple[str, str] | None, body: dict, status: int) -> None:
+    if idempotency is None:
+        return
+    idempotency_key, fingerprint = idempotency
+    idempotency_responses = _tenant(create=True).idempotency_responses
+    with _idempotency_lock:
+        idempotency_responses[idempotency_key] = (fingerprint, body, status)
+        idempotency_responses.move_to_end(idempotency_key)
+        while len(idempotency_responses) > IDEMPOTENCY_CACHE_SIZE:
+            idempotency_responses.popitem(last=False)
 
 # ---------------------- React Agent Helpers -------------------------- #
 
@@ -744,6 +1532,14 @@ def _summarize_student_response(record: dict, max_len: int = 220) -> str:
     return text[: max_len - 3].rstrip() + "..."
 
 
+def _response_text(record: dict) -> str:
+    """Student response and transcription combined, as used for similarity lookups."""
+    return " ".join(
+        t for t in (record.get("student_response"), record.get("student_response_transcription"))
+        if isinstance(t, str) and t.strip()
+    )
+
+
 def _infer_language_from_record(record: dict) -> str:
     text = (
         (record.get("student_response") or "")
@@ -852,7 +1648,7 @@ def _scaffolded_response(current_level: str, target_level: str, kc_title: str, k
 
 
 def _educator_summary_for_activity(records: list[dict], current_record: dict, lang: str = "es") -> str:
-    sorted_records = sorted(records, key=lambda r: r.get("timestamp") or "")
+    sorted_records = sorted(records, key=record_epoch)
     current_level = current_record.get("SOLO_level") or "Pre-structural"
 
     if len(sorted_records) <= 1:
@@ -1195,14 +1991,14 @@ def generate_reaction():
       - Returns pedagogical reaction fields plus contextual task details.
       - Avoids guessed or empty links.
     """
-    data = request.get_json() or {}
-    kc_id = data.get("kc_id")
-    student_id = data.get("student_id")
-
-    if not kc_id or not student_id:
-        return jsonify({"error": "kc_id and student_id are required"}), 400
-
-    kc_meta = kc_store.get(kc_id)
+    values, errors = schemas.GENERATE_REACTION.validate(request.get_json(silent=True))
+    if errors:
+        return _validation_error(errors)
+    kc_id = values["kc_id"]
+    student_id = values["student_id"]
+
+    state = _tenant()
+    kc_meta = state.kc_store.get(kc_id)
     if not kc_meta:
         return jsonify({"error": f"KC with ID {kc_id} not found"}), 404
 
@@ -1216,21 +2012,17 @@ def generate_reaction():
     aligned_competencies = kc_meta.get("aligned_competencies", [])
 
     # Student history scoped to this KC
-    kc_history = [
-        r for r in student_history
-        if r.get("student_id") == student_id and r.get("kc_id") == kc_id
-    ]
-    if not kc_history:
+    with span("history_lookup"):
+        latest_record = state.student_history.latest(student_id, kc_id)
+    if latest_record is None:
         return jsonify({
             "error": f"No student historical data found for student_id={student_id} and kc_id={kc_id}"
         }), 404
 
-    latest_record = sorted(kc_history, key=lambda r: r.get("timestamp") or "", reverse=True)[0]
-
     learning_activity_id = latest_record.get("learning_activity_id") or related_learning_activity_id
     learning_activity_title = latest_record.get("learning_activity_title")
     if not learning_activity_title and learning_activity_id:
-        activity_data = activity_store.get(learning_activity_id, {})
+        activity_data = state.activity_store.get(learning_activity_id, {})
         learning_activity_title = activity_data.get("learning_activity_title")
 
     current_SOLO = latest_record.get("SOLO_level") or "Pre-structural"
@@ -1239,15 +2031,13 @@ def generate_reaction():
     student_response_summary = _summarize_student_response(latest_record)
 
     # History for same learning activity only (for trajectory claims)
-    same_activity_history = [
-        r for r in student_history
-        if r.get("student_id") == student_id
-        and r.get("learning_activity_id") == learning_activity_id
-    ]
+    with span("history_lookup"):
+        same_activity_history = state.student_history.for_student_activity(student_id, learning_activity_id)
 
-    reflective_prompt = _reflective_prompt(current_SOLO, target_SOLO, kc_title, lang)
-    scaffolded_response = _scaffolded_response(current_SOLO, target_SOLO, kc_title, kc_desc, lang)
-    educator_summary = _educator_summary_for_activity(same_activity_history, latest_record, lang)
+    with span("templating"):
+        reflective_prompt = _reflective_prompt(current_SOLO, target_SOLO, kc_title, lang)
+        scaffolded_response = _scaffolded_response(current_SOLO, target_SOLO, kc_title, kc_desc, lang)
+        educator_summary = _educator_summary_for_activity(same_activity_history, latest_record, lang)
 
     category = _media_context_category(media_context)
     contextual_basis = _contextual_basis(media_context, category, lang)
@@ -1271,7 +2061,6 @@ def generate_reaction():
                 )
             }), 400
 
-        kc_city = (kc_meta.get("kc_city") or "").strip()
         place_url = None
         open_status = "unknown"
         fee_status = "unknown"
@@ -1281,23 +2070,14 @@ def generate_reaction():
         distance_m = None
 
         try:
-            keywords = _build_site_keywords(kc_title, kc_desc)
-            nearest = _google_nearest_place(
-                lat,
-                lng,
-                keywords,
-                GOOGLE_API_KEY,
-                exclude_city=kc_city or None
-            )
+            nearest, details = _nearest_site(kc_meta, lat, lng)
             if nearest:
                 site_lat = nearest.get("lat")
                 site_lon = nearest.get("lng")
                 resource_name = nearest.get("name", "Unknown")
                 site_address = nearest.get("address", "Unknown")
 
-                details = _google_place_details(nearest.get("place_id"), GOOGLE_API_KEY)
-                if isinstance(details.get("open_now"), bool):
-                    open_status = "open" if details["open_now"] else "closed"
+                open_status = _open_status(details, site_lat, site_lon)
                 if details.get("price_level") == 0:
                     fee_status = "free"
 
@@ -1307,7 +2087,7 @@ def generate_reaction():
                 if site_lat is not None and site_lon is not None:
                     distance_m = int(haversine(lat, lng, site_lat, site_lon))
         except Exception as e:
-            app.logger.warning(f"React places/context error: {e}")
+            app.logger.warning("React places/context error: %s", e)
 
         if distance_m is not None and distance_m <= 1000:
             condition, temp_f = get_weather(lat, lng)
@@ -1349,7 +2129,7 @@ def generate_reaction():
     if not contextual_task.get("link"):
         contextual_task["link"] = None
 
-    return jsonify({
+    reaction = {
         "kc_id": kc_id,
         "student_id": student_id,
         "learning_activity_id": learning_activity_id,
@@ -1368,7 +2148,449 @@ def generate_reaction():
         "nearest_place": nearest_place,
         "weather": weather,
         "contextual_task": contextual_task
-    }), 200
+    }
+    _publish_event("reaction", reaction, kc_ids=(kc_id,), student_id=student_id)
+    return jsonify(reaction), 200
+
+# ---------------------- Webhooks (outbox) ---------------------------- #
+@app.route("/webhooks", methods=["GET", "POST", "DELETE"])
+def webhooks():
+    """
+    GET lists the tenant's webhooks; POST {"url"} registers one (it receives
+    approved assessments stored from now on); DELETE ?webhook_id= removes one.
+    """
+    if request.method == "GET":
+        return jsonify({"webhooks": [hook.describe() for hook in outbox.webhooks(g.tenant_id)]}), 200
+
+    if request.method == "DELETE":
+        hook = outbox.webhook(request.args.get("webhook_id") or "")
+        if hook is None or hook.tenant != g.tenant_id:
+            return jsonify({"error": "Webhook not found"}), 404
+        with _history_lock:
+            lsn = _wal_append("webhook_delete", {"webhook_id": hook.id})
+            _apply_outbox("webhook_delete", {"webhook_id": hook.id})
+        if not _wal_wait(lsn):
+            return _not_durable()
+        return jsonify({"status": "success", "webhook_id": hook.id}), 200
+
+    if not WEBHOOK_ALLOWED_HOSTS:
+        return jsonify({"error": "Webhooks are disabled on this server (WEBHOOK_ALLOWED_HOSTS is not set)."}), 403
+    values, errors = schemas.WEBHOOK.validate(request.get_json(silent=True))
+    if errors:
+        return _validation_error(errors)
+    url = values["url"]
+    if not _webhook_url_allowed(url):
+        return jsonify({
+            "error": "url must be an http(s) URL on an allowed host",
+            "allowed_hosts": sorted(WEBHOOK_ALLOWED_HOSTS),
+        }), 400
+    with _history_lock:
+        entry = {"webhook_id": str(uuid.uuid4()), "tenant": g.tenant_id, "url": url, "cursor": outbox.last_seq}
+        lsn = _wal_append("webhook", entry)
+        _apply_outbox("webhook", entry)
+    if not _wal_wait(lsn):
+        return _not_durable()
+    _start_outbox()
+    return jsonify({"status": "success", "webhook": outbox.webhook(entry["webhook_id"]).describe()}), 200
+
+
+@app.route("/webhooks/dead-letters", methods=["GET"])
+def webhook_dead_letters():
+    """Batches that exhausted their retries, oldest first."""
+    hook = outbox.webhook(request.args.get("webhook_id") or "")
+    if hook is None or hook.tenant != g.tenant_id:
+        return jsonify({"error": "Webhook not found"}), 404
+    return jsonify({"webhook_id": hook.id, "dead_letters": list(hook.dead_letters)}), 200
+
+
+def _webhook_url_allowed(url: str) -> bool:
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in WEBHOOK_ALLOWED_HOSTS
+
+
+def _outbox_event(seq: int, tenant: str, record) -> dict:
+    return {
+        "event_id": seq,
+        "type": "assessment.approved",
+        "tenant_id": tenant,
+        "assessment": _stored_summary(record),
+    }
+
+
+def _enqueue_outbox(seq: int, tenant: str, record, lsn: int | None = None) -> None:
+    outbox.add(seq, tenant, record.get("student_id"), _outbox_event(seq, tenant, record), lsn)
+
+
+def _send_webhook(hook, events) -> None:
+    """POSTs one batch; raises unless the endpoint answers 2xx."""
+    import requests
+
+    body = app.json.dumps({"webhook_id": hook.id, "events": [event.data for event in events]})
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        r = requests.post(
+            hook.url, data=body, headers={"Content-Type": "application/json"},
+            timeout=WEBHOOK_TIMEOUT_S, allow_redirects=False,
+        )
+        outcome = str(r.status_code)
+        if not 200 <= r.status_code < 300:
+            raise RuntimeError(f"webhook answered {r.status_code}")
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.outbound_requests.inc("webhook", outcome)
+        metrics.outbound_seconds.observe(time.perf_counter() - start, "webhook")
+
+
+def _commit_outbox(op: str, data: dict) -> None:
+    """Logs and applies a dispatcher state change (acks are not waited on: redelivery is allowed)."""
+    with _history_lock:
+        _wal_append(op, data)
+        _apply_outbox(op, data)
+
+
+def _start_outbox() -> None:
+    outbox.start(
+        _send_webhook, _commit_outbox, lambda: wal.durable_lsn if wal is not None else math.inf
+    )
+
+# ---------------------- Event stream (SSE) ---------------------------- #
+EVENT_TYPES = frozenset({"history", "kc", "activity", "reaction"})
+
+
+def _publish_event(event_type: str, data, kc_ids=(), student_id: str | None = None) -> None:
+    """Publishes a committed change to the tenant's /events subscribers (serialized once)."""
+    event_bus.publish(g.tenant_id, event_type, app.json.dumps(data), kc_ids=kc_ids, student_id=student_id)
+
+
+@app.route("/events", methods=["GET"])
+def events_stream():
+    """
+    Server-sent events for the tenant (tenant_id may be a query parameter,
+    since EventSource cannot set headers). Optional filters: types (comma-
+    separated history,kc,activity,reaction), kc_id, student_id.
+    Reconnects resume from Last-Event-ID; a `reset` event means events were
+    missed and the client should refetch through the regular endpoints.
+    """
+    types = {t.strip() for t in (request.args.get("types") or "").split(",") if t.strip()}
+    if types - EVENT_TYPES:
+        return jsonify({"error": f"types must be among {', '.join(sorted(EVENT_TYPES))}"}), 400
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID must be an integer event id"}), 400
+
+    subscription, missed = event_bus.subscribe(
+        g.tenant_id, last_event_id, types=types, kc_id=request.args.get("kc_id") or None,
+        student_id=request.args.get("student_id") or None, queue_size=EVENTS_QUEUE_SIZE,
+    )
+    if subscription is None:
+        return _reject(503, "too_many_streams", EVENTS_HEARTBEAT_S, "Too many event streams; retry later.")
+
+    def stream():
+        try:
+            yield f"retry: {int(EVENTS_HEARTBEAT_S * 1000)}\n\n"
+            if missed is None:
+                yield _reset_event("replay_unavailable")
+            else:
+                for event in missed:
+                    yield event.encode()
+            deadline = time.monotonic() + EVENTS_MAX_STREAM_S
+            while time.monotonic() < deadline:
+                event = subscription.next(EVENTS_HEARTBEAT_S)
+                if event is not None:
+                    yield event.encode()
+                elif subscription.overflowed:
+                    # Too slow to keep up: close rather than buffer without bound.
+                    yield _reset_event("overflow")
+                    return
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx: do not buffer the stream
+    })
+
+
+def _reset_event(reason: str) -> str:
+    return f"id: {event_bus.last_id}\nevent: reset\ndata: {app.json.dumps({'reason': reason})}\n\n"
+
+# ---------------------- Durability (write-ahead log) ---------------------- #
+# Each state change goes through an _apply_* function, both live and on replay.
+# Live: _wal_append and _apply_* run under _history_lock (log order = apply order),
+# and the request waits for the group commit after releasing the lock.
+# Replay skips (and logs) an entry it cannot apply rather than refusing to start.
+# Every entry carries its tenant id; replay rebuilds each tenant's partition.
+def _apply_submit_kc(state: TenantState, stored_kc: dict) -> None:
+    state.kc_store[stored_kc["kc_id"]] = stored_kc
+
+
+def _apply_submit_activity(state: TenantState, stored_activity: dict) -> None:
+    state.activity_store[stored_activity["learning_activity_id"]] = stored_activity
+
+
+def _apply_store_history(state: TenantState, record: dict, exact_hash: str, near_hash: int):
+    record = state.student_history.append(record)
+    key = (record.student_id, record.kc_id, record.learning_activity_id)
+    state.submission_fingerprints.setdefault(key, []).append((exact_hash, near_hash, record))
+    return record
+
+
+def _wal_append(op: str, data) -> int | None:
+    """Logs a change before it is applied; raises WALUnavailable (-> 503) once the log has failed."""
+    if wal is None:
+        return None
+    try:
+        return wal.append(op, data)
+    except WALUnavailable as e:
+        app.logger.error("WAL append failed for %s: %s", op, e)
+        raise
+
+
+_MISSING = object()
+
+
+def _apply_then_log(store: dict, key, apply, op: str, data) -> int | None:
+    """
+    Applies a keyed upsert, then logs it, so an entry that cannot be applied
+    never reaches the log. If the log refuses the entry, the previous value
+    is restored before WALUnavailable propagates.
+    """
+    previous = store.get(key, _MISSING)
+    apply()
+    try:
+        return _wal_append(op, data)
+    except WALUnavailable:
+        if previous is _MISSING:
+            store.pop(key, None)
+        else:
+            store[key] = previous
+        raise
+
+
+def _wal_error(message: str):
+    if request.endpoint in ("submit_kc", "submit_activity"):
+        return jsonify({"status": "error", "message": message}), 503
+    return jsonify({"error": message}), 503
+
+
+@app.errorhandler(WALUnavailable)
+def _wal_unavailable(_e):
+    # The append was refused: nothing was applied (or it was rolled back) under the same lock.
+    return _wal_error("Change could not be persisted; retry later.")
+
+
+def _not_durable():
+    # The commit failed or timed out after the change was applied: it is already
+    # visible (stores, similarity index, outbox) but may not survive a restart.
+    return _wal_error(
+        "Change was applied but could not be made durable; it may be lost on restart. Retry later."
+    )
+
+
+def _wal_wait(lsn: int | None) -> bool:
+    """Waits for the group commit; False if the entry could not be made durable."""
+    if lsn is None:
+        return True
+    try:
+        wal.wait(lsn, timeout=OUTBOUND_TIMEOUT_S)
+        return True
+    except OSError as e:
+        app.logger.error("WAL commit failed for lsn %d: %s", lsn, e)
+        return False
+
+
+def _wal_record(record) -> dict:
+    """Record fields as JSON-ready data; offloaded texts are stored as blob references."""
+    out = record.to_dict() if hasattr(record, "to_dict") else dict(record)
+    for field in _TEXT_FIELDS:
+        value = out.get(field)
+        if isinstance(value, BlobRef):
+            out[field] = {"$blob": value.digest.hex(), "bytes": value.size}
+    return out
+
+
+def _record_from_wal(data: dict) -> dict:
+    for field in _TEXT_FIELDS:
+        value = data.get(field)
+        if isinstance(value, dict) and "$blob" in value:
+            if blob_store is None:
+                raise RuntimeError("WAL references offloaded texts but BLOB_DIR is disabled")
+            data[field] = BlobRef(blob_store, bytes.fromhex(value["$blob"]), value["bytes"])
+    return data
+
+
+def _apply_outbox(op: str, data: dict) -> None:
+    if op == "webhook":
+        outbox.register(data["webhook_id"], data["tenant"], data["url"], data["cursor"])
+    elif op == "webhook_delete":
+        outbox.remove(data["webhook_id"])
+    elif op == "webhook_ack":
+        outbox.ack(data["webhook_id"], data["through"])
+    elif op == "dead_letter":
+        outbox.dead_letter(data["webhook_id"], data["through"], data["events"], data["error"], data["failed_at"])
+    elif op == "outbox":
+        outbox.add(data["seq"], data["tenant"], data["student_id"], data["event"])
+
+
+_OUTBOX_OPS = {"webhook", "webhook_delete", "webhook_ack", "dead_letter", "outbox"}
+
+
+def _replay_entry(op: str, data) -> None:
+    try:
+        _replay_one(op, data)
+    except Exception:
+        app.logger.exception("Skipping WAL entry %r that could not be applied", op)
+
+
+def _replay_one(op: str, data) -> None:
+    if op in _OUTBOX_OPS:
+        _apply_outbox(op, data)
+        return
+    state = tenants.get_or_create(data.get("tenant") or DEFAULT_TENANT)
+    if op == "kc":
+        _apply_submit_kc(state, data["kc"])
+    elif op == "activity":
+        _apply_submit_activity(state, data["activity"])
+    elif op == "history":
+        record = _apply_store_history(state, _record_from_wal(data["record"]), *data["fp"])
+        # MinHash signatures are logged with the record; hashing the text again dominates replay time.
+        signature = data.get("sig")
+        if signature:
+            state.similarity_index.add(record.kc_id, None, record, signature=tuple(signature))
+        elif signature is None:
+            state.similarity_index.add(record.kc_id, _response_text(record), record)
+        if data.get("outbox") is not None:
+            _enqueue_outbox(data["outbox"], state.tenant_id, record)
+    else:
+        app.logger.warning("Skipping unknown WAL entry %r", op)
+
+
+_snapshot_running = threading.Event()
+
+
+def _maybe_snapshot() -> None:
+    if wal is None or wal.entries_since_snapshot < WAL_SNAPSHOT_EVERY or _snapshot_running.is_set():
+        return
+    _snapshot_running.set()
+    threading.Thread(target=_write_snapshot, name="wal-snapshot", daemon=True).start()
+
+
+def _write_snapshot() -> None:
+    """Captures state under the lock (references only) and writes it outside the lock."""
+    try:
+        with _history_lock:
+            lsn = wal.last_lsn
+            captured = [
+                (
+                    state.tenant_id,
+                    list(state.kc_store.values()),
+                    list(state.activity_store.values()),
+                    [fp for entries in state.submission_fingerprints.values() for fp in entries],
+                    state.similarity_index,
+                )
+                for state in tenants.states()
+            ]
+            hooks, outbox_events = outbox.capture()
+
+        def entries():
+            # Webhooks first: replaying an outbox event keeps it only if its tenant has a webhook.
+            for webhook_id, tenant_id, url, cursor, dead_letters in hooks:
+                yield "webhook", {"webhook_id": webhook_id, "tenant": tenant_id, "url": url, "cursor": cursor}
+                for dead in dead_letters:
+                    yield "dead_letter", dict(dead, webhook_id=webhook_id, through=cursor)
+            for event in outbox_events:
+                yield "outbox", {
+                    "seq": event.seq, "tenant": event.tenant, "student_id": event.student_id, "event": event.data,
+                }
+            for tenant_id, kcs, activities, fingerprints, index in captured:
+                signatures = {id(record): sig for _, sig, record in index.entries()}
+                fingerprints.sort(key=lambda fp: fp[2].ts_epoch)
+                for kc in kcs:
+                    yield "kc", {"tenant": tenant_id, "kc": kc}
+                for activity in activities:
+                    yield "activity", {"tenant": tenant_id, "activity": activity}
+                for exact_hash, near_hash, record in fingerprints:
+                    yield "history", {
+                        "tenant": tenant_id, "record": _wal_record(record), "fp": [exact_hash, near_hash],
+                        "sig": list(signatures.get(id(record), ())) or None,
+                    }
+
+        started = time.perf_counter()
+        path = wal.write_snapshot(lsn, entries())
+        app.logger.info(
+            "WAL snapshot at lsn %d written in %.2fs", lsn, time.perf_counter() - started,
+            extra={"fields": {"path": path, "tenants": len(captured),
+                              "records": sum(len(c[3]) for c in captured)}},
+        )
+    except Exception:
+        app.logger.exception("WAL snapshot failed")
+    finally:
+        _snapshot_running.clear()
+
+
+def open_wal() -> None:
+    """Takes the WAL lock and replays the log into this process's state."""
+    global wal
+    wal = WriteAheadLog(
+        WAL_DIR,
+        group_commit_s=WAL_GROUP_COMMIT_MS / 1000.0,
+        before_sync=blob_store.sync if blob_store is not None else None,
+        lock_timeout_s=WAL_LOCK_TIMEOUT_S,
+    )
+    started = time.perf_counter()
+    with phase("wal_replay"):
+        replayed = wal.replay(_replay_entry)
+    app.logger.info("Replayed %d WAL entries from %s in %.2fs", replayed, WAL_DIR, time.perf_counter() - started)
+    atexit.register(wal.close)
+    if outbox.capture()[0]:
+        _start_outbox()  # deliver what was pending before the restart
+
+
+if WAL_DIR and not WAL_OPEN_IN_WORKER:
+    open_wal()
+
+# ---------------------- Worker lifecycle (gunicorn) ---------------------- #
+# With preload_app (gunicorn.conf.py) this module is imported once in the master:
+# warm_up() loads the lazy assets there, so forked workers share those pages,
+# and the master's background threads are stopped before fork and started
+# again in each worker. The WAL is only opened in the worker (WAL_OPEN_IN_WORKER),
+# so the master never holds its lock, replayed state or outbox dispatcher.
+def warm_up() -> None:
+    """Loads everything a first request would otherwise load."""
+    with phase("warm_up"):
+        import requests  # noqa: F401  (imported lazily by _outbound_get)
+
+        solo_model.get()
+        timezone_index.get()
+        gazetteer.get()
+        _zoneinfo("UTC")
+
+
+def before_fork() -> None:
+    outbox.close()
+
+
+def after_fork() -> None:
+    """Restarts the background threads in a new worker (threads do not survive fork)."""
+    restart_listener()
+    if blob_store is not None:
+        blob_store.reopen()
+    if WAL_DIR and wal is None:
+        open_wal()
+    elif outbox.capture()[0]:
+        _start_outbox()
+    # The WAL flusher and the site map worker restart themselves on first use.
 
 # if __name__ == "__main__":
 #     app.run(debug=True)
\ No newline at end of file
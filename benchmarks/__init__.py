@@ -0,0 +1 @@
+"""Benchmarks for the backend. Run modules from the repository root, e.g. `python -m benchmarks.bench_json`."""
@@ -0,0 +1,42 @@
+"""
+Runs the whole benchmark suite, each script in its own process.
+
+  python -m benchmarks                       # quick pass
+  python -m benchmarks --full --output bench_results.jsonl
+
+--full uses history sizes up to 10^6 and a longer load test.
+"""
+import argparse
+import subprocess
+import sys
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run all backend benchmarks.")
+    parser.add_argument("--full", action="store_true", help="10^3..10^6 records and a 60 s load test")
+    parser.add_argument("--output", help="append JSON lines to this file")
+    args = parser.parse_args(argv)
+
+    out = ["--output", args.output] if args.output else []
+    if args.full:
+        runs = [
+            ["benchmarks.bench_json", "--min-time", "1"],
+            ["benchmarks.bench_micro", "--sizes", "1000", "10000", "100000", "1000000", "--min-time", "1"],
+            ["benchmarks.bench_load", "--records", "100000", "--clients", "16", "--duration", "60"],
+        ]
+    else:
+        runs = [
+            ["benchmarks.bench_json", "--min-time", "0.2"],
+            ["benchmarks.bench_micro", "--sizes", "1000", "10000", "--min-time", "0.2"],
+            ["benchmarks.bench_load", "--records", "5000", "--clients", "4", "--duration", "5"],
+        ]
+
+    status = 0
+    for module, *module_args in runs:
+        result = subprocess.run([sys.executable, "-m", module, *module_args, *out])
+        status = status or result.returncode
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Compares the stdlib and orjson JSON backends on realistic payloads:
+a /generate-reaction response and /get-student-history pages with long,
+accented student responses.
+
+Prints one JSON result per line:
+  {"bench": "json", "payload": ..., "backend": ..., "op": "dumps"|"loads", "ops_per_s": ..., "us_per_op": ...}
+"""
+import argparse
+import json
+import os
+import sys
+
+from flask import Flask
+
+from benchmarks.common import emit, environment, measure, open_output
+from json_provider import FastJSONProvider, orjson
+
+_ESSAY = (
+    "La vidriera roja filtra la luz y crea un ambiente de recogimiento; el color simboliza "
+    "el sacrificio y la ventana conecta el espacio interior con el exterior. Además, la "
+    "composición relaciona las figuras con la narración bíblica. "
+)
+
+
+def _reaction_payload() -> dict:
+    return {
+        "kc_id": "KC-VIDRIERAS-01",
+        "student_id": "stu-000123",
+        "learning_activity_id": "LA-07",
+        "learning_activity_title": "Vidrieras góticas",
+        "student_response_type": "text",
+        "student_response_summary": _ESSAY[:217] + "...",
+        "timestamp": "2026-03-21T10:15:00+0100",
+        "timezone": "Europe/Madrid",
+        "location": "Calle Mayor, Madrid, España",
+        "current_SOLO_level": "Multi-structural",
+        "target_SOLO_level": "Relational",
+        "reflective_prompt": "Ya mencionas algunos elementos de las vidrieras, pero todavía aparecen separados. " * 2,
+        "scaffolded_response": "Una respuesta más sólida debería integrar varias ideas en una explicación coherente. " * 3,
+        "educator_summary": "En esta actividad se observa una progresión global desde Uni-structural hasta Multi-structural. " * 2,
+        "contextual_basis": {"media_context": "visita al museo", "rationale": "Se propone esta reacción porque... " * 4},
+        "nearest_place": {"name": "Museo del Prado", "address": "C. de Ruiz de Alarcón, 23", "url": "https://www.museodelprado.es",
+                          "distance_m": 640, "open_status": "open", "fee_status": "free"},
+        "weather": {"condition": "sunny", "temperature_f": 71.2},
+        "contextual_task": {"task_type": "Indoor", "task_title": "Actividad interior en Museo del Prado",
+                            "task_description": "Entra en el museo y registra dos elementos relacionados... " * 3,
+                            "link": "https://www.museodelprado.es", "feasibility_notes": "Se propone una actividad interior... " * 3},
+    }
+
+
+def _history_payload(n_records: int) -> dict:
+    records = []
+    for i in range(n_records):
+        records.append({
+            "timestamp": f"2026-03-{1 + i % 28:02d}T10:{i % 60:02d}:00+0100",
+            "timezone": "Europe/Madrid",
+            "location": "Madrid, España",
+            "lat": 40.4168 + i * 1e-5,
+            "lng": -3.7038 - i * 1e-5,
+            "kc_id": f"KC-{i % 12}",
+            "student_id": "stu-000123",
+            "learning_activity_id": f"LA-{i % 5}",
+            "learning_activity_title": "Vidrieras góticas",
+            "SOLO_level": "Multi-structural",
+            "student_response": _ESSAY * (1 + i % 8),
+            "student_response_type": "text",
+            "student_response_reference": None,
+            "student_response_transcription": None,
+            "justification": "The student mentions several relevant aspects, but without integrating them.",
+            "misconceptions": "Relationships between the identified aspects are not explained.",
+            "target_SOLO_level": "Relational",
+            "location_required": True,
+            "near_duplicate": False,
+        })
+    return {"records": records}
+
+
+def _provider(backend: str) -> FastJSONProvider:
+    os.environ["JSON_BACKEND"] = backend
+    return FastJSONProvider(Flask(__name__))
+
+
+def run(min_time: float = 0.5) -> list[dict]:
+    payloads = {
+        "generate_reaction": _reaction_payload(),
+        "history_100": _history_payload(100),
+        "history_1000": _history_payload(1000),
+    }
+    backends = ["stdlib"] + (["orjson"] if orjson is not None else [])
+    results = []
+    for name, payload in payloads.items():
+        encoded = json.dumps(payload)
+        for backend in backends:
+            provider = _provider(backend)
+            for op, fn in (
+                ("dumps", lambda: provider.dumps(payload, separators=(",", ":"))),
+                ("loads", lambda: provider.loads(encoded)),
+            ):
+                results.append({
+                    "bench": "json",
+                    "payload": name,
+                    "payload_bytes": len(encoded.encode("utf-8")),
+                    "backend": backend,
+                    "op": op,
+                    **measure(fn, min_time),
+                    **environment(),
+                })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per measurement")
+    parser.add_argument("--output", help="append JSON lines to this file")
+    args = parser.parse_args(argv)
+    out = open_output(args.output)
+    for result in run(args.min_time):
+        emit(result, out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+End-to-end load harness.
+
+Starts the fake providers and the Flask app (threaded werkzeug server) in this
+process, preloads synthetic data and drives a weighted mix of routes from
+concurrent client threads for a fixed duration.
+
+  python -m benchmarks.bench_load --records 100000 --clients 16 --duration 20 --output bench.jsonl
+  python -m benchmarks.bench_load --latency all=lognormal:80:0.6 --error-rate google_places=0.05
+
+Provider fault options are the same as for benchmarks.fake_providers.
+
+Emits one JSON line per route plus a "total" line with throughput, error count
+and latency percentiles (ms).
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks.common import emit, environment, open_output, percentile
+from benchmarks.datagen import make_response
+from benchmarks.fake_providers import FakeProviders, add_fault_arguments, profiles_from_args
+
+ROUTE_WEIGHTS = {
+    "store-history": 2,
+    "generate-reaction": 3,
+    "get-student-history": 3,
+    "analyze-response": 2,
+    "list_kcs": 1,
+}
+
+
+def _configure_backend_env(base_url: str) -> None:
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for key in ("OPENCAGE_API_KEY", "OPENWEATHER_API_KEY", "GOOGLE_API_KEY"):
+        os.environ.setdefault(key, "bench-key")
+    for key in ("OPENCAGE_BASE_URL", "OPENWEATHER_BASE_URL", "GOOGLE_MAPS_BASE_URL"):
+        os.environ[key] = base_url
+    # All simulated clients share one tenant; limits stay off unless set explicitly.
+    for key in ("RATE_LIMITS", "OUTBOUND_BUDGETS", "OUTBOUND_TENANT_BUDGETS"):
+        os.environ.setdefault(key, "")
+
+
+def _start_app(backend_app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, backend_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="bench-app", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _make_request(rng: random.Random, route: str, pairs: list, kcs: list) -> tuple[str, str, dict | None, dict | None]:
+    """Returns (method, path, params, json_body) for one request of `route`."""
+    student_id, kc_id, activity = rng.choice(pairs)
+    if route == "store-history":
+        body = {
+            "approved": True,
+            "student_id": student_id,
+            "kc_id": rng.choice(kcs)["kc_id"],
+            "learning_activity_id": activity["learning_activity_id"],
+            "learning_activity_title": activity["learning_activity_title"],
+            "SOLO_level": "Multi-structural",
+            "target_SOLO_level": "Relational",
+            "justification": "Mentions several aspects.",
+            "misconceptions": "Relations not explained.",
+            "student_response": make_response(rng),
+        }
+        if rng.random() < 0.5:
+            body.update(lat=40.4168 + rng.uniform(-0.05, 0.05), lng=-3.7038 + rng.uniform(-0.05, 0.05))
+        else:
+            body["location"] = f"Colegio {rng.randrange(500)}, Madrid"
+        return "POST", "/store-history", None, body
+    if route == "generate-reaction":
+        return "POST", "/generate-reaction", None, {"student_id": student_id, "kc_id": kc_id}
+    if route == "get-student-history":
+        return "GET", "/get-student-history", {"student_id": student_id}, None
+    if route == "analyze-response":
+        return "POST", "/analyze-response", None, {
+            "student_id": student_id, "kc_id": kc_id, "student_response": make_response(rng)}
+    return "GET", "/list_kcs", None, None
+
+
+def run(records: int, clients: int, duration: float, seed: int = 5, profiles: dict | None = None) -> list[dict]:
+    with FakeProviders(profiles=profiles) as fake:
+        _configure_backend_env(fake.base_url)
+        import app as backend
+        from benchmarks.datagen import populate
+        from tenancy import DEFAULT_TENANT
+
+        kcs, activities = populate(backend, records)
+        activity_by_id = {a["learning_activity_id"]: a for a in activities}
+        history = backend.tenants.get(DEFAULT_TENANT).student_history
+        sample = [r for i, r in enumerate(history) if i % max(1, records // 2000) == 0]
+        pairs = [(r["student_id"], r["kc_id"], activity_by_id[r["learning_activity_id"]]) for r in sample]
+
+        server, base_url = _start_app(backend.app)
+        routes = list(ROUTE_WEIGHTS)
+        weights = [ROUTE_WEIGHTS[r] for r in routes]
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client(n: int):
+            rng = random.Random(seed * 1000 + n)
+            session = requests.Session()
+            local = defaultdict(list)
+            local_errors = defaultdict(int)
+            while time.perf_counter() < deadline:
+                route = rng.choices(routes, weights)[0]
+                method, path, params, body = _make_request(rng, route, pairs, kcs)
+                start = time.perf_counter()
+                try:
+                    r = session.request(method, base_url + path, params=params, json=body, timeout=30)
+                    if r.status_code >= 500:
+                        local_errors[route] += 1
+                except requests.RequestException:
+                    local_errors[route] += 1
+                local[route].append(time.perf_counter() - start)
+            with lock:
+                for route, values in local.items():
+                    latencies[route].extend(values)
+                for route, n_err in local_errors.items():
+                    errors[route] += n_err
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        provider_calls = dict(fake.calls)
+        provider_faults = {f"{p}.{kind}": n for (p, kind), n in fake.faults.items()}
+
+    env = environment()
+    results = []
+    all_values = []
+    for route in routes + ["total"]:
+        if route == "total":
+            values, n_err = sorted(all_values), sum(errors.values())
+        else:
+            values, n_err = sorted(latencies[route]), errors[route]
+            all_values.extend(values)
+        results.append({
+            "bench": "load",
+            "route": route,
+            "records": records,
+            "clients": clients,
+            "duration_s": round(elapsed, 2),
+            "requests": len(values),
+            "errors": n_err,
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2) if values else None,
+            "p90_ms": round(percentile(values, 0.90) * 1000, 2) if values else None,
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2) if values else None,
+            **({"provider_calls": provider_calls, "provider_faults": provider_faults} if route == "total" else {}),
+            **env,
+        })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test with stubbed providers.")
+    parser.add_argument("--records", type=int, default=10_000, help="preloaded history records")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--output", help="append JSON lines to this file")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+    out = open_output(args.output)
+    profiles = profiles_from_args(args.latency, args.error_rate, args.timeout_rate, args.hang)
+    for result in run(args.records, args.clients, args.duration, profiles=profiles):
+        emit(result, out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
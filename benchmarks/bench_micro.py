@@ -0,0 +1,78 @@
+"""
+Microbenchmarks for request handling helpers and history lookups.
+
+  python -m benchmarks.bench_micro                  # history sizes 10^3..10^5
+  python -m benchmarks.bench_micro --sizes 1000 1000000 --output bench.jsonl
+
+Each result is one JSON line: {"bench": "micro", "name": ..., "size": ..., "ops_per_s": ..., "us_per_op": ...}.
+"""
+import argparse
+import os
+import random
+import sys
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import app as backend  # noqa: E402
+
+from benchmarks.common import emit, environment, measure, open_output  # noqa: E402
+from benchmarks.datagen import MEDIA_CONTEXTS, make_response, populate  # noqa: E402
+
+
+def _analyze(payload: dict):
+    with backend.app.test_request_context("/analyze-response", method="POST", json=payload):
+        return backend.analyze_response()
+
+
+def function_benches(min_time: float):
+    rng = random.Random(3)
+    essay = make_response(rng, 400, 400)
+    record = {"student_response": make_response(rng), "justification": "La respuesta relaciona ideas."}
+
+    yield "analyze_response.blank", lambda: _analyze({"kc_id": "KC-1", "student_id": "s"})
+    yield "analyze_response.keyword", lambda: _analyze(
+        {"kc_id": "KC-1", "student_id": "s", "student_response": "the red window and the light"})
+    yield "analyze_response.essay", lambda: _analyze(
+        {"kc_id": "KC-1", "student_id": "s", "student_response": essay})
+    yield "media_context_category", lambda: [backend._media_context_category(mc) for mc in MEDIA_CONTEXTS]
+    yield "infer_language_from_record", lambda: backend._infer_language_from_record(record)
+    yield "haversine", lambda: backend.haversine(40.4168, -3.7038, 41.3874, 2.1686)
+
+
+def history_benches(size: int):
+    tenant_id = f"bench-{size}"  # a fresh partition per size
+    kcs, _ = populate(backend, size, tenant_id=tenant_id)
+    history = backend.tenants.get(tenant_id).student_history
+    records = list(history)
+    student_id = records[len(records) // 2]["student_id"]
+    kc_id = records[len(records) // 2]["kc_id"]
+
+    yield "history.linear_scan_student", lambda: [r for r in records if r.get("student_id") == student_id]
+    yield "history.for_student", lambda: history.for_student(student_id)
+    yield "history.for_student_kc", lambda: history.for_student(student_id, kc_id)
+    yield "history.latest_for_student_kc", lambda: history.latest(student_id, kc_id)
+    epochs = sorted(r["ts_epoch"] for r in records)
+    since, until = epochs[len(epochs) // 2], epochs[len(epochs) // 2 + len(epochs) // 12]
+    yield "history.student_window", lambda: history.for_student(student_id, since=since, until=until)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backend microbenchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="history sizes for the lookup benchmarks")
+    parser.add_argument("--min-time", type=float, default=0.3)
+    parser.add_argument("--output", help="append JSON lines to this file")
+    args = parser.parse_args(argv)
+    out = open_output(args.output)
+    env = environment()
+
+    for name, fn in function_benches(args.min_time):
+        emit({"bench": "micro", "name": name, "size": None, **measure(fn, args.min_time), **env}, out)
+    for size in args.sizes:
+        for name, fn in history_benches(size):
+            emit({"bench": "micro", "name": name, "size": size, **measure(fn, args.min_time), **env}, out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Shared measurement and reporting helpers for the benchmark scripts."""
+import json
+import platform
+import sys
+import time
+
+
+def measure(fn, min_time: float = 0.5, max_iterations: int = 1_000_000) -> dict:
+    """Calls `fn` repeatedly for at least `min_time` seconds; returns rate and per-call time."""
+    fn()  # warm-up
+    n = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or n >= max_iterations:
+            return {
+                "iterations": n,
+                "ops_per_s": round(n / elapsed, 1),
+                "us_per_op": round(elapsed / n * 1e6, 3),
+            }
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine()}
+
+
+def emit(result: dict, out=None) -> None:
+    """Writes one result as a JSON line to stdout (and to `out`, if given)."""
+    line = json.dumps(result, ensure_ascii=False)
+    print(line)
+    if out is not None:
+        out.write(line + "\n")
+        out.flush()
+
+
+def open_output(path: str | None):
+    if not path:
+        return None
+    return sys.stdout if path == "-" else open(path, "a", encoding="utf-8")
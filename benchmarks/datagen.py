@@ -0,0 +1,128 @@
+"""
+Deterministic synthetic KCs, learning activities and history records.
+
+`python -m benchmarks.datagen --records 100000 > history.jsonl` writes history
+as JSONL (the input format of train_solo.py). The benchmarks use the
+generators directly.
+"""
+import argparse
+import json
+import random
+import sys
+
+from tenancy import DEFAULT_TENANT
+
+SOLO_LEVELS = ["Pre-structural", "Uni-structural", "Multi-structural", "Relational", "Extended abstract"]
+MEDIA_CONTEXTS = [
+    "drawing in the classroom", "taking notes", "reading the textbook", "annotating a poem",
+    "museum visit", "fieldwork in the local environment", "visita a la biblioteca", "online video",
+]
+RESPONSE_TYPES = ["text", "text", "text", "image", "pdf", "drawing", "notes"]
+CITIES = [
+    ("Madrid", 40.4168, -3.7038, "Europe/Madrid"),
+    ("Barcelona", 41.3874, 2.1686, "Europe/Madrid"),
+    ("Sevilla", 37.3891, -5.9845, "Europe/Madrid"),
+    ("Valencia", 39.4699, -0.3763, "Europe/Madrid"),
+    ("Ciudad de México", 19.4326, -99.1332, "America/Mexico_City"),
+    ("Bogotá", 4.7110, -74.0721, "America/Bogota"),
+]
+_WORDS_ES = ("la luz de la vidriera que el color rojo explica porque relaciona una ventana "
+             "simbolo significado nave gotica arco texto lectura dibujo apuntes").split()
+_WORDS_EN = ("the light of the window that red color explains because it relates a stained "
+             "glass symbol meaning nave gothic arch reading drawing notes").split()
+
+
+def make_kcs(n: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "kc_id": f"KC-{i:05d}",
+        "title": f"Knowledge component {i}",
+        "kc_description": "Relates light, colour and symbolism in gothic stained glass.",
+        "target_SOLO_level": rng.choice(SOLO_LEVELS[2:]),
+        "related_learning_activity_id": f"LA-{i % max(1, n // 4):05d}",
+        "aligned_learning_objectives": ["LO1", "LO2"],
+        "aligned_competencies": ["C1"],
+        "SOLO_level_mastery_examples": None,
+        "media_context": rng.choice(MEDIA_CONTEXTS),
+    } for i in range(n)]
+
+
+def make_activities(n: int, kcs: list[dict], seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "learning_activity_id": f"LA-{i:05d}",
+        "learning_activity_title": f"Learning activity {i}",
+        "related_kc_ids": [k["kc_id"] for k in rng.sample(kcs, min(3, len(kcs)))],
+    } for i in range(n)]
+
+
+def make_response(rng: random.Random, min_words: int = 5, max_words: int = 120) -> str:
+    words = _WORDS_ES if rng.random() < 0.6 else _WORDS_EN
+    return " ".join(rng.choice(words) for _ in range(rng.randint(min_words, max_words)))
+
+
+def make_history(n: int, kcs: list[dict], activities: list[dict], n_students: int | None = None, seed: int = 13):
+    """Yields `n` approved history records shaped like those built by /store-history."""
+    rng = random.Random(seed)
+    n_students = n_students or max(1, n // 50)
+    for i in range(n):
+        kc = kcs[rng.randrange(len(kcs))]
+        activity = activities[rng.randrange(len(activities))]
+        city, lat, lng, tz = CITIES[rng.randrange(len(CITIES))]
+        response_type = rng.choice(RESPONSE_TYPES)
+        text = make_response(rng)
+        yield {
+            "timestamp": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00+0000",
+            "location": city,
+            "kc_id": kc["kc_id"],
+            "student_id": f"stu-{rng.randrange(n_students):06d}",
+            "learning_activity_id": activity["learning_activity_id"],
+            "learning_activity_title": activity["learning_activity_title"],
+            "SOLO_level": rng.choice(SOLO_LEVELS),
+            "student_response": text if response_type == "text" else None,
+            "student_response_type": response_type,
+            "student_response_reference": None if response_type == "text" else f"s3://uploads/{i}.bin",
+            "student_response_transcription": None if response_type == "text" else text,
+            "justification": "The student mentions several relevant aspects.",
+            "misconceptions": "Relationships between aspects are not explained.",
+            "target_SOLO_level": kc["target_SOLO_level"],
+            "lat": lat + rng.uniform(-0.01, 0.01),
+            "lng": lng + rng.uniform(-0.01, 0.01),
+            "timezone": tz,
+            "approved": True,
+            "location_required": True,
+            "near_duplicate": False,
+        }
+
+
+def populate(app_module, n_records: int, n_kcs: int = 50, n_activities: int = 20, n_students: int | None = None,
+             tenant_id: str = DEFAULT_TENANT):
+    """Loads synthetic data straight into one tenant's stores; returns (kcs, activities)."""
+    kcs = make_kcs(n_kcs)
+    activities = make_activities(n_activities, kcs)
+    state = app_module.tenants.get_or_create(tenant_id)
+    for kc in kcs:
+        state.kc_store[kc["kc_id"]] = kc
+    for activity in activities:
+        state.activity_store[activity["learning_activity_id"]] = activity
+    for record in make_history(n_records, kcs, activities, n_students):
+        state.student_history.append(record)
+    return kcs, activities
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write synthetic history records as JSONL.")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--kcs", type=int, default=50)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--students", type=int)
+    args = parser.parse_args(argv)
+    kcs = make_kcs(args.kcs)
+    activities = make_activities(args.activities, kcs)
+    for record in make_history(args.records, kcs, activities, args.students):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
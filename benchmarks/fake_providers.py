@@ -0,0 +1,291 @@
+"""
+Local stand-ins for the OpenCage, OpenWeather and Google Places endpoints the
+backend calls. Responses are deterministic and shaped like the real APIs for
+the fields the backend reads.
+
+Point the backend at them with OPENCAGE_BASE_URL, OPENWEATHER_BASE_URL and
+GOOGLE_MAPS_BASE_URL (all three can use the same server).
+
+Each provider (opencage, openweather, google_places) can get a fault profile:
+a latency distribution, an error rate (HTTP 500/503/429) and a timeout rate
+(the request hangs for `hang_s` seconds, longer than the backend's timeout).
+
+Latency specs:
+  fixed:MS                  constant delay
+  uniform:LOW_MS:HIGH_MS    uniform delay
+  lognormal:MEDIAN_MS:SIGMA heavy-ish tail, the usual shape of API latency
+  pareto:SCALE_MS:ALPHA     very heavy tail
+
+Standalone:
+  python -m benchmarks.fake_providers --port 8099 \
+      --latency google_places=lognormal:120:0.7 --error-rate google_places=0.02 \
+      --timeout-rate opencage=0.01
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _unit(value: str) -> float:
+    """Deterministic float in [0, 1) derived from a string."""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little") / 2 ** 64
+
+
+def _offset(lat: float, lng: float, meters: float, bearing: float) -> tuple[float, float]:
+    dlat = meters * math.cos(bearing) / 111_320
+    dlng = meters * math.sin(bearing) / (111_320 * max(0.01, math.cos(math.radians(lat))))
+    return lat + dlat, lng + dlng
+
+
+def geocode(params: dict) -> dict:
+    q = params.get("q", "")
+    u = _unit(q)
+    return {"results": [{
+        "geometry": {"lat": 36.0 + 8 * u, "lng": -9.0 + 12 * _unit(q + "#lng")},
+        "formatted": f"{q}, España",
+        "annotations": {"timezone": {"name": "Europe/Madrid"}},
+    }]} if q else {"results": []}
+
+
+def weather(params: dict) -> dict:
+    key = f"{params.get('lat')},{params.get('lon')}"
+    mains = ["Clear", "Clouds", "Rain", "Thunderstorm"]
+    return {
+        "weather": [{"main": mains[int(_unit(key) * len(mains))]}],
+        "main": {"temp": round(50 + 50 * _unit(key + "#t"), 1)},
+    }
+
+
+def nearby(params: dict) -> dict:
+    lat, lng = (float(x) for x in params.get("location", "0,0").split(","))
+    keyword = params.get("keyword", "")
+    results = []
+    for i in range(5):
+        meters = 150 + 400 * i + 300 * _unit(f"{keyword}#{i}")
+        plat, plng = _offset(lat, lng, meters, 2 * math.pi * _unit(f"{lat},{lng}#{i}"))
+        place_id = f"fake-{hashlib.blake2b(f'{plat:.4f},{plng:.4f}'.encode(), digest_size=6).hexdigest()}"
+        results.append({
+            "place_id": place_id,
+            "name": f"Centro educativo {i + 1}",
+            "vicinity": f"Calle Falsa {100 + i}, Ciudad",
+            "geometry": {"location": {"lat": plat, "lng": plng}},
+        })
+    return {"results": results, "status": "OK"}
+
+
+def details(params: dict) -> dict:
+    place_id = params.get("place_id", "")
+    u = _unit(place_id)
+    if u < 0.2:
+        periods = [{"open": {"day": 0, "time": "0000"}}]  # open 24/7
+    else:
+        closes = "1400" if u < 0.5 else "1900"
+        periods = [{"open": {"day": d, "time": "0900"}, "close": {"day": d, "time": closes}} for d in range(1, 6)]
+    return {"result": {
+        "opening_hours": {"open_now": u < 0.7, "periods": periods},
+        "utc_offset_minutes": 120,
+        "price_level": 0 if u < 0.5 else 2,
+        "website": f"https://example.org/{place_id}",
+        "url": f"https://maps.example.org/?cid={place_id}",
+    }, "status": "OK"}
+
+
+ROUTES = {
+    "/geocode/v1/json": ("opencage", geocode),
+    "/data/2.5/weather": ("openweather", weather),
+    "/maps/api/place/nearbysearch/json": ("google_places", nearby),
+    "/maps/api/place/details/json": ("google_places", details),
+}
+PROVIDERS = ("opencage", "openweather", "google_places")
+
+
+def parse_latency(spec: str | None):
+    """Returns a callable rng -> seconds for a latency spec (see module docstring)."""
+    if not spec:
+        return lambda rng: 0.0
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == "pareto" and len(values) == 2:
+        return lambda rng: values[0] * rng.paretovariate(values[1]) / 1000
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class FaultProfile:
+    def __init__(self, latency: str | None = None, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, hang_s: float = 15.0):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_s = hang_s
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeProviders/1.0"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        route = ROUTES.get(parsed.path)
+        self.server.calls[parsed.path] += 1
+        if route is None:
+            self._send(404, {"error": "not found"})
+            return
+        provider, handler = route
+        profile = self.server.profiles.get(provider)
+        if profile is not None:
+            rng = self.server.rng
+            roll = rng.random()
+            if roll < profile.timeout_rate:
+                self.server.faults[(provider, "timeout")] += 1
+                time.sleep(profile.hang_s)
+                return
+            time.sleep(profile.sample_latency(rng))
+            if roll < profile.timeout_rate + profile.error_rate:
+                self.server.faults[(provider, "error")] += 1
+                status = rng.choice((500, 503, 429))
+                self._send(status, {"status": "UNKNOWN_ERROR", "error_message": "injected failure"})
+                return
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self._send(200, handler(params))
+
+    def _send(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            self._write(status, payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout)
+
+    def _write(self, status: int, payload: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProviders:
+    """
+    Runs the fake endpoints on a background thread:
+      with FakeProviders(profiles={"google_places": FaultProfile("lognormal:80:0.6")}) as fake:
+          fake.base_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, profiles: dict | None = None, seed: int = 1):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.calls = Counter()
+        self._server.faults = Counter()
+        self._server.profiles = dict(profiles or {})
+        self._server.rng = random.Random(seed)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-providers", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def calls(self) -> Counter:
+        return self._server.calls
+
+    @property
+    def faults(self) -> Counter:
+        """(provider, "error"|"timeout") -> injected count."""
+        return self._server.faults
+
+    def set_profile(self, provider: str, profile: FaultProfile | None) -> None:
+        if profile is None:
+            self._server.profiles.pop(provider, None)
+        else:
+            self._server.profiles[provider] = profile
+
+    def start(self) -> "FakeProviders":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _provider_options(values: list[str] | None, convert) -> dict:
+    """['google_places=0.1', ...] -> {'google_places': convert('0.1')}; 'all=' applies to every provider."""
+    out = {}
+    for item in values or []:
+        provider, _, value = item.partition("=")
+        if provider not in PROVIDERS + ("all",):
+            raise ValueError(f"Unknown provider {provider!r}; expected one of {', '.join(PROVIDERS)} or all")
+        for p in (PROVIDERS if provider == "all" else (provider,)):
+            out[p] = convert(value)
+    return out
+
+
+def profiles_from_args(latency=None, error_rate=None, timeout_rate=None, hang_s: float = 15.0) -> dict:
+    """Builds {provider: FaultProfile} from PROVIDER=VALUE option lists."""
+    latencies = _provider_options(latency, str)
+    for spec in latencies.values():
+        parse_latency(spec)
+    errors = _provider_options(error_rate, float)
+    timeouts = _provider_options(timeout_rate, float)
+    return {
+        p: FaultProfile(latencies.get(p), errors.get(p, 0.0), timeouts.get(p, 0.0), hang_s)
+        for p in set(latencies) | set(errors) | set(timeouts)
+    }
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", action="append", metavar="PROVIDER=SPEC",
+                        help="latency distribution per provider (repeatable; PROVIDER may be 'all')")
+    parser.add_argument("--error-rate", action="append", metavar="PROVIDER=RATE")
+    parser.add_argument("--timeout-rate", action="append", metavar="PROVIDER=RATE")
+    parser.add_argument("--hang", type=float, default=15.0, help="seconds an injected timeout hangs")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve fake OpenCage/OpenWeather/Google Places APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--seed", type=int, default=1)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    profiles = profiles_from_args(args.latency, args.error_rate, args.timeout_rate, args.hang)
+    fake = FakeProviders(args.host, args.port, profiles=profiles, seed=args.seed).start()
+    print(f"Fake providers listening on {fake.base_url}", file=sys.stderr)
+    for provider, profile in sorted(profiles.items()):
+        print(f"  {provider}: latency={profile.latency_spec} error_rate={profile.error_rate} "
+              f"timeout_rate={profile.timeout_rate}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
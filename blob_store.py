@@ -0,0 +1,140 @@
+"""
+Content-addressed store for large texts (essays, OCR'd transcriptions).
+
+Blobs are appended to a single pack file and read back through mmap, so
+history records only keep a BlobRef (digest + byte length) and the text is
+decoded when something actually reads it. Identical texts are stored once.
+
+Pack entry layout: 32-byte sha256 digest | uint32 little-endian length | utf-8 bytes.
+Writes are O_APPEND + flock, so several worker processes can share one pack;
+a worker that meets a digest it has not indexed rescans the new tail. A torn
+entry at the end of the file (crash mid-write) is truncated on open.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+_HEADER = struct.Struct("<32sI")
+
+
+class BlobRef:
+    """Pointer to one stored text. Resolves to the text when loaded."""
+
+    __slots__ = ("store", "digest", "size")
+
+    def __init__(self, store: "BlobStore", digest: bytes, size: int):
+        self.store = store
+        self.digest = digest
+        self.size = size
+
+    def load(self) -> str:
+        return self.store.get(self.digest)
+
+    def describe(self) -> dict:
+        return {"sha256": self.digest.hex(), "bytes": self.size}
+
+    def __json__(self):
+        # A pack that lost the blob (e.g. deleted with /tmp) degrades to the reference, not a 500.
+        try:
+            return self.load()
+        except KeyError:
+            return dict(self.describe(), missing=True)
+
+    def __deepcopy__(self, memo) -> "BlobRef":
+        return self  # immutable; also keeps dataclasses.asdict() from copying the store
+
+    def __repr__(self) -> str:
+        return f"BlobRef({self.digest.hex()[:12]}, {self.size} bytes)"
+
+
+class BlobStore:
+    def __init__(self, directory: str, pack_name: str = "blobs.pack"):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, pack_name)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._index = {}     # digest -> (offset of data, size)
+        self._scanned = 0    # pack bytes already indexed
+        self._map = None
+        self._lock = threading.Lock()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._scan()
+                if self._scanned < os.fstat(self._fd).st_size:
+                    os.ftruncate(self._fd, self._scanned)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _remap(self) -> None:
+        size = os.fstat(self._fd).st_size
+        if self._map is not None and len(self._map) >= size:
+            return
+        # The old map is not closed here: readers may still hold it; it closes once unreferenced.
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ) if size else None
+
+    def _scan(self) -> None:
+        """Indexes complete entries past `_scanned`; stops at a torn tail."""
+        self._remap()
+        if self._map is None:
+            return
+        pos, end = self._scanned, len(self._map)
+        while pos + _HEADER.size <= end:
+            digest, size = _HEADER.unpack_from(self._map, pos)
+            start = pos + _HEADER.size
+            if start + size > end:
+                break
+            self._index.setdefault(digest, (start, size))
+            pos = start + size
+        self._scanned = pos
+
+    def put(self, text: str) -> BlobRef:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).digest()
+        with self._lock:
+            if digest not in self._index:
+                entry = _HEADER.pack(digest, len(data)) + data
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    self._scan()  # pick up other workers' entries so offsets stay aligned
+                    if digest not in self._index:
+                        os.write(self._fd, entry)
+                        end = os.lseek(self._fd, 0, os.SEEK_CUR)
+                        self._index[digest] = (end - len(data), len(data))
+                        self._scanned = end
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return BlobRef(self, digest, len(data))
+
+    def get(self, digest: bytes) -> str:
+        location, pack = self._index.get(digest), self._map
+        if location is None or pack is None or location[0] + location[1] > len(pack):
+            with self._lock:
+                self._scan()
+                location, pack = self._index.get(digest), self._map
+            if location is None:
+                raise KeyError(digest.hex())
+        offset, size = location
+        return pack[offset:offset + size].decode("utf-8")
+
+    def reopen(self) -> None:
+        """Opens a private descriptor in a forked worker: flock does not exclude holders of an inherited one."""
+        with self._lock:
+            inherited, self._fd = self._fd, os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            os.close(inherited)
+
+    def sync(self) -> None:
+        """fsyncs the pack (the WAL calls this before committing entries that reference blobs)."""
+        os.fsync(self._fd)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            os.close(self._fd)
@@ -0,0 +1,130 @@
+"""
+In-process event bus behind the /events server-sent events stream.
+
+Events are published after a change commits; each is serialized once and
+shared by every subscriber. Ids increase monotonically, and the last
+`replay_size` events stay in a ring buffer, so a client that reconnects
+with Last-Event-ID receives what it missed.
+
+Each subscriber has a bounded queue. A subscriber that falls `queue_size`
+events behind is not allowed to hold memory or slow down publishers: it is
+marked overflowed, its stream sends a `reset` event and closes, and the
+client refetches through the regular endpoints before reconnecting.
+
+Events only reach subscribers of the process that published them.
+"""
+import threading
+import time
+from collections import deque
+
+
+class Event:
+    __slots__ = ("id", "tenant", "type", "kc_ids", "student_id", "data")
+
+    def __init__(self, id: int, tenant: str, type: str, kc_ids: tuple, student_id: str | None, data: str):
+        self.id = id
+        self.tenant = tenant
+        self.type = type
+        self.kc_ids = kc_ids
+        self.student_id = student_id
+        self.data = data      # serialized JSON
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    def __init__(self, bus: "EventBus", tenant: str, types=None, kc_id: str | None = None,
+                 student_id: str | None = None, queue_size: int = 256):
+        self.bus = bus
+        self.tenant = tenant
+        self.types = frozenset(types) if types else None
+        self.kc_id = kc_id
+        self.student_id = student_id
+        self.queue_size = queue_size
+        self.overflowed = False
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def matches(self, event: Event) -> bool:
+        return (
+            event.tenant == self.tenant
+            and (self.types is None or event.type in self.types)
+            and (self.kc_id is None or self.kc_id in event.kc_ids)
+            and (self.student_id is None or event.student_id == self.student_id)
+        )
+
+    def offer(self, event: Event) -> None:
+        with self._cond:
+            if self.overflowed:
+                return
+            if len(self._queue) >= self.queue_size:
+                self.overflowed = True
+                self._queue.clear()
+            else:
+                self._queue.append(event)
+            self._cond.notify()
+
+    def next(self, timeout: float) -> Event | None:
+        """The next event, or None after `timeout` seconds or once overflowed."""
+        with self._cond:
+            if not self._queue and not self.overflowed:
+                self._cond.wait(timeout)
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, replay_size: int = 1000, max_subscribers: int = 1000):
+        self.replay_size = replay_size
+        self.max_subscribers = max_subscribers
+        self._buffer = deque(maxlen=replay_size)
+        self._subscribers = set()
+        # Ids start from the clock so ids from before a restart are older than the buffer (-> reset).
+        self._next_id = int(time.time() * 1000)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, tenant: str, type: str, data: str, kc_ids=(), student_id: str | None = None) -> Event:
+        with self._lock:
+            event = Event(self._next_id, tenant, type, tuple(k for k in kc_ids if k), student_id, data)
+            self._next_id += 1
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.matches(event):
+                subscription.offer(event)
+        return event
+
+    def subscribe(self, tenant: str, last_event_id: int | None = None, **filters):
+        """
+        Returns (subscription, missed events), or (None, None) when the subscriber limit is reached.
+        `missed` is None if `last_event_id` is older than the replay buffer (the client must resync).
+        """
+        subscription = Subscription(self, tenant, **filters)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None, None
+            self._subscribers.add(subscription)
+            missed = []
+            if last_event_id is not None and last_event_id < self.last_id:
+                oldest = self._buffer[0].id if self._buffer else self._next_id
+                if last_event_id + 1 < oldest:
+                    missed = None
+                else:
+                    missed = [e for e in self._buffer if e.id > last_event_id and subscription.matches(e)]
+        return subscription, missed
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
@@ -0,0 +1,145 @@
+"""
+Local gazetteer for the place names students type most often.
+
+Loaded once from a TSV file (data/gazetteer.tsv by default):
+
+  names <TAB> formatted <TAB> lat <TAB> lng <TAB> timezone <TAB> qualifiers
+
+`names` and `qualifiers` are `|`-separated. Names cover Spanish and English
+spellings; qualifiers are the region/country words that may follow a name
+("Sevilla, España", "Seville, Spain"). Keys are normalized (lowercase, no
+accents, punctuation folded to spaces), kept in one sorted list and searched
+with bisect, which doubles as a prefix index for completion. A name shared by
+several places ("Guadalajara", "Mérida") only resolves with qualifiers that
+pick one ("Mérida, México"); bare, it is left to the geocoder.
+"""
+import bisect
+import math
+import re
+from dataclasses import dataclass
+
+from textfeatures import normalize_text
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+def place_key(text: str | None) -> str:
+    """'Donostia-San Sebastián' -> 'donostia san sebastian'."""
+    return " ".join(_PUNCT_RE.sub(" ", normalize_text(text)).split())
+
+
+@dataclass(frozen=True)
+class Place:
+    formatted: str
+    lat: float
+    lng: float
+    timezone: str | None
+    qualifiers: frozenset
+
+
+class Gazetteer:
+    def __init__(self):
+        self._places = []
+        self._keys = []      # sorted normalized names
+        self._entries = []   # parallel to _keys: place index
+        self._cells = {}     # (floor lat, floor lng) -> [place index], for nearest()
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        gazetteer = cls()
+        rows = []
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                cols = line.split("\t")
+                if len(cols) < 4:
+                    continue
+                names, formatted, lat, lng = cols[:4]
+                timezone = cols[4] if len(cols) > 4 and cols[4] else None
+                qualifiers = frozenset(place_key(q) for q in cols[5].split("|")) if len(cols) > 5 else frozenset()
+                place = Place(formatted, float(lat), float(lng), timezone, qualifiers)
+                pos = len(gazetteer._places)
+                gazetteer._places.append(place)
+                gazetteer._cells.setdefault((math.floor(place.lat), math.floor(place.lng)), []).append(pos)
+                for name in {place_key(n) for n in names.split("|")} - {""}:
+                    rows.append((name, pos))
+        rows.sort()  # by key, then file order
+        gazetteer._keys = [key for key, _ in rows]
+        gazetteer._entries = [pos for _, pos in rows]
+        return gazetteer
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def _exact(self, key: str) -> list[Place]:
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key)
+        return [self._places[i] for i in self._entries[lo:hi]]
+
+    def lookup(self, text: str | None) -> Place | None:
+        """Place for a free-text location, or None if it is not in the gazetteer."""
+        key = place_key(text)
+        if not key:
+            return None
+        places = self._exact(key)
+        if len(places) == 1:
+            return places[0]
+        # "Name, Region, Country": the trailing parts must all be qualifiers of the place.
+        parts = [place_key(p) for p in (text or "").split(",")]
+        parts = [p for p in parts if p]
+        for cut in range(len(parts) - 1, 0, -1):
+            head, tail = ", ".join(parts[:cut]), parts[cut:]
+            matches = [p for p in self._exact(place_key(head)) if all(q in p.qualifiers for q in tail)]
+            if len(matches) == 1:
+                return matches[0]
+            if matches:
+                return None  # still ambiguous
+        return None
+
+    def complete(self, prefix: str, limit: int = 10) -> list[Place]:
+        """Distinct places whose names start with `prefix`, in key order."""
+        key = place_key(prefix)
+        if not key:
+            return []
+        out, seen = [], set()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key) and len(out) < limit:
+            pos = self._entries[i]
+            if pos not in seen:
+                seen.add(pos)
+                out.append(self._places[pos])
+            i += 1
+        return out
+
+    def _within(self, lat: float, lng: float, max_km: float):
+        """(km, place) for places within `max_km` (searched in the surrounding 1-degree cells)."""
+        cy, cx = math.floor(lat), math.floor(lng)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for pos in self._cells.get((cy + dy, cx + dx), ()):
+                    place = self._places[pos]
+                    km = _haversine_km(lat, lng, place.lat, place.lng)
+                    if km <= max_km:
+                        yield km, place
+
+    def nearest(self, lat: float, lng: float, max_km: float) -> Place | None:
+        """Closest place within `max_km`."""
+        best, best_km = None, max_km
+        for km, place in self._within(lat, lng, max_km):
+            if km <= best_km:
+                best, best_km = place, km
+        return best
+
+    def timezone_near(self, lat: float, lng: float, max_km: float) -> str | None:
+        """Zone shared by every place within `max_km`; None if there are none or they disagree (a border)."""
+        zones = {place.timezone for _, place in self._within(lat, lng, max_km)}
+        return zones.pop() if len(zones) == 1 else None
+
+
+def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
@@ -0,0 +1,74 @@
+"""
+gunicorn settings (read automatically from the working directory):
+
+  gunicorn app:app
+
+With preload_app the app is imported and warmed up once in the master. The
+heap is then frozen (gc.freeze), so the collector never writes to those
+objects and forked workers keep sharing the pages copy-on-write. A new worker
+only has to restart its background threads, so it is ready in milliseconds.
+
+With WAL_DIR set, the state lives in the one process that holds the WAL lock,
+so a single worker is required. Under preload the master does not open the
+WAL: the worker takes the lock and replays the log after fork.
+
+Each open /events stream holds one worker thread for its whole life, so with
+the threaded worker streams are capped at half of the threads
+(EVENTS_MAX_SUBSCRIBERS, unless set) and the other routes always keep the
+rest. For many concurrent dashboards, run an async worker instead
+(GUNICORN_WORKER_CLASS=gevent, after `pip install gevent`), where a stream
+costs a greenlet and the cap is not applied.
+
+Environment:
+  PORT                   listen port (default 8000)
+  WEB_CONCURRENCY        worker processes (default 1; must be 1 with WAL_DIR)
+  GUNICORN_THREADS       threads per worker (default 8)
+  GUNICORN_WORKER_CLASS  gthread (default), or gevent/eventlet
+  GUNICORN_PRELOAD       "0" imports the app in each worker instead (default "1")
+"""
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+if os.getenv("WAL_DIR") and workers > 1:
+    raise RuntimeError("WAL_DIR keeps state in a single process: run one worker (WEB_CONCURRENCY=1)")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gthread":
+    # Read by app.py at import, which happens after this file is loaded.
+    os.environ.setdefault("EVENTS_MAX_SUBSCRIBERS", str(max(1, threads // 2)))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+if preload_app:
+    os.environ["WAL_OPEN_IN_WORKER"] = "1"  # read by app.py at import, like EVENTS_MAX_SUBSCRIBERS
+
+
+def _backend():
+    # The preloaded app module, or None when each worker imports it itself.
+    return sys.modules.get("app") if preload_app else None
+
+
+def when_ready(server):
+    backend = _backend()
+    if backend is None:
+        return
+    backend.warm_up()
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        "Preloaded app; %d objects frozen; setup phases %s",
+        gc.get_freeze_count(), {name: round(s, 4) for name, s in backend.startup.phases().items()},
+    )
+
+
+def pre_fork(server, worker):
+    backend = _backend()
+    if backend is not None:
+        backend.before_fork()
+
+
+def post_fork(server, worker):
+    backend = _backend()
+    if backend is not None:
+        backend.after_fork()
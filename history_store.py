@@ -0,0 +1,194 @@
+"""
+Append-only student history with per-student secondary indexes.
+
+Records are kept in insertion order; lookups by student (and KC or learning
+activity) go through the indexes instead of scanning every record. Every
+index list is ordered by `ts_epoch` (UTC seconds, assigned at ingest), so
+time-range queries bisect to the window and never touch records outside it.
+
+Stored records are HistoryRecord slot objects rather than dicts: roughly a
+sixth of the memory, with the low-cardinality strings (ids, SOLO levels,
+timezones, ...) interned so every record shares one copy. HistoryRecord is a
+dataclass, so orjson serializes it directly without building a dict first;
+it also keeps dict-style `get`/`[]` access for existing callers.
+
+Long texts may be held as BlobRefs (see blob_store.py); `get`/`[]` resolve
+them, attribute access and serialization see the reference.
+"""
+import bisect
+import sys
+import threading
+from dataclasses import dataclass, fields
+from datetime import datetime
+
+from blob_store import BlobRef
+
+# Values repeated across many records; interned on ingest.
+_INTERNED = (
+    "location", "kc_id", "student_id", "learning_activity_id", "learning_activity_title",
+    "SOLO_level", "student_response_type", "target_SOLO_level", "timezone",
+)
+
+
+@dataclass(slots=True)
+class HistoryRecord:
+    timestamp: str | None = None
+    ts_epoch: float | None = None
+    timezone: str | None = None
+    location: str | None = None
+    lat: float | None = None
+    lng: float | None = None
+    kc_id: str | None = None
+    student_id: str | None = None
+    learning_activity_id: str | None = None
+    learning_activity_title: str | None = None
+    SOLO_level: str | None = None
+    student_response: str | None = None
+    student_response_type: str | None = None
+    student_response_reference: str | None = None
+    student_response_transcription: str | None = None
+    justification: str | None = None
+    misconceptions: str | None = None
+    target_SOLO_level: str | None = None
+    approved: bool = True
+    location_required: bool | None = None
+    near_duplicate: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HistoryRecord":
+        """Builds a record from a dict, ignoring unknown keys and interning repeated strings."""
+        values = {name: data[name] for name in _FIELD_NAMES if name in data}
+        for name in _INTERNED:
+            value = values.get(name)
+            if type(value) is str:
+                values[name] = sys.intern(value)
+        return cls(**values)
+
+    def get(self, key: str, default=None):
+        if key not in _FIELD_NAMES:
+            return default
+        value = getattr(self, key)
+        if isinstance(value, BlobRef):
+            try:
+                return value.load()
+            except KeyError:  # blob missing from the pack
+                return None
+        return value
+
+    def __getitem__(self, key: str):
+        if key not in _FIELD_NAMES:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in _FIELD_NAMES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def to_dict(self) -> dict:
+        """Shallow dict of the fields; BlobRefs are left unresolved."""
+        return {name: getattr(self, name) for name in _FIELD_ORDER}
+
+
+_FIELD_ORDER = tuple(f.name for f in fields(HistoryRecord))
+_FIELD_NAMES = frozenset(_FIELD_ORDER)
+
+
+def record_epoch(record) -> float:
+    """`ts_epoch` of a record, falling back to parsing its `timestamp` string (0.0 if neither)."""
+    epoch = record.get("ts_epoch")
+    if epoch is not None:
+        return epoch
+    timestamp = record.get("timestamp")
+    if timestamp:
+        try:
+            return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+
+class _TimeIndex:
+    """Records ordered by epoch, with a parallel list of epochs for bisect."""
+
+    __slots__ = ("epochs", "records")
+
+    def __init__(self):
+        self.epochs = []
+        self.records = []
+
+    def add(self, epoch: float, record) -> None:
+        if not self.epochs or epoch >= self.epochs[-1]:
+            self.epochs.append(epoch)
+            self.records.append(record)
+        else:  # late arrival from a concurrent request
+            pos = bisect.bisect_right(self.epochs, epoch)
+            self.epochs.insert(pos, epoch)
+            self.records.insert(pos, record)
+
+    def window(self, since: float | None = None, until: float | None = None) -> list[HistoryRecord]:
+        lo = 0 if since is None else bisect.bisect_left(self.epochs, since)
+        hi = len(self.epochs) if until is None else bisect.bisect_right(self.epochs, until)
+        return self.records[lo:hi]
+
+
+_EMPTY = _TimeIndex()
+
+
+class HistoryStore:
+    def __init__(self):
+        self._records = []
+        self._by_student = {}            # student_id -> _TimeIndex
+        self._by_student_kc = {}         # (student_id, kc_id) -> _TimeIndex
+        self._by_student_activity = {}   # (student_id, learning_activity_id) -> _TimeIndex
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def append(self, record: dict | HistoryRecord) -> HistoryRecord:
+        """
+        Stores a record (dicts are converted) and returns the stored HistoryRecord.
+        A missing `ts_epoch` is derived from `timestamp`.
+        """
+        if not isinstance(record, HistoryRecord):
+            record = HistoryRecord.from_dict(record)
+        epoch = record.ts_epoch = record_epoch(record)
+        student_id = record.get("student_id")
+        with self._lock:
+            self._records.append(record)
+            for index, key in (
+                (self._by_student, student_id),
+                (self._by_student_kc, (student_id, record.get("kc_id"))),
+                (self._by_student_activity, (student_id, record.get("learning_activity_id"))),
+            ):
+                entry = index.get(key)
+                if entry is None:
+                    entry = index[key] = _TimeIndex()
+                entry.add(epoch, record)
+        return record
+
+    def recent(self, n: int) -> list[HistoryRecord]:
+        """The last `n` records appended, oldest first."""
+        return self._records[-n:] if n > 0 else []
+
+    def for_student(
+        self, student_id: str, kc_id: str | None = None, since: float | None = None, until: float | None = None
+    ) -> list[HistoryRecord]:
+        """Records of one student (optionally one KC), oldest first, within [since, until]."""
+        if kc_id:
+            return self._by_student_kc.get((student_id, kc_id), _EMPTY).window(since, until)
+        return self._by_student.get(student_id, _EMPTY).window(since, until)
+
+    def for_student_activity(self, student_id: str, learning_activity_id: str | None) -> list[HistoryRecord]:
+        """Records of one student for one learning activity, oldest first."""
+        return self._by_student_activity.get((student_id, learning_activity_id), _EMPTY).window()
+
+    def latest(self, student_id: str, kc_id: str | None = None) -> HistoryRecord | None:
+        """Most recent record of one student (optionally one KC)."""
+        index = self._by_student_kc.get((student_id, kc_id)) if kc_id else self._by_student.get(student_id)
+        return index.records[-1] if index and index.records else None
+
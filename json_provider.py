@@ -0,0 +1,71 @@
+"""
+Flask JSON provider backed by orjson when it is installed.
+
+Installed with `app.json = FastJSONProvider(app)`, it is used by jsonify,
+request.get_json and the NDJSON streams. Anything orjson cannot handle
+(non-compact debug output, integers wider than 64 bits, unknown types)
+falls back to Flask's stdlib-based provider. JSON_BACKEND=stdlib forces the
+fallback everywhere.
+
+Objects with a `__json__()` method serialize as its return value (used for
+lazily loaded values such as blob_store.BlobRef).
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(o):
+    to_json = getattr(o, "__json__", None)
+    if to_json is not None:
+        return to_json()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = os.getenv("JSON_BACKEND", "auto").lower()
+        self.backend = "orjson" if orjson is not None and backend in {"auto", "orjson"} else "stdlib"
+
+    def _orjson_dumps(self, obj) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Only compact output is delegated; indent and other stdlib options are not.
+        if self.backend == "orjson" and set(kwargs) <= {"separators"}:
+            try:
+                return self._orjson_dumps(obj).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == "orjson" and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # e.g. integers orjson refuses; let the stdlib decide and raise.
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if self.backend != "orjson" or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson_dumps(obj) + b"\n"
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
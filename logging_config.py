@@ -0,0 +1,156 @@
+"""
+Structured, asynchronous logging.
+
+Request threads only put LogRecords on a queue; a background listener does the
+formatting (JSON, one object per line) and the blocking write. Messages use
+%-style arguments and are rendered on the listener thread, so disabled or
+dropped records cost almost nothing.
+
+Environment:
+  LOG_LEVEL            root level (default INFO)
+  LOG_SAMPLE_RATE      fraction of DEBUG/INFO records kept (default 1.0);
+                       WARNING and above are always kept
+  LOG_MAX_FIELD_CHARS  long strings in structured fields are truncated to this (default 200)
+
+Structured fields are passed as `extra={"fields": {...}}`.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_MAX_ITEMS = 20
+_listener = None
+
+
+def truncate(value, max_chars: int, depth: int = 0):
+    """Copies `value` with long strings cut and long containers shortened."""
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    if depth >= 3:
+        return "..."
+    if isinstance(value, dict):
+        items = list(value.items())
+        out = {str(k): truncate(v, max_chars, depth + 1) for k, v in items[:_MAX_ITEMS]}
+        if len(items) > _MAX_ITEMS:
+            out["..."] = f"+{len(items) - _MAX_ITEMS} keys"
+        return out
+    if isinstance(value, (list, tuple)):
+        out = [truncate(v, max_chars, depth + 1) for v in value[:_MAX_ITEMS]]
+        if len(value) > _MAX_ITEMS:
+            out.append(f"...(+{len(value) - _MAX_ITEMS} items)")
+        return out
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return truncate(repr(value), max_chars, depth)
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, max_field_chars: int = 200):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage(), self.max_field_chars * 4),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            entry.update(truncate(fields, self.max_field_chars))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode("utf-8")
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every WARNING+ record and a `rate` fraction of the rest."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(app) -> None:
+    """Routes the root logger (and app.logger) through a queue to a JSON stderr handler."""
+    global _listener
+
+    level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    max_field_chars = int(os.getenv("LOG_MAX_FIELD_CHARS", "200"))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter(max_field_chars))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # werkzeug forces INFO on its logger unless a level is already set.
+    logging.getLogger("werkzeug").setLevel(level)
+    app.logger.setLevel(logging.NOTSET)
+    app.logger.propagate = True
+
+    _stop_listener()
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def restart_listener() -> None:
+    """Starts a new listener thread in a forked worker (the parent's thread does not survive fork).
+
+    A no-op while the current listener is still running in this process, so
+    two listeners never share the queue (one would swallow the other's stop
+    sentinel and hang shutdown).
+    """
+    global _listener
+    if _listener is not None and not (_listener._thread and _listener._thread.is_alive()):
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def _stop_listener() -> None:
+    """Flushes queued records; registered at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
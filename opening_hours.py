@@ -0,0 +1,57 @@
+"""
+Weekly opening hours from Google Place Details, evaluated locally.
+
+`opening_hours.periods` is stored once as compact [open, close] pairs of
+minutes since Sunday 00:00 (Google numbers days 0 = Sunday .. 6 = Saturday),
+so a cached details entry can answer "open now?" for any request time in the
+place's local time, and stays valid for days instead of minutes.
+"""
+from datetime import datetime
+
+WEEK_MINUTES = 7 * 24 * 60
+
+
+def _minute_of_week(point: dict) -> int | None:
+    try:
+        day = int(point["day"])
+        hhmm = str(point["time"])
+        return day * 24 * 60 + int(hhmm[:2]) * 60 + int(hhmm[2:4])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_periods(opening_hours: dict | None) -> list[list[int]] | None:
+    """
+    [[open, close], ...] in minutes of the week, or None if the place has no periods.
+    A period without a close is open around the clock; periods past Saturday wrap.
+    """
+    periods = (opening_hours or {}).get("periods")
+    if not periods:
+        return None
+    out = []
+    for period in periods:
+        start = _minute_of_week(period.get("open") or {})
+        if start is None:
+            continue
+        close = period.get("close")
+        if not close:
+            return [[0, WEEK_MINUTES]]  # Google's encoding of "always open"
+        end = _minute_of_week(close)
+        if end is None:
+            continue
+        if end <= start:
+            end += WEEK_MINUTES
+        out.append([start, end])
+    return sorted(out) or None
+
+
+def is_open(periods: list[list[int]] | None, local_time: datetime) -> bool | None:
+    """Whether the place is open at `local_time` (the place's wall clock); None if unknown."""
+    if not periods:
+        return None
+    # Python weekday(): Monday = 0; Google: Sunday = 0.
+    minute = ((local_time.weekday() + 1) % 7) * 24 * 60 + local_time.hour * 60 + local_time.minute
+    for start, end in periods:
+        if start <= minute < end or start <= minute + WEEK_MINUTES < end:
+            return True
+    return False
@@ -0,0 +1,252 @@
+"""
+Transactional outbox and webhook dispatcher for approved assessments.
+
+/store-history allocates an outbox sequence number inside the same critical
+section that logs and applies the record, and the number travels in the
+record's WAL entry, so an event exists exactly when its record does. The
+dispatcher only sends events whose WAL entry is already durable.
+
+Each webhook has a cursor (the last sequence number it acknowledged).
+Events of its tenant past the cursor are sent in sequence order, in batches,
+and a batch is only followed by the next one once it is acknowledged (2xx),
+so every student's events arrive in order. Delivery is at least once:
+receivers should deduplicate on `event_id`. A failing batch is retried with
+exponential backoff; after `max_attempts` it moves to the webhook's
+dead-letter store and the cursor moves past it.
+
+State changes (acks, dead letters, registrations) go through the `commit`
+callback, which logs them so replay restores cursors and dead letters.
+Events are kept until every webhook of their tenant has moved past them.
+"""
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxEvent:
+    __slots__ = ("seq", "tenant", "student_id", "data", "lsn")
+
+    def __init__(self, seq: int, tenant: str, student_id: str | None, data: dict, lsn: int | None):
+        self.seq = seq
+        self.tenant = tenant
+        self.student_id = student_id
+        self.data = data
+        self.lsn = lsn
+
+
+class Webhook:
+    __slots__ = ("id", "tenant", "url", "cursor", "attempts", "next_attempt", "last_error", "dead_letters")
+
+    def __init__(self, id: str, tenant: str, url: str, cursor: int, dead_letter_max: int):
+        self.id = id
+        self.tenant = tenant
+        self.url = url
+        self.cursor = cursor
+        self.attempts = 0
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.dead_letters = deque(maxlen=dead_letter_max)
+
+    def describe(self) -> dict:
+        return {
+            "webhook_id": self.id, "url": self.url, "cursor": self.cursor,
+            "attempts": self.attempts, "last_error": self.last_error, "dead_letters": len(self.dead_letters),
+        }
+
+
+class Outbox:
+    def __init__(self, batch_size: int = 100, max_attempts: int = 8, backoff_s: float = 1.0,
+                 backoff_max_s: float = 300.0, dead_letter_max: int = 1000):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.dead_letter_max = dead_letter_max
+        self._last_seq = 0
+        self._seqs = {}       # tenant -> [seq], ascending
+        self._events = {}     # tenant -> [OutboxEvent], parallel to _seqs
+        self._hooks = {}      # webhook id -> Webhook
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return sum(len(events) for events in self._events.values())
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    # ------------------------------ state ------------------------------ #
+    def has_webhooks(self, tenant: str) -> bool:
+        return any(hook.tenant == tenant for hook in self._hooks.values())
+
+    def webhooks(self, tenant: str) -> list[Webhook]:
+        return [hook for hook in self._hooks.values() if hook.tenant == tenant]
+
+    def webhook(self, webhook_id: str) -> Webhook | None:
+        return self._hooks.get(webhook_id)
+
+    def allocate(self) -> int:
+        """Next sequence number; call inside the lock that orders the log."""
+        with self._cond:
+            self._last_seq += 1
+            return self._last_seq
+
+    def add(self, seq: int, tenant: str, student_id: str | None, data: dict, lsn: int | None = None) -> None:
+        with self._cond:
+            self._last_seq = max(self._last_seq, seq)
+            if not self.has_webhooks(tenant):
+                return
+            seqs = self._seqs.setdefault(tenant, [])
+            events = self._events.setdefault(tenant, [])
+            pos = bisect.bisect(seqs, seq)
+            seqs.insert(pos, seq)
+            events.insert(pos, OutboxEvent(seq, tenant, student_id, data, lsn))
+            self._cond.notify_all()
+
+    def register(self, webhook_id: str, tenant: str, url: str, cursor: int | None = None) -> Webhook:
+        """A new webhook starts after the current last event unless `cursor` is given."""
+        with self._cond:
+            if cursor is None:
+                cursor = self._last_seq
+            self._last_seq = max(self._last_seq, cursor)
+            hook = Webhook(webhook_id, tenant, url, cursor, self.dead_letter_max)
+            self._hooks[webhook_id] = hook
+            self._cond.notify_all()
+            return hook
+
+    def remove(self, webhook_id: str) -> None:
+        with self._cond:
+            hook = self._hooks.pop(webhook_id, None)
+            if hook is not None:
+                self._trim(hook.tenant)
+
+    def ack(self, webhook_id: str, through: int) -> None:
+        with self._cond:
+            hook = self._hooks.get(webhook_id)
+            if hook is None:
+                return
+            hook.cursor = max(hook.cursor, through)
+            hook.attempts, hook.next_attempt, hook.last_error = 0, 0.0, None
+            self._trim(hook.tenant)
+
+    def dead_letter(self, webhook_id: str, through: int, events: list[dict], error: str, failed_at: float) -> None:
+        with self._cond:
+            hook = self._hooks.get(webhook_id)
+            if hook is None:
+                return
+            hook.dead_letters.append({"events": events, "error": error, "failed_at": failed_at})
+        self.ack(webhook_id, through)
+
+    def _trim(self, tenant: str) -> None:
+        """Drops events every webhook of `tenant` has passed (called with the condition held)."""
+        cursors = [hook.cursor for hook in self._hooks.values() if hook.tenant == tenant]
+        seqs = self._seqs.get(tenant)
+        if not seqs:
+            return
+        cut = bisect.bisect(seqs, min(cursors)) if cursors else len(seqs)
+        del seqs[:cut]
+        del self._events[tenant][:cut]
+
+    def pending(self, hook: Webhook, durable_lsn: float) -> list[OutboxEvent]:
+        """The next batch for `hook`: events past its cursor whose log entry is durable."""
+        seqs = self._seqs.get(hook.tenant) or []
+        events = self._events.get(hook.tenant) or []
+        start = bisect.bisect(seqs, hook.cursor)
+        batch = []
+        for event in events[start:start + self.batch_size]:
+            if event.lsn is not None and event.lsn > durable_lsn:
+                break
+            batch.append(event)
+        return batch
+
+    def notify(self) -> None:
+        """Wakes the dispatcher (e.g. once new events became durable)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def capture(self) -> tuple[list[tuple], list[OutboxEvent]]:
+        """Webhooks as (id, tenant, url, cursor, dead letters) and all retained events, for snapshots."""
+        with self._cond:
+            hooks = [(h.id, h.tenant, h.url, h.cursor, list(h.dead_letters)) for h in self._hooks.values()]
+            events = [event for tenant_events in self._events.values() for event in tenant_events]
+        return hooks, events
+
+    # ---------------------------- dispatcher ---------------------------- #
+    def start(self, send, commit, durable_lsn) -> None:
+        """
+        Starts the dispatcher (again, in a forked child).
+        send(hook, events) raises on failure; commit(op, data) logs and applies
+        "webhook_ack" / "dead_letter"; durable_lsn() bounds what may be sent.
+        """
+        self._send, self._commit, self._durable_lsn = send, commit, durable_lsn
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closing:
+                    return
+                now = time.monotonic()
+                durable = self._durable_lsn()
+                work, wake = [], 1.0
+                for hook in list(self._hooks.values()):
+                    if hook.next_attempt > now:
+                        wake = min(wake, hook.next_attempt - now)
+                        continue
+                    batch = self.pending(hook, durable)
+                    if batch:
+                        work.append((hook, batch))
+                if not work:
+                    self._cond.wait(wake)
+                    continue
+            for hook, batch in work:
+                try:
+                    self._deliver(hook, batch)
+                except Exception:
+                    # e.g. the log failed while committing an ack: keep the thread alive and retry later
+                    # (the batch is sent again, which at-least-once delivery allows).
+                    logger.exception("Outbox delivery to webhook %s failed", hook.id)
+                    with self._cond:
+                        hook.next_attempt = time.monotonic() + self.backoff_s
+
+    def _deliver(self, hook: Webhook, batch: list[OutboxEvent]) -> None:
+        through = batch[-1].seq
+        try:
+            self._send(hook, batch)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:500]
+            with self._cond:
+                hook.attempts += 1
+                hook.last_error = error
+                exhausted = hook.attempts >= self.max_attempts
+                if not exhausted:
+                    delay = min(self.backoff_max_s, self.backoff_s * 2 ** (hook.attempts - 1))
+                    hook.next_attempt = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            if exhausted:
+                self._commit("dead_letter", {
+                    "webhook_id": hook.id, "through": through, "events": [e.data for e in batch],
+                    "error": error, "failed_at": time.time(),
+                })
+            return
+        self._commit("webhook_ack", {"webhook_id": hook.id, "through": through})
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
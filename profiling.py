@@ -0,0 +1,132 @@
+"""
+Opt-in per-request profiling.
+
+Nothing is registered unless PROFILING_ENABLED is set, so the hook has no cost
+when off. When on, a request sent with `X-Profile: 1` (or `?profile=1`) runs
+under a profiler and the result is written to PROFILE_DIR:
+
+  sample (default)  wall-clock stack sampler, written as folded stacks
+                    (`frame;frame;frame count`), the input format of
+                    flamegraph.pl and speedscope
+  cprofile          deterministic cProfile, written as a .pstats file
+
+Select the mode with `X-Profile: cprofile` / `?profile=cprofile`. If
+PROFILING_TOKEN is set, the request must also carry `X-Profile-Token`.
+The response carries `X-Profile-Id`; GET /profiles/<id> returns the file.
+"""
+import cProfile
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from flask import abort, g, request, send_from_directory
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.002, max_depth: int = 128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+def _requested_mode() -> str | None:
+    value = request.headers.get("X-Profile") or request.args.get("profile")
+    if not value or value.lower() in {"0", "false", "off"}:
+        return None
+    return "cprofile" if value.lower() == "cprofile" else "sample"
+
+
+def install_profiling(app) -> bool:
+    """Registers the profiling hooks when PROFILING_ENABLED is set. Returns whether it did."""
+    if os.getenv("PROFILING_ENABLED", "").lower() not in {"1", "true", "yes"}:
+        return False
+
+    profile_dir = os.path.abspath(os.getenv("PROFILE_DIR", "profiles"))
+    token = os.getenv("PROFILING_TOKEN")
+    interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.002"))
+    os.makedirs(profile_dir, exist_ok=True)
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode()
+        if mode is None:
+            return
+        if token and request.headers.get("X-Profile-Token") != token:
+            return
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), interval=interval)
+            profiler.start()
+        g.profile = (mode, profiler)
+
+    def _stop_profile(active) -> str:
+        """Stops the profiler and writes its result; returns the file name."""
+        mode, profiler = active
+        profile_id = uuid.uuid4().hex
+        if mode == "cprofile":
+            profiler.disable()
+            filename = f"{profile_id}.pstats"
+            profiler.dump_stats(os.path.join(profile_dir, filename))
+        else:
+            profiler.stop()
+            filename = f"{profile_id}.folded"
+            with open(os.path.join(profile_dir, filename), "w", encoding="utf-8") as fh:
+                fh.write(profiler.folded())
+        app.logger.info(
+            "Request profiled: %s %s -> %s", request.method, request.path, filename,
+            extra={"fields": {"profile_id": profile_id, "mode": mode}},
+        )
+        return filename
+
+    @app.after_request
+    def _finish_profile(response):
+        active = g.pop("profile", None)
+        if active is not None:
+            response.headers["X-Profile-Id"] = _stop_profile(active)
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(_exc=None):
+        # Runs even when the view or a hook raised and _finish_profile was skipped:
+        # never leave a sampler thread running or cProfile enabled on this thread.
+        active = g.pop("profile", None)
+        if active is not None:
+            _stop_profile(active)
+
+    @app.route("/profiles/<path:filename>", methods=["GET"])
+    def get_profile(filename):
+        if token and request.headers.get("X-Profile-Token") != token:
+            abort(403)
+        return send_from_directory(profile_dir, filename)
+
+    return True
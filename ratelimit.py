@@ -0,0 +1,126 @@
+"""
+Token buckets, outbound budgets and upstream-latency tracking for admission control.
+
+Limits are written as "name=rate:burst" lists, e.g. RATE_LIMITS=
+"generate_reaction=5:30,store_history=20:100": `rate` tokens per second
+refill a bucket holding at most `burst`. A request (or outbound call) takes
+one token; when the bucket is empty the caller is told how long until the
+next token, which becomes the Retry-After of a fast 429/503.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class BudgetExceeded(Exception):
+    """An outbound call was skipped because its provider budget (per tenant, or the process's) is spent."""
+
+    def __init__(self, provider: str, retry_after: float, tenant: str | None = None):
+        super().__init__(f"{provider} outbound budget exhausted; retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+        self.tenant = tenant
+
+
+def parse_limits(spec: str | None) -> dict[str, tuple[float, float]]:
+    """
+    'a=5:30,b=1' -> {"a": (5.0, 30.0), "b": (1.0, 1.0)}; burst defaults to max(rate, 1).
+    Raises ValueError for a rate or burst that is not positive (leave a name out to not limit it).
+    """
+    limits = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.strip().partition("=")
+        if not sep or not name.strip():
+            continue
+        rate, _, burst = value.partition(":")
+        rate = float(rate)
+        burst = float(burst) if burst else max(rate, 1.0)
+        if not rate > 0 or not burst > 0:
+            raise ValueError(f"limit {item.strip()!r}: rate and burst must be positive")
+        limits[name.strip()] = (rate, burst)
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "_lock")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, n: float = 1.0) -> float:
+        """Takes `n` tokens and returns 0.0, or returns the seconds until they are available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return 0.0
+            return (n - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class BucketMap:
+    """Buckets created on first use per key, with the least recently used evicted past `max_keys`."""
+
+    def __init__(self, limits: dict[str, tuple[float, float]], max_keys: int = 10000):
+        self.limits = limits
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, name: str, key: str = "") -> float:
+        """Seconds to wait before `name` (scoped by `key`) may proceed; 0.0 if allowed or unlimited."""
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get((name, key))
+            if bucket is None:
+                bucket = self._buckets[(name, key)] = TokenBucket(*limit)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end((name, key))
+        return bucket.take()
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted latency per provider. A provider counts as slow
+    while its average is over `threshold_s` and it has had a sample in the
+    last `cooldown_s`; after a quiet cooldown, traffic is let through again
+    so fresh samples can show whether it recovered.
+    """
+
+    def __init__(self, threshold_s: float, cooldown_s: float, alpha: float = 0.3):
+        self.threshold_s = threshold_s
+        self.cooldown_s = cooldown_s
+        self.alpha = alpha
+        self._stats = {}   # provider -> (ewma seconds, monotonic time of last sample)
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float) -> None:
+        with self._lock:
+            previous = self._stats.get(provider)
+            ewma = seconds if previous is None else previous[0] + self.alpha * (seconds - previous[0])
+            self._stats[provider] = (ewma, time.monotonic())
+
+    def average(self, provider: str) -> float | None:
+        stats = self._stats.get(provider)
+        return stats[0] if stats else None
+
+    def slow(self, providers) -> float:
+        """Seconds until the slowest of `providers` may be retried; 0.0 if none is slow."""
+        if self.threshold_s <= 0:
+            return 0.0
+        now = time.monotonic()
+        wait = 0.0
+        for provider in providers:
+            stats = self._stats.get(provider)
+            if stats and stats[0] > self.threshold_s:
+                wait = max(wait, self.cooldown_s - (now - stats[1]))
+        return wait
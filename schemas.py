@@ -0,0 +1,194 @@
+"""
+Declarative request schemas, compiled once into straight-line validators.
+
+A Schema lists its fields in the order the checks should report; compile()
+generates one Python function for it (no per-field dispatch or reflection at
+request time) that normalizes values and collects every error in one pass:
+
+  values, errors = STORE_HISTORY.validate(payload)
+  # errors: [{"field": "kc_id", "message": "..."}, ...], in field order
+
+validate_batch() applies the same compiled function to a list of payloads.
+Error dicts are shared constants; do not mutate them.
+"""
+import itertools
+
+_TYPE_NAMES = {str: "a string", list: "a list", dict: "an object", bool: "a boolean", int: "an integer"}
+
+
+class Field:
+    """
+    required: False, True (value must be truthy) or "present" (value must not be None).
+    default:  used when the value is missing, None or "".
+    type:     expected Python type (checked when a value is present); coerce: callable
+              applied to a present value instead (e.g. int), failing with type_message.
+    strip/lower: string normalization; choices: allowed values after normalization.
+    """
+
+    def __init__(self, name: str, required=False, default=None, type=None, coerce=None, strip: bool = False,
+                 lower: bool = False, choices=None, message: str | None = None, type_message: str | None = None):
+        self.name = name
+        self.required = required
+        self.default = default
+        self.type = type
+        self.coerce = coerce
+        self.strip = strip
+        self.lower = lower
+        self.choices = frozenset(choices) if choices else None
+        self.message = message or f"{name} is required"
+        if type_message is None:
+            if choices:
+                type_message = f"{name} must be one of: {', '.join(choices)}"
+            else:
+                type_message = f"{name} must be {_TYPE_NAMES.get(type or coerce, 'valid')}"
+        self.type_message = type_message
+
+
+class Schema:
+    def __init__(self, name: str, *fields: Field, any_of=()):
+        """`any_of`: [(field names, message)]; at least one of the named values must be truthy."""
+        self.name = name
+        self.fields = fields
+        self.any_of = tuple((tuple(names), message) for names, message in any_of)
+        self.validate = self._compile()
+
+    def _compile(self):
+        consts = {}
+        counter = itertools.count()
+
+        def const(value) -> str:
+            key = f"_c{next(counter)}"
+            consts[key] = value
+            return key
+
+        lines = [
+            "def validate(data):",
+            "    if not isinstance(data, dict):",
+            f"        return {{}}, [{const({'field': None, 'message': 'Request body must be a JSON object'})}]",
+            "    errors = []",
+            "    out = {}",
+        ]
+        for f in self.fields:
+            name = repr(f.name)
+            missing = const({"field": f.name, "message": f.message})
+            invalid = const({"field": f.name, "message": f.type_message})
+            lines.append(f"    v = data.get({name})")
+            if f.default is not None:
+                default = const(f.default)
+                if isinstance(f.default, (list, dict)):
+                    default = f"{default}.copy()"  # never share a mutable default between requests
+                lines.append(f"    if v is None or v == '':\n        v = {default}")
+            if f.strip or f.lower:
+                ops = (".strip()" if f.strip else "") + (".lower()" if f.lower else "")
+                lines.append(f"    if v.__class__ is str:\n        v = v{ops}")
+            checks = []
+            if f.required == "present":
+                checks.append(("v is None", missing))
+            elif f.required:
+                checks.append(("not v", missing))
+            if f.coerce is not None:
+                lines.append(
+                    f"    if v is not None:\n"
+                    f"        try:\n            v = {const(f.coerce)}(v)\n"
+                    f"        except (TypeError, ValueError):\n            errors.append({invalid})"
+                )
+            elif f.type is not None:
+                checks.append((f"v is not None and not isinstance(v, {const(f.type)})", invalid))
+            if f.choices is not None:
+                checks.append((f"v is not None and v not in {const(f.choices)}", invalid))
+            for i, (condition, error) in enumerate(checks):
+                lines.append(f"    {'if' if i == 0 else 'elif'} {condition}:\n        errors.append({error})")
+            lines.append(f"    out[{name}] = v")
+        for names, message in self.any_of:
+            condition = " or ".join(f"out.get({n!r})" for n in names)
+            error = const({"field": names[0], "message": message})
+            lines.append(f"    if not ({condition}):\n        errors.append({error})")
+        lines.append("    return out, errors")
+
+        source = "\n".join(lines)
+        namespace = dict(consts)
+        exec(compile(source, f"<schema {self.name}>", "exec"), namespace)
+        validate = namespace["validate"]
+        validate.__doc__ = f"Validates a {self.name} payload; returns (values, errors)."
+        return validate
+
+    def validate_batch(self, items) -> list[tuple[dict, list]]:
+        """(values, errors) for each payload of a batch, in order."""
+        validate = self.validate
+        return [validate(item) for item in items]
+
+
+# ------------------------------ route schemas ------------------------------ #
+# Field order is check order: the first error is the one the routes always reported.
+RESPONSE_TYPES = ("text", "image", "pdf", "drawing", "notes")
+_LIST_OBJECTIVES = "aligned_learning_objectives must be a list."
+_LIST_COMPETENCIES = "aligned_competencies must be a list."
+
+SUBMIT_KC = Schema(
+    "submit_kc",
+    Field("approved", required=True, message="KC not submitted: approval required."),
+    Field("kc_id", required=True, type=str, message="kc_id is required."),
+    Field("aligned_learning_objectives", required="present", type=list,
+          message=_LIST_OBJECTIVES, type_message=_LIST_OBJECTIVES),
+    Field("aligned_competencies", required="present", type=list,
+          message=_LIST_COMPETENCIES, type_message=_LIST_COMPETENCIES),
+)
+
+SUBMIT_ACTIVITY = Schema(
+    "submit_activity",
+    Field("learning_activity_id", required=True, type=str, message="learning_activity_id is required."),
+    Field("related_kc_ids", default=[], type=list),
+)
+
+_REQUIRED_IDS = "student_id, kc_id, and SOLO_level are required"
+STORE_HISTORY = Schema(
+    "store_history",
+    Field("approved", required=True, message="Teacher approval required before storing analysis"),
+    Field("student_id", required=True, type=str, message=_REQUIRED_IDS),
+    Field("kc_id", required=True, type=str, message=_REQUIRED_IDS),
+    Field("SOLO_level", required=True, type=str, message=_REQUIRED_IDS),
+    Field("learning_activity_id", required=True, type=str),
+    Field("learning_activity_title", required=True, type=str),
+    Field("student_response_type", default="text", type=str, strip=True, lower=True, choices=RESPONSE_TYPES),
+    Field("target_SOLO_level", required=True),
+    Field("justification", required="present"),
+    Field("misconceptions", required="present"),
+    Field("student_response", type=str),
+    Field("student_response_reference", type=str),
+    Field("student_response_transcription", type=str),
+    any_of=[(
+        ("student_response", "student_response_reference", "student_response_transcription"),
+        "At least one of student_response, student_response_reference, "
+        "or student_response_transcription is required.",
+    )],
+)
+
+_REQUIRED_KC_STUDENT = "kc_id and student_id are required"
+ANALYZE_RESPONSE = Schema(
+    "analyze_response",
+    Field("kc_id", required=True, type=str, message=_REQUIRED_KC_STUDENT),
+    Field("student_id", required=True, type=str, message=_REQUIRED_KC_STUDENT),
+    Field("student_response_type", default="text", type=str, strip=True, lower=True, choices=RESPONSE_TYPES),
+    Field("student_response", default="", type=str, strip=True),
+    Field("student_response_transcription", default="", type=str, strip=True),
+    Field("learning_activity_id", type=str),
+    Field("learning_activity_title", type=str),
+    Field("student_response_reference", type=str),
+)
+
+SIMILAR_RESPONSES = Schema(
+    "similar_responses",
+    Field("kc_id", required=True, type=str),
+    Field("k", default=5, coerce=int, type_message="k must be an integer"),
+)
+
+GENERATE_REACTION = Schema(
+    "generate_reaction",
+    Field("kc_id", required=True, type=str, message=_REQUIRED_KC_STUDENT),
+    Field("student_id", required=True, type=str, message=_REQUIRED_KC_STUDENT),
+)
+
+WEBHOOK = Schema(
+    "webhook",
+    Field("url", required=True, type=str, strip=True, message="url is required"),
+)
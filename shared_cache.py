@@ -0,0 +1,113 @@
+"""
+Cross-process TTL cache backed by a local SQLite file.
+
+All gunicorn workers on a host open the same database file, so a value fetched
+by one worker is a hit for every other worker. No external service is needed.
+Each write is a single INSERT OR REPLACE. Expiry is enforced in the read query,
+so a stale row is never returned, even before a purge removes it. Any SQLite
+error counts as a cache miss; the cache never fails a request.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+MISSING = object()
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+"""
+
+
+def _dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode("utf-8")
+
+
+def _loads(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class SharedCache:
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.path = path
+        self._purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork (connections must not cross processes).
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        """Returns the cached value or MISSING."""
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("shared cache read failed: %s", e)
+            return MISSING
+        return MISSING if row is None else _loads(row[0])
+
+    def set(self, key: str, value, ttl: float) -> None:
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, _dumps(value), time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self._purge_every == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.debug("shared cache write failed: %s", e)
+
+    def get_or_load(self, key: str, ttl: float, loader, on_lookup=None):
+        """
+        Returns the cached value for `key`, or calls `loader()` and caches its result.
+        A loader result of None is returned but not cached (e.g. upstream errors).
+        `on_lookup(hit: bool)` is called once per lookup, for metrics.
+        """
+        value = self.get(key)
+        if on_lookup is not None:
+            on_lookup(value is not MISSING)
+        if value is not MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def __len__(self) -> int:
+        try:
+            return self._conn().execute(
+                "SELECT COUNT(*) FROM cache WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
@@ -0,0 +1,83 @@
+"""
+In-process similarity index over approved student responses.
+
+Each response is reduced to a MinHash signature of its character 4-grams and
+bucketed per KC with banded LSH, so a lookup only compares against responses
+that share at least one band instead of the whole KC history.
+"""
+import threading
+
+from textfeatures import char_shingles, minhash_permutations, minhash_signature
+
+
+class SimilarityIndex:
+    def __init__(self, num_perm: int = 32, bands: int = 8, exhaustive_limit: int = 2000):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self._perms = minhash_permutations(num_perm)
+        self._bands = bands
+        self._rows = num_perm // bands
+        # Below this many entries per KC, a query with too few LSH candidates
+        # falls back to comparing every entry.
+        self._exhaustive_limit = exhaustive_limit
+        self._entries = {}   # kc_id -> [(signature, record)]
+        self._buckets = {}   # kc_id -> {(band, band_values): [entry index]}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    def _band_keys(self, signature: tuple):
+        r = self._rows
+        for band in range(self._bands):
+            yield band, signature[band * r:(band + 1) * r]
+
+    def signature(self, text: str | None) -> tuple:
+        return minhash_signature(char_shingles(text), self._perms)
+
+    def add(self, kc_id: str, text: str | None, record, signature: tuple | None = None) -> tuple:
+        """Indexes `record`; pass a precomputed `signature` (e.g. on log replay) to skip hashing `text`."""
+        if signature is None:
+            signature = self.signature(text)
+        if not signature:
+            return signature
+        with self._lock:
+            entries = self._entries.setdefault(kc_id, [])
+            buckets = self._buckets.setdefault(kc_id, {})
+            idx = len(entries)
+            entries.append((signature, record))
+            for key in self._band_keys(signature):
+                buckets.setdefault(key, []).append(idx)
+        return signature
+
+    def entries(self):
+        """(kc_id, signature, record) for every indexed record, copied under the lock."""
+        with self._lock:
+            return [(kc_id, sig, record) for kc_id, items in self._entries.items() for sig, record in items]
+
+    def query(self, kc_id: str, text: str | None, k: int = 5, min_score: float = 0.0) -> list[tuple[float, object]]:
+        """
+        Top-k (estimated Jaccard similarity, record) pairs for the KC, best first.
+        Records scoring 0 or below `min_score` are not matches and are left out.
+        """
+        signature = self.signature(text)
+        entries = self._entries.get(kc_id)
+        if not signature or not entries:
+            return []
+
+        buckets = self._buckets.get(kc_id, {})
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(buckets.get(key, ()))
+        if len(candidates) < k and len(entries) <= self._exhaustive_limit:
+            candidates = range(len(entries))
+
+        n = len(signature)
+        scored = []
+        for idx in candidates:
+            other, record = entries[idx]
+            score = sum(1 for a, b in zip(signature, other) if a == b) / n
+            if score > 0 and score >= min_score:
+                scored.append((score, idx, record))
+        scored.sort(key=lambda t: (-t[0], -t[1]))
+        return [(score, record) for score, _, record in scored[:k]]
@@ -0,0 +1,151 @@
+"""
+Precomputed nearest-site map for Physical KCs.
+
+A Physical KC always searches with the same query (site keywords plus the
+city to exclude), and students keep coming from the same neighbourhoods.
+The map keeps, per query and grid cell (`cell_deg` degrees, ~500 m by
+default), the nearest relevant site and its details, looked up from the
+cell centre. /generate-reaction reads a cell locally; missing or stale cells
+are refreshed by one background worker, which also sweeps stale cells that
+are still being read, so the request path rarely waits on the provider.
+
+The worker paces its fetches (`fetch_interval_s`) so that precomputing a
+new KC does not spend the outbound budget live requests need.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SiteCell:
+    __slots__ = ("site", "details", "refreshed", "used")
+
+    def __init__(self, site: dict, details: dict, refreshed: float):
+        self.site = site          # {"place_id", "name", "address", "lat", "lng"}
+        self.details = details    # place details (open hours, fee, website)
+        self.refreshed = refreshed
+        self.used = refreshed
+
+
+class SiteMap:
+    def __init__(self, fetch, cell_deg: float = 0.005, ttl_s: float = 3600.0, max_cells: int = 50000,
+                 sweep_s: float = 900.0, fetch_interval_s: float = 0.2):
+        self.fetch = fetch        # fetch(query, lat, lng) -> (site, details) or None
+        self.cell_deg = cell_deg
+        self.ttl_s = ttl_s
+        self.max_cells = max_cells
+        self.sweep_s = sweep_s
+        self.fetch_interval_s = fetch_interval_s
+        self._cells = OrderedDict()   # (query, cell) -> SiteCell, least recently used first
+        self._queue = deque()
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def cell_of(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _centre(self, cell: tuple[int, int]) -> tuple[float, float]:
+        return (cell[0] + 0.5) * self.cell_deg, (cell[1] + 0.5) * self.cell_deg
+
+    def lookup(self, query, lat: float, lng: float) -> SiteCell | None:
+        """The cell covering (lat, lng), or None; stale cells are returned and queued for refresh."""
+        key = (query, self.cell_of(lat, lng))
+        with self._cond:
+            entry = self._cells.get(key)
+            if entry is None:
+                return None
+            self._cells.move_to_end(key)
+            entry.used = time.time()
+            if entry.used - entry.refreshed > self.ttl_s:
+                self._enqueue(key)
+        return entry
+
+    def put(self, query, lat: float, lng: float, site: dict, details: dict) -> None:
+        self._store((query, self.cell_of(lat, lng)), site, details)
+
+    def precompute(self, query, coordinates) -> int:
+        """Queues every missing or stale cell covering `coordinates`; returns how many were queued."""
+        now = time.time()
+        queued = 0
+        with self._cond:
+            for lat, lng in coordinates:
+                key = (query, self.cell_of(lat, lng))
+                entry = self._cells.get(key)
+                if (entry is None or now - entry.refreshed > self.ttl_s) and key not in self._queued:
+                    self._enqueue(key)
+                    queued += 1
+        return queued
+
+    def _store(self, key, site: dict, details: dict) -> None:
+        with self._cond:
+            previous = self._cells.pop(key, None)
+            entry = self._cells[key] = SiteCell(site, details or {}, time.time())
+            if previous is not None:
+                entry.used = previous.used
+            while len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+
+    # ------------------------------ worker ------------------------------ #
+    def _enqueue(self, key) -> None:
+        # Called with self._cond held.
+        if key in self._queued or self._closing:
+            return
+        self._queued.add(key)
+        self._queue.append(key)
+        self._ensure_worker()
+        self._cond.notify()
+
+    def _ensure_worker(self) -> None:
+        # Started lazily and restarted in a forked child (threads do not survive fork).
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="site-map", daemon=True)
+            self._thread.start()
+
+    def _sweep(self) -> None:
+        """Queues stale cells that were read since their last refresh; called with self._cond held."""
+        now = time.time()
+        for key, entry in self._cells.items():
+            if now - entry.refreshed > self.ttl_s and entry.used > entry.refreshed:
+                self._enqueue(key)
+
+    def _run(self) -> None:
+        next_sweep = time.monotonic() + self.sweep_s
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    timeout = next_sweep - time.monotonic()
+                    if timeout <= 0:
+                        self._sweep()
+                        next_sweep = time.monotonic() + self.sweep_s
+                        continue
+                    self._cond.wait(timeout)
+                if self._closing:
+                    return
+                key = self._queue.popleft()
+            query, cell = key
+            try:
+                result = self.fetch(query, *self._centre(cell))
+            except Exception:
+                result = None
+            if result is not None and result[0] is not None:
+                self._store(key, *result)
+            with self._cond:
+                self._queued.discard(key)
+            if self.fetch_interval_s:
+                time.sleep(self.fetch_interval_s)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
@@ -0,0 +1,209 @@
+"""
+Per-KC SOLO-level classifier trained from teacher-approved history.
+
+The model is a multinomial Naive Bayes over hashed unigram/bigram counts.
+Counts are additive, so training is incremental (partial_fit) and a saved
+artifact can be loaded and trained further (warm start).
+
+Artifact layout (little-endian):
+  header   magic, format version, revision, n_features, n_classes, n_kcs
+  labels   n_classes x (u16 length + utf-8)
+  index    n_kcs x (u16 length + utf-8 kc_id + u64 block offset)
+  blocks   per KC, 8-byte aligned float32 array:
+           doc_counts[n_classes] + token_totals[n_classes] + counts[n_classes * n_features]
+
+Blocks are read straight out of a memory map, so loading is O(number of KCs)
+and untouched KCs are never paged in.
+"""
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from textfeatures import hashed_features
+
+MAGIC = b"SOLOMDL\x00"
+FORMAT_VERSION = 1
+SOLO_LEVELS = (
+    "Pre-structural",
+    "Uni-structural",
+    "Multi-structural",
+    "Relational",
+    "Extended abstract",
+)
+DEFAULT_N_FEATURES = 4096
+
+_HEADER = struct.Struct("<8sIIIII")
+_U16 = struct.Struct("<H")
+_U64 = struct.Struct("<Q")
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class SoloModel:
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, classes=SOLO_LEVELS, revision: int = 0):
+        self.n_features = n_features
+        self.classes = tuple(classes)
+        self.revision = revision
+        self._class_idx = {label: i for i, label in enumerate(self.classes)}
+        self._blocks = {}
+        self._mmap = None
+
+    @property
+    def _block_len(self) -> int:
+        k = len(self.classes)
+        return 2 * k + k * self.n_features
+
+    def kc_ids(self) -> list[str]:
+        return list(self._blocks)
+
+    def n_samples(self, kc_id: str) -> int:
+        block = self._blocks.get(kc_id)
+        if block is None:
+            return 0
+        return int(sum(block[: len(self.classes)]))
+
+    # ---------------------------- Training ---------------------------- #
+    def _mutable_block(self, kc_id: str) -> array:
+        block = self._blocks.get(kc_id)
+        if isinstance(block, array):
+            return block
+        if block is None:
+            block = array("f", bytes(4 * self._block_len))
+        else:
+            # Copy-on-write out of the memory map (warm start).
+            block = array("f", block)
+        self._blocks[kc_id] = block
+        return block
+
+    def partial_fit(self, kc_id: str, texts, labels) -> int:
+        """Adds (text, SOLO label) pairs for one KC. Returns how many were used."""
+        k = len(self.classes)
+        block = None
+        used = 0
+        for text, label in zip(texts, labels):
+            c = self._class_idx.get(label)
+            if c is None:
+                continue
+            counts = hashed_features(text, self.n_features)
+            if not counts:
+                continue
+            if block is None:
+                block = self._mutable_block(kc_id)
+            block[c] += 1
+            base = 2 * k + c * self.n_features
+            for f, n in counts.items():
+                block[base + f] += n
+                block[k + c] += n
+            used += 1
+        return used
+
+    # --------------------------- Prediction --------------------------- #
+    def predict(self, kc_id: str, text: str, min_samples: int = 20, alpha: float = 1.0):
+        """
+        Returns (SOLO_level, probability) for the most likely class,
+        or None when the KC has too little training data or the text has no tokens.
+        """
+        block = self._blocks.get(kc_id)
+        if block is None:
+            return None
+        k = len(self.classes)
+        doc_counts = block[:k]
+        total_docs = sum(doc_counts)
+        if total_docs < min_samples:
+            return None
+        counts = hashed_features(text, self.n_features)
+        if not counts:
+            return None
+
+        scores = []
+        for c in range(k):
+            if doc_counts[c] <= 0:
+                scores.append(-math.inf)
+                continue
+            s = math.log(doc_counts[c] / total_docs)
+            denom = math.log(block[k + c] + alpha * self.n_features)
+            base = 2 * k + c * self.n_features
+            for f, n in counts.items():
+                s += n * (math.log(block[base + f] + alpha) - denom)
+            scores.append(s)
+
+        best = max(range(k), key=scores.__getitem__)
+        top = scores[best]
+        z = sum(math.exp(s - top) for s in scores if s != -math.inf)
+        return self.classes[best], 1.0 / z
+
+    # ---------------------------- Artifact ---------------------------- #
+    def save(self, path: str) -> None:
+        """Writes the artifact atomically (tmp file + rename)."""
+        labels = b"".join(_U16.pack(len(b)) + b for b in (c.encode("utf-8") for c in self.classes))
+        kc_keys = [kc.encode("utf-8") for kc in self._blocks]
+        index_len = sum(_U16.size + len(kb) + _U64.size for kb in kc_keys)
+
+        offset = _pad8(_HEADER.size + len(labels) + index_len)
+        block_bytes = 4 * self._block_len
+        index = bytearray()
+        for i, kb in enumerate(kc_keys):
+            index += _U16.pack(len(kb)) + kb + _U64.pack(offset + i * _pad8(block_bytes))
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.revision, self.n_features,
+                                  len(self.classes), len(kc_keys)))
+            fh.write(labels)
+            fh.write(index)
+            fh.write(b"\x00" * (offset - fh.tell()))
+            for block in self._blocks.values():
+                data = array("f", block)
+                if sys.byteorder != "little":
+                    data.byteswap()
+                raw = data.tobytes()
+                fh.write(raw + b"\x00" * (_pad8(block_bytes) - len(raw)))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SoloModel":
+        """Memory-maps an artifact written by save()."""
+        with open(path, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, revision, n_features, n_classes, n_kcs = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            mm.close()
+            raise ValueError(f"{path} is not a SOLO model artifact")
+        if version != FORMAT_VERSION:
+            mm.close()
+            raise ValueError(f"Unsupported SOLO model format version {version}")
+
+        pos = _HEADER.size
+        classes = []
+        for _ in range(n_classes):
+            (n,) = _U16.unpack_from(mm, pos)
+            pos += _U16.size
+            classes.append(mm[pos:pos + n].decode("utf-8"))
+            pos += n
+
+        model = cls(n_features=n_features, classes=classes, revision=revision)
+        block_bytes = 4 * model._block_len
+        view = memoryview(mm)
+        for _ in range(n_kcs):
+            (n,) = _U16.unpack_from(mm, pos)
+            pos += _U16.size
+            kc_id = mm[pos:pos + n].decode("utf-8")
+            pos += n
+            (offset,) = _U64.unpack_from(mm, pos)
+            pos += _U64.size
+            block = view[offset:offset + block_bytes].cast("f")
+            if sys.byteorder != "little":
+                block = array("f", block)
+                block.byteswap()
+            model._blocks[kc_id] = block
+
+        model._mmap = mm
+        return model
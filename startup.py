@@ -0,0 +1,127 @@
+"""
+Worker boot cost: setup phase timings and per-module import cost.
+
+app.py times its expensive setup with `phase(name)` and loads model and
+catalogue assets through `Lazy`, on first use or in warm-up before workers
+are forked (gunicorn.conf.py). Phase timings are exported on /metrics as
+backend_startup_seconds{phase}.
+
+The CLI measures a cold import of a module in a fresh interpreter with
+`python -X importtime` and lists the costliest imports; with --max-ms it exits
+non-zero when the cold start goes over budget, so it can gate CI:
+
+  python startup.py --top 15
+  python startup.py --by-package --max-ms 400
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_phases = {}  # phase -> seconds, in completion order
+
+
+@contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = _phases.get(name, 0.0) + time.perf_counter() - started
+
+
+def phases() -> dict[str, float]:
+    return dict(_phases)
+
+
+class Lazy:
+    """
+    A value built by `load()` on first get(), once per process (thread-safe).
+    load() may return None (asset unavailable); that result is kept too.
+    """
+
+    def __init__(self, name: str, load):
+        self.name = name
+        self._load = load
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                with phase(self.name):
+                    self._value = self._load()
+                self._loaded = True
+        return self._value
+
+
+# ------------------------------ import cost ------------------------------ #
+def measure_imports(module: str, env: dict | None = None) -> tuple[float, list[tuple[str, int, int, int]]]:
+    """
+    Imports `module` in a fresh interpreter. Returns (wall seconds, imports),
+    imports being (name, self us, cumulative us, nesting depth) in import order.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            imports.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+        except ValueError:
+            continue  # the header line
+    return elapsed, imports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold import cost of the app, per module.")
+    parser.add_argument("module", nargs="?", default="app")
+    parser.add_argument("--top", type=int, default=20, help="modules to list (by self time)")
+    parser.add_argument("--by-package", action="store_true", help="sum self time per top-level package")
+    parser.add_argument("--max-ms", type=float, default=0.0, help="fail when the cold start exceeds this")
+    args = parser.parse_args(argv)
+
+    elapsed, imports = measure_imports(args.module)
+    total_us = sum(cumulative for _, _, cumulative, depth in imports if depth == 0)
+    if args.by_package:
+        costs = {}
+        for name, self_us, _, _ in imports:
+            package = name.split(".")[0]
+            costs[package] = costs.get(package, 0) + self_us
+        rows = sorted(costs.items(), key=lambda item: -item[1])[:args.top]
+        print(f"{'self ms':>9}  package")
+        for package, self_us in rows:
+            print(f"{self_us / 1000:9.1f}  {package}")
+    else:
+        rows = sorted(imports, key=lambda row: -row[1])[:args.top]
+        print(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for name, self_us, cumulative_us, _ in rows:
+            print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+    print(f"\n{len(imports)} modules imported in {total_us / 1000:.1f} ms; "
+          f"cold start (interpreter + import {args.module}) {elapsed * 1000:.1f} ms")
+    if args.max_ms and elapsed * 1000 > args.max_ms:
+        print(f"cold start over budget ({args.max_ms:.0f} ms)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Tenant partitions and placement.
+
+Each tenant (a school or class, named by the X-Tenant-ID header) gets its own
+stores and indexes, so one large tenant's data never sits in another tenant's
+lookups. Tenants are placed on nodes (processes or hosts) with a consistent
+hash ring: adding or removing a node only moves the tenants adjacent to it on
+the ring, and a router can compute the same placement with no shared state.
+
+  python tenancy.py --nodes node-a,node-b school-1 school-2   # print placement
+"""
+import argparse
+import bisect
+import re
+import threading
+from collections import OrderedDict
+
+from history_store import HistoryStore
+from similarity import SimilarityIndex
+from textfeatures import hash64
+
+DEFAULT_TENANT = "default"
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def valid_tenant_id(tenant_id: str | None) -> bool:
+    return bool(tenant_id) and _TENANT_RE.match(tenant_id) is not None
+
+
+class HashRing:
+    """Consistent hash ring with `vnodes` points per node."""
+
+    def __init__(self, nodes, vnodes: int = 64):
+        self.nodes = tuple(dict.fromkeys(n for n in nodes if n))
+        if not self.nodes:
+            raise ValueError("HashRing needs at least one node")
+        points = sorted((hash64(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._hashes, hash64(key)) % len(self._hashes)
+        return self._owners[i]
+
+
+class TenantState:
+    """One tenant's partition of every per-tenant store."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.kc_store = {}
+        self.activity_store = {}
+        self.student_history = HistoryStore()
+        self.similarity_index = SimilarityIndex()  # approved responses per KC, fed by /store-history
+        # (student_id, kc_id, learning_activity_id) -> [(content_hash, simhash, record)]
+        self.submission_fingerprints = {}
+        # Idempotency-Key -> (request fingerprint, response body, status) of the first
+        # /store-history that used it; body and status are None while it is in flight
+        self.idempotency_responses = OrderedDict()
+
+
+class TenantRegistry:
+    def __init__(self):
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def get(self, tenant_id: str) -> TenantState | None:
+        return self._tenants.get(tenant_id)
+
+    def get_or_create(self, tenant_id: str) -> TenantState:
+        state = self._tenants.get(tenant_id)
+        if state is None:
+            with self._lock:
+                state = self._tenants.get(tenant_id)
+                if state is None:
+                    state = self._tenants[tenant_id] = TenantState(tenant_id)
+        return state
+
+    def states(self) -> list[TenantState]:
+        return list(self._tenants.values())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Print which node owns each tenant.")
+    parser.add_argument("--nodes", required=True, help="comma-separated node ids (same as TENANT_NODES)")
+    parser.add_argument("tenants", nargs="+")
+    args = parser.parse_args(argv)
+    ring = HashRing(args.nodes.split(","))
+    for tenant_id in args.tenants:
+        print(f"{tenant_id}\t{ring.node_for(tenant_id)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
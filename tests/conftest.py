@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py reads its configuration at import: keep the suite in memory, offline and out of /tmp state.
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update({
+    "WAL_DIR": "",
+    "BLOB_DIR": os.path.join(_scratch, "blobs"),
+    "SHARED_CACHE_PATH": "",
+    "TZ_BOUNDARIES_PATH": "",
+    "TENANT_NODES": "",
+    "WEBHOOK_ALLOWED_HOSTS": "",
+})
+for _name in ("OPENCAGE_API_KEY", "OPENWEATHER_API_KEY", "GOOGLE_API_KEY", "PROFILING_ENABLED", "WAL_OPEN_IN_WORKER"):
+    os.environ.pop(_name, None)
+
+
+@pytest.fixture(scope="session")
+def backend():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
+
+
+@pytest.fixture
+def tenant(request):
+    """A tenant of its own per test, so stored state never leaks between tests."""
+    return {"X-Tenant-ID": f"t-{request.node.name}"[:64].replace("[", "-").replace("]", "")}
+
+
+def history_payload(**overrides) -> dict:
+    payload = dict(
+        approved=True, student_id="s1", kc_id="K1", SOLO_level="Relational",
+        learning_activity_id="A1", learning_activity_title="Activity", target_SOLO_level="Relational",
+        justification="j", misconceptions="", lat=40.4, lng=-3.7, student_response="a first answer",
+    )
+    payload.update(overrides)
+    return payload
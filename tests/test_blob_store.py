@@ -0,0 +1,39 @@
+from blob_store import BlobRef, BlobStore
+from conftest import history_payload
+
+
+def test_identical_texts_are_stored_once_and_survive_reopening(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = store.put("an essay " * 100)
+    assert store.put("an essay " * 100).digest == first.digest
+    size = (tmp_path / "blobs.pack").stat().st_size
+    store.close()
+
+    store = BlobStore(str(tmp_path))
+    assert store.get(first.digest) == "an essay " * 100
+    assert (tmp_path / "blobs.pack").stat().st_size == size
+    store.close()
+
+
+def test_a_second_handle_sees_texts_written_by_another(tmp_path):
+    writer, reader = BlobStore(str(tmp_path)), BlobStore(str(tmp_path))
+    ref = writer.put("written by another worker")
+    assert reader.get(ref.digest) == "written by another worker"
+    writer.close()
+    reader.close()
+
+
+def test_long_responses_are_offloaded_and_served_back(backend, client, tenant):
+    essay = "the water cycle " * 200
+    client.post("/store-history", json=history_payload(student_response=essay), headers=tenant)
+    (record,) = backend.tenants.get(tenant["X-Tenant-ID"]).student_history
+    assert record.student_response.size == len(essay)  # a BlobRef, not the text
+    (served,) = client.get("/get-student-history?student_id=s1", headers=tenant).get_json()["records"]
+    assert served["student_response"] == essay
+
+
+def test_missing_blob_degrades_to_its_reference(tmp_path):
+    store = BlobStore(str(tmp_path))
+    lost = BlobRef(store, b"\x00" * 32, 12)
+    assert lost.__json__() == {"sha256": "00" * 32, "bytes": 12, "missing": True}
+    store.close()
@@ -0,0 +1,48 @@
+from events import EventBus
+
+
+def test_subscribers_only_receive_matching_events():
+    bus = EventBus()
+    subscription, missed = bus.subscribe("t1", kc_id="K1")
+    assert missed == []
+    bus.publish("t1", "kc", "{}", kc_ids=("K2",))
+    bus.publish("t2", "kc", "{}", kc_ids=("K1",))
+    wanted = bus.publish("t1", "kc", "{}", kc_ids=("K1",))
+    assert subscription.next(0.01) is wanted
+    assert subscription.next(0.01) is None
+
+
+def test_slow_subscriber_overflows_instead_of_buffering():
+    bus = EventBus()
+    subscription, _ = bus.subscribe("t1", queue_size=2)
+    for _ in range(3):
+        bus.publish("t1", "history", "{}")
+    assert subscription.overflowed
+    assert subscription.next(0.01) is None
+    bus.publish("t1", "history", "{}")
+    assert subscription.next(0.01) is None
+
+
+def test_reconnect_replays_missed_events_or_asks_for_a_resync():
+    bus = EventBus(replay_size=2)
+    first = bus.publish("t1", "kc", "{}")
+    second = bus.publish("t1", "kc", "{}")
+    third = bus.publish("t1", "kc", "{}")
+    _, missed = bus.subscribe("t1", last_event_id=second.id - 1)
+    assert missed == [second, third]
+    _, missed = bus.subscribe("t1", last_event_id=first.id - 1)
+    assert missed is None
+
+
+def test_subscriber_limit():
+    bus = EventBus(max_subscribers=1)
+    subscription, _ = bus.subscribe("t1")
+    assert bus.subscribe("t1") == (None, None)
+    subscription.close()
+    assert bus.subscribe("t1")[0] is not None
+
+
+def test_stream_is_refused_once_the_subscriber_cap_is_reached(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, "event_bus", EventBus(max_subscribers=0))
+    response = client.get("/events?tenant_id=t1")
+    assert response.status_code == 503
@@ -0,0 +1,47 @@
+import pytest
+
+from gazetteer import Gazetteer, place_key
+
+ROWS = [
+    "# names\tformatted\tlat\tlng\ttimezone\tqualifiers",
+    "Valencia|València\tValencia, Spain\t39.47\t-0.38\tEurope/Madrid\tspain|es|comunitat valenciana",
+    "Valencia\tValencia, Venezuela\t10.16\t-68.0\tAmerica/Caracas\tvenezuela|ve|carabobo",
+    "Donostia|San Sebastián\tDonostia-San Sebastián, Spain\t43.32\t-1.98\tEurope/Madrid\tspain|es",
+    "Hendaye\tHendaye, France\t43.36\t-1.77\tEurope/Paris\tfrance|fr",
+]
+
+
+@pytest.fixture
+def places(tmp_path):
+    path = tmp_path / "gazetteer.tsv"
+    path.write_text("\n".join(ROWS) + "\n", encoding="utf-8")
+    return Gazetteer.load(str(path))
+
+
+def test_place_key():
+    assert place_key("Donostia-San Sebastián") == "donostia san sebastian"
+
+
+def test_unique_names_resolve(places):
+    assert places.lookup("san sebastian").formatted == "Donostia-San Sebastián, Spain"
+    assert places.lookup("Donostia").formatted == "Donostia-San Sebastián, Spain"
+
+
+def test_ambiguous_names_are_left_to_the_geocoder(places):
+    assert places.lookup("Valencia") is None
+    assert places.lookup("València") is None  # accents fold: same key
+    assert places.lookup("Valencia, Venezuela").timezone == "America/Caracas"
+    assert places.lookup("Valencia, Spain").timezone == "Europe/Madrid"
+    assert places.lookup("Valencia, Peru") is None
+    assert places.lookup("Springfield") is None
+
+
+def test_nearest_is_bounded_by_distance(places):
+    assert places.nearest(43.3, -1.95, max_km=10).formatted == "Donostia-San Sebastián, Spain"
+    assert places.nearest(41.0, 2.0, max_km=10) is None
+
+
+def test_timezone_near_needs_every_nearby_place_to_agree(places):
+    assert places.timezone_near(43.3, -2.05, max_km=15) == "Europe/Madrid"
+    assert places.timezone_near(43.34, -1.87, max_km=15) is None  # Donostia and Hendaye disagree
+    assert places.timezone_near(41.0, 2.0, max_km=15) is None
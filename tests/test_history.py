@@ -0,0 +1,79 @@
+import json
+import time
+
+import pytest
+
+from conftest import history_payload
+from history_store import HistoryStore, record_epoch
+
+
+def _store(*epochs, kc_id="K1"):
+    store = HistoryStore()
+    for epoch in epochs:
+        store.append({"student_id": "s1", "kc_id": kc_id, "ts_epoch": epoch})
+    return store
+
+
+def test_windows_are_inclusive_and_ordered_by_epoch():
+    store = _store(100.0, 300.0, 200.0)  # a late arrival is placed by its epoch
+    assert [r.ts_epoch for r in store.for_student("s1")] == [100.0, 200.0, 300.0]
+    assert [r.ts_epoch for r in store.for_student("s1", since=200.0)] == [200.0, 300.0]
+    assert [r.ts_epoch for r in store.for_student("s1", until=200.0)] == [100.0, 200.0]
+    assert store.for_student("s1", kc_id="K2") == []
+    assert store.latest("s1").ts_epoch == 300.0
+
+
+def test_epoch_falls_back_to_the_timestamp_string():
+    assert record_epoch({"timestamp": "2026-01-01T00:00:00+0000"}) == 1767225600.0
+    assert record_epoch({"timestamp": "yesterday"}) == 0.0
+    assert _store().append({"student_id": "s1", "timestamp": "2026-01-01T00:00:00+0000"}).ts_epoch == 1767225600.0
+
+
+def test_since_and_until_accept_epochs_and_iso_timestamps(client, tenant):
+    client.post("/store-history", json=history_payload(), headers=tenant)
+    now = time.time()
+    url = "/get-student-history?student_id=s1"
+    assert len(client.get(f"{url}&since={now - 60:.0f}", headers=tenant).get_json()["records"]) == 1
+    assert client.get(f"{url}&since={now + 60:.0f}", headers=tenant).get_json()["records"] == []
+    assert client.get(f"{url}&until=2000-01-01T00:00:00Z", headers=tenant).get_json()["records"] == []
+    assert client.get(f"{url}&since=last-week", headers=tenant).status_code == 400
+    for value in ("nan", "inf", "-Infinity"):
+        assert client.get(f"{url}&since={value}", headers=tenant).status_code == 400
+        assert client.get(f"{url}&until={value}", headers=tenant).status_code == 400
+
+
+def test_records_are_compact_slot_objects_with_dict_access():
+    first = _store().append(dict(history_payload(), unknown="dropped", kc_id="".join(["K", "1"])))
+    second = _store().append(dict(history_payload(), kc_id="".join(["K", "1"])))
+    assert not hasattr(first, "__dict__")
+    assert first.kc_id is second.kc_id  # interned
+    assert first["student_response"] == first.get("student_response") == "a first answer"
+    assert first.get("unknown") is None and first.to_dict()["approved"] is True
+
+
+def test_include_text_false_replaces_texts_by_their_size(client, tenant):
+    client.post("/store-history", json=history_payload(), headers=tenant)
+    url = "/get-student-history?student_id=s1"
+    (full,) = client.get(url, headers=tenant).get_json()["records"]
+    (compact,) = client.get(f"{url}&include_text=false", headers=tenant).get_json()["records"]
+    assert compact["student_response"] == {"sha256": None, "bytes": len("a first answer")}
+    assert {k: v for k, v in compact.items() if k != "student_response"} == \
+        {k: v for k, v in full.items() if k != "student_response"}
+
+
+def _record_keys(response) -> list:
+    # json.loads keeps the document's key order.
+    lines = response.get_data(as_text=True).splitlines()
+    if response.mimetype == "application/x-ndjson":
+        return [list(json.loads(line)) for line in lines]
+    return [list(record) for record in json.loads(lines[0])["records"]]
+
+
+@pytest.mark.parametrize("json_backend", ["orjson", "stdlib"])
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_include_text_false_keeps_the_key_order(backend, client, tenant, monkeypatch, json_backend, fmt):
+    monkeypatch.setattr(backend.app.json, "backend", json_backend)
+    client.post("/store-history", json=history_payload(), headers=tenant)
+    url = f"/get-student-history?student_id=s1&format={fmt}"
+    full = _record_keys(client.get(url, headers=tenant))
+    assert full and full == _record_keys(client.get(f"{url}&include_text=false", headers=tenant))
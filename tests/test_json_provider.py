@@ -0,0 +1,57 @@
+import json
+from dataclasses import dataclass
+
+import pytest
+from flask import Flask
+
+import json_provider
+from json_provider import FastJSONProvider
+
+
+class _Lazy:
+    def __json__(self):
+        return {"loaded": True}
+
+
+@dataclass
+class _Row:
+    a: int
+    b: str
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def app(request, monkeypatch):
+    if request.param == "orjson" and json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setenv("JSON_BACKEND", request.param)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def test_backends_produce_the_same_documents(app):
+    provider = app.json
+    value = {"b": [1, 2.5, None, True], "a": "ñ", "lazy": _Lazy(), "row": _Row(1, "x")}
+    assert json.loads(provider.dumps(value)) == {
+        "a": "ñ", "b": [1, 2.5, None, True], "lazy": {"loaded": True}, "row": {"a": 1, "b": "x"},
+    }
+    assert provider.loads('{"x": [1, 2]}') == {"x": [1, 2]}
+
+
+def test_values_orjson_refuses_fall_back_to_the_stdlib(app):
+    provider = app.json
+    big = 2 ** 70
+    assert json.loads(provider.dumps({"n": big})) == {"n": big}
+    assert provider.loads(str(big)) == big
+
+
+def test_responses_are_json(app):
+    with app.app_context():
+        response = app.json.response({"ok": True})
+    assert response.mimetype == "application/json"
+    assert json.loads(response.get_data()) == {"ok": True}
+
+
+def test_stdlib_is_forced_by_env(monkeypatch):
+    monkeypatch.setenv("JSON_BACKEND", "stdlib")
+    assert FastJSONProvider(Flask(__name__)).backend == "stdlib"
@@ -0,0 +1,33 @@
+import json
+import logging
+
+from logging_config import JsonFormatter, SamplingFilter, truncate
+
+
+def _record(level=logging.INFO, msg="stored %s", args=("K1",), **extra):
+    record = logging.LogRecord("app", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_truncate_caps_strings_and_containers():
+    assert truncate("x" * 10, 4) == "xxxx...(+6 chars)"
+    out = truncate({"items": list(range(30)), "nested": {"a": {"b": {"c": {"d": 1}}}}}, 50)
+    assert out["items"][-1] == "...(+10 items)" and len(out["items"]) == 21
+    assert out["nested"]["a"]["b"] == "..."
+
+
+def test_formatter_writes_one_json_object_with_fields():
+    line = JsonFormatter(max_field_chars=5).format(_record(fields={"student_id": "abcdefgh", "n": 3}))
+    entry = json.loads(line)
+    assert "\n" not in line
+    assert (entry["level"], entry["logger"], entry["msg"]) == ("INFO", "app", "stored K1")
+    assert entry["student_id"] == "abcde...(+3 chars)" and entry["n"] == 3
+
+
+def test_sampling_keeps_every_warning(monkeypatch):
+    monkeypatch.setattr("random.random", lambda: 0.99)
+    sampler = SamplingFilter(0.1)
+    assert not sampler.filter(_record(logging.INFO))
+    assert sampler.filter(_record(logging.WARNING))
+    assert SamplingFilter(1.0).filter(_record(logging.DEBUG))
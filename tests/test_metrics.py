@@ -0,0 +1,38 @@
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_render_labelled_samples():
+    registry = Registry()
+    counter = registry.register(Counter("hits_total", "Hits.", ("cache",)))
+    counter.inc("geo")
+    counter.inc("geo", amount=2)
+    registry.register(Gauge("size", "Size.", lambda: {("a",): 3}, ("store",)))
+    text = registry.render()
+    assert 'hits_total{cache="geo"} 3' in text
+    assert 'size{store="a"} 3' in text
+    assert "# TYPE hits_total counter" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/x")
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/x"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("c", "C.", ("path",))
+    counter.inc('a"b\n')
+    assert 'c{path="a\\"b\\n"} 1' in counter.render()
+
+
+def test_requests_are_exposed_on_metrics(client, tenant):
+    client.get("/list_kcs", headers=tenant)
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    sample = 'backend_http_request_seconds_count{route="/list_kcs",method="GET",status="200"}'
+    assert sample in response.get_data(as_text=True)
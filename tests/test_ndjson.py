@@ -0,0 +1,35 @@
+import json
+
+from conftest import history_payload
+
+KC = dict(approved=True, aligned_learning_objectives=[], aligned_competencies=[])
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_history_streams_one_record_per_line_newest_first(client, tenant):
+    for text in ("first answer", "second answer"):
+        client.post("/store-history", json=history_payload(student_response=text), headers=tenant)
+
+    response = client.get("/get-student-history?student_id=s1&format=ndjson", headers=tenant)
+    assert response.mimetype == "application/x-ndjson"
+    records = _lines(response)
+    assert [r["student_response"] for r in records] == ["second answer", "first answer"]
+    plain = client.get("/get-student-history?student_id=s1", headers=tenant).get_json()["records"]
+    assert records == plain
+
+
+def test_accept_header_selects_ndjson_for_list_endpoints(client, tenant):
+    for kc_id in ("K1", "K2"):
+        client.post("/submit_kc", json=dict(KC, kc_id=kc_id), headers=tenant)
+    response = client.get("/list_kcs", headers=dict(tenant, Accept="application/x-ndjson"))
+    assert response.mimetype == "application/x-ndjson"
+    assert [kc["kc_id"] for kc in _lines(response)] == ["K1", "K2"]
+    assert client.get("/list_kcs", headers=tenant).get_json()["kcs"] == _lines(response)
+
+
+def test_empty_stream(client, tenant):
+    response = client.get("/list_activities?format=ndjson", headers=tenant)
+    assert response.status_code == 200 and response.get_data() == b""
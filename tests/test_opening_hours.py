@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+from opening_hours import WEEK_MINUTES, is_open, parse_periods
+
+MONDAY = {"periods": [{"open": {"day": 1, "time": "0900"}, "close": {"day": 1, "time": "1700"}}]}
+
+
+def test_parse_periods():
+    assert parse_periods(MONDAY) == [[1 * 1440 + 540, 1 * 1440 + 1020]]
+    assert parse_periods({"periods": [{"open": {"day": 0, "time": "0000"}}]}) == [[0, WEEK_MINUTES]]
+    assert parse_periods({}) is None
+    assert parse_periods({"periods": [{"open": {"day": "x"}}]}) is None
+
+
+def test_is_open():
+    periods = parse_periods(MONDAY)
+    assert is_open(periods, datetime(2024, 1, 1, 10, 0)) is True   # a Monday
+    assert is_open(periods, datetime(2024, 1, 1, 17, 0)) is False
+    assert is_open(periods, datetime(2024, 1, 2, 10, 0)) is False
+    assert is_open(None, datetime(2024, 1, 1, 10, 0)) is None
+
+
+def test_period_past_saturday_wraps():
+    periods = parse_periods({"periods": [{"open": {"day": 6, "time": "2200"}, "close": {"day": 0, "time": "0200"}}]})
+    assert is_open(periods, datetime(2024, 1, 6, 23, 0)) is True   # Saturday night
+    assert is_open(periods, datetime(2024, 1, 7, 1, 0)) is True    # early Sunday
+    assert is_open(periods, datetime(2024, 1, 7, 3, 0)) is False
+
+
+# Monday 2024-07-01 09:30 in Madrid (CEST, UTC+2); the same instant is 08:30 at the winter offset.
+SUMMER_MONDAY = datetime(2024, 7, 1, 7, 30, tzinfo=timezone.utc).timestamp()
+WINTER_DETAILS = {"periods": parse_periods(MONDAY), "utc_offset_minutes": 60}
+
+
+def test_open_status_resolves_the_zone_by_name_across_dst(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_timezone_at", lambda lat, lng: "Europe/Madrid")
+    details = dict(WINTER_DETAILS, fetched_at=SUMMER_MONDAY - 180 * 86400)
+    assert backend._open_status(details, 40.42, -3.70, SUMMER_MONDAY) == "open"
+
+
+def test_open_status_falls_back_to_nearby_gazetteer_zones(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_timezone_at", lambda lat, lng: None)
+    assert backend._open_status(dict(WINTER_DETAILS), 40.42, -3.70, SUMMER_MONDAY) == "open"
+
+
+def test_fixed_offset_is_only_used_while_the_details_are_fresh(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_timezone_at", lambda lat, lng: None)
+    monkeypatch.setattr(backend, "_gazetteer_timezone_near", lambda lat, lng: None)
+    fresh = dict(WINTER_DETAILS, utc_offset_minutes=120, fetched_at=SUMMER_MONDAY - 60)
+    assert backend._open_status(fresh, 0.0, 0.0, SUMMER_MONDAY) == "open"
+    stale = dict(WINTER_DETAILS, fetched_at=SUMMER_MONDAY - 180 * 86400)
+    assert backend._open_status(stale, 0.0, 0.0, SUMMER_MONDAY) == "unknown"
+    assert backend._open_status(dict(WINTER_DETAILS), 0.0, 0.0, SUMMER_MONDAY) == "unknown"
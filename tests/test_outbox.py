@@ -0,0 +1,102 @@
+import threading
+import time
+
+from outbox import Outbox
+
+
+def _outbox(**kwargs):
+    box = Outbox(**kwargs)
+    box.register("w1", "t1", "http://hooks.example/1", cursor=0)
+    return box
+
+
+def _add(box, tenant="t1", lsn=None):
+    seq = box.allocate()
+    box.add(seq, tenant, "s1", {"n": seq}, lsn)
+    return seq
+
+
+def test_pending_follows_the_cursor_and_durability():
+    box = _outbox(batch_size=2)
+    for lsn in (1, 2, 3):
+        _add(box, lsn=lsn)
+    _add(box, tenant="t2")  # no webhook for t2: not retained
+    hook = box.webhook("w1")
+    assert [e.seq for e in box.pending(hook, durable_lsn=1)] == [1]
+    assert [e.seq for e in box.pending(hook, durable_lsn=3)] == [1, 2]
+
+    box.ack("w1", 2)
+    assert hook.cursor == 2
+    assert [e.seq for e in box.pending(hook, durable_lsn=3)] == [3]
+    assert len(box) == 1  # acknowledged events are trimmed
+
+
+def test_new_webhook_starts_after_existing_events():
+    box = _outbox()
+    _add(box)
+    late = box.register("w2", "t1", "http://hooks.example/2")
+    assert box.pending(late, float("inf")) == []
+
+
+def test_dead_letter_moves_the_cursor_past_the_batch():
+    box = _outbox()
+    seq = _add(box)
+    box.dead_letter("w1", seq, [{"n": seq}], "RuntimeError: 500", time.time())
+    hook = box.webhook("w1")
+    assert hook.cursor == seq and list(hook.dead_letters)[0]["events"] == [{"n": seq}]
+    assert box.pending(hook, float("inf")) == []
+
+
+def _run_dispatcher(box, send, commit, until):
+    box.start(send, commit, lambda: float("inf"))
+    deadline = time.monotonic() + 5
+    while not until() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    box.close()
+
+
+def test_exhausted_retries_are_dead_lettered():
+    box = _outbox(max_attempts=2, backoff_s=0.01)
+    _add(box)
+    commits = []
+
+    def send(hook, batch):
+        raise RuntimeError("webhook answered 500")
+
+    def commit(op, data):
+        commits.append(op)
+        box.dead_letter(**data)
+
+    _run_dispatcher(box, send, commit, lambda: commits)
+    assert commits == ["dead_letter"]
+    assert box.webhook("w1").describe()["dead_letters"] == 1
+
+
+def test_dispatcher_survives_a_failing_commit():
+    box = _outbox(backoff_s=0.01)
+    _add(box)
+    sent, commits = [], []
+
+    def commit(op, data):
+        commits.append(op)
+        if len(commits) == 1:
+            raise OSError("WAL unavailable")
+        box.ack(data["webhook_id"], data["through"])
+
+    _run_dispatcher(box, lambda hook, batch: sent.append(len(batch)), commit, lambda: box.webhook("w1").cursor == 1)
+    assert sent == [1, 1]  # the batch is sent again: delivery is at least once
+    assert box.webhook("w1").cursor == 1
+    assert "outbox-dispatcher" not in [t.name for t in threading.enumerate()]
+
+
+def test_webhooks_are_off_until_hosts_are_allowed(backend, client, tenant, monkeypatch):
+    assert client.post("/webhooks", json={"url": "http://127.0.0.1:8080/admin"}, headers=tenant).status_code == 403
+
+    monkeypatch.setattr(backend, "WEBHOOK_ALLOWED_HOSTS", {"hooks.example"})
+    assert client.post("/webhooks", json={"url": "http://127.0.0.1:8080/"}, headers=tenant).status_code == 400
+    response = client.post("/webhooks", json={"url": "https://hooks.example/in"}, headers=tenant)
+    assert response.status_code == 200
+    webhook_id = response.get_json()["webhook"]["webhook_id"]
+    assert [h["webhook_id"] for h in client.get("/webhooks", headers=tenant).get_json()["webhooks"]] == [webhook_id]
+    assert client.delete(f"/webhooks?webhook_id={webhook_id}", headers=tenant).status_code == 200
+    assert client.get("/webhooks", headers=tenant).get_json()["webhooks"] == []
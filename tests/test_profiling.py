@@ -0,0 +1,25 @@
+import threading
+
+from flask import Flask
+
+from profiling import install_profiling
+
+
+def test_profiler_is_stopped_when_a_later_hook_fails(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILING_ENABLED", "1")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    app = Flask(__name__)
+    assert install_profiling(app)
+
+    @app.route("/")
+    def index():
+        return "ok"
+
+    @app.after_request
+    def failing_hook(response):  # runs before the profiling hook (registered later)
+        raise RuntimeError("boom")
+
+    response = app.test_client().get("/?profile=1")
+    assert response.status_code == 500
+    assert "request-profiler" not in [t.name for t in threading.enumerate()]
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,52 @@
+import math
+
+import pytest
+
+from conftest import history_payload
+from ratelimit import BucketMap, TokenBucket, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits("a=5:30, b=0.5") == {"a": (5.0, 30.0), "b": (0.5, 1.0)}
+    assert parse_limits("") == {}
+
+
+@pytest.mark.parametrize("spec", ["a=0", "a=1:0", "a=-2:5"])
+def test_parse_limits_rejects_non_positive_values(spec):
+    with pytest.raises(ValueError):
+        parse_limits(spec)
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait():
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.take()
+    assert 0 < wait <= 0.5 and math.isfinite(wait)
+
+
+def test_bucket_map_scopes_by_key_and_skips_unlimited_names():
+    buckets = BucketMap({"store_history": (1.0, 1.0)})
+    assert buckets.take("store_history", "t1") == 0.0
+    assert buckets.take("store_history", "t1") > 0
+    assert buckets.take("store_history", "t2") == 0.0
+    assert buckets.take("other", "t1") == 0.0
+
+
+def test_spent_tenant_limit_answers_429_for_that_tenant_only(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, "rate_limits", BucketMap({"list_kcs": (0.01, 1.0)}))
+    assert client.get("/list_kcs", headers={"X-Tenant-ID": "busy"}).status_code == 200
+    response = client.get("/list_kcs", headers={"X-Tenant-ID": "busy"})
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+    assert client.get("/list_kcs", headers={"X-Tenant-ID": "quiet"}).status_code == 200
+
+
+def test_spent_geocoding_budget_answers_503_with_retry_after(backend, client, tenant, monkeypatch):
+    monkeypatch.setattr(backend, "OPENCAGE_API_KEY", "test-key")
+    monkeypatch.setattr(backend, "outbound_budgets", BucketMap({"opencage": (0.01, 1.0)}))
+    backend.outbound_budgets.take("opencage")
+
+    payload = history_payload(lat=None, lng=None, location="Somewhere Not In The Gazetteer")
+    response = client.post("/store-history", json=payload, headers=tenant)
+    assert response.status_code == 503
+    assert response.get_json()["reason"] == "budget_exhausted"
+    assert 1 <= int(response.headers["Retry-After"]) <= 3600
@@ -0,0 +1,87 @@
+import pytest
+
+import schemas
+from conftest import history_payload
+from schemas import Field, Schema
+
+
+def test_compiled_validator_applies_defaults_normalization_and_choices():
+    schema = Schema(
+        "sample",
+        Field("name", required=True, type=str, strip=True),
+        Field("kind", default="text", type=str, lower=True, choices=("text", "image")),
+        Field("k", default=5, coerce=int, type_message="k must be an integer"),
+    )
+    assert schema.validate({"name": " x ", "kind": "IMAGE", "k": "3"}) == ({"name": "x", "kind": "image", "k": 3}, [])
+    assert schema.validate({"name": "x"}) == ({"name": "x", "kind": "text", "k": 5}, [])
+
+    _, errors = schema.validate({"kind": "video", "k": "many"})
+    assert [e["field"] for e in errors] == ["name", "kind", "k"]
+
+
+def test_non_object_bodies_are_rejected():
+    for body in (None, [], "x", 3):
+        values, errors = schemas.STORE_HISTORY.validate(body)
+        assert values == {} and errors[0]["message"] == "Request body must be a JSON object"
+
+
+def test_mutable_defaults_are_not_shared():
+    first, _ = schemas.SUBMIT_ACTIVITY.validate({"learning_activity_id": "A"})
+    first["related_kc_ids"].append("K1")
+    second, _ = schemas.SUBMIT_ACTIVITY.validate({"learning_activity_id": "A"})
+    assert second["related_kc_ids"] == []
+
+
+def test_store_history_requires_string_ids_and_responses():
+    base = {
+        "approved": True, "student_id": "s", "kc_id": "K", "SOLO_level": "Relational",
+        "learning_activity_id": "A", "learning_activity_title": "T", "target_SOLO_level": "Relational",
+        "justification": "", "misconceptions": "", "student_response": "r",
+    }
+    assert schemas.STORE_HISTORY.validate(base)[1] == []
+    for field, value in (("student_id", ["x"]), ("kc_id", {"a": 1}), ("student_response", 123)):
+        _, errors = schemas.STORE_HISTORY.validate(dict(base, **{field: value}))
+        assert errors == [{"field": field, "message": f"{field} must be a string"}]
+
+
+def test_any_of():
+    _, errors = schemas.STORE_HISTORY.validate({
+        "approved": True, "student_id": "s", "kc_id": "K", "SOLO_level": "R", "learning_activity_id": "A",
+        "learning_activity_title": "T", "target_SOLO_level": "R", "justification": "", "misconceptions": "",
+    })
+    assert [e["field"] for e in errors] == ["student_response"]
+
+
+def test_store_history_rejects_non_string_fields(client, tenant):
+    for field, value in (("student_id", ["x"]), ("kc_id", {"a": 1}), ("student_response", 123)):
+        response = client.post("/store-history", json=history_payload(**{field: value}), headers=tenant)
+        assert response.status_code == 400
+        assert response.get_json()["error"] == f"{field} must be a string"
+
+
+def test_submit_routes_reject_non_string_ids(client, tenant):
+    kc = {"approved": True, "kc_id": ["a"], "aligned_learning_objectives": [], "aligned_competencies": []}
+    response = client.post("/submit_kc", json=kc, headers=tenant)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "kc_id must be a string"
+    activity = {"learning_activity_id": {"id": 1}}
+    response = client.post("/submit_activity", json=activity, headers=tenant)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "learning_activity_id must be a string"
+    assert client.get("/list_kcs", headers=tenant).get_json() == {"kcs": []}
+
+
+def test_batch_validates_each_item(client, tenant):
+    response = client.post("/analyze-response/batch", json={"items": [
+        {"kc_id": "K1", "student_id": "s1", "student_response": "an answer"}, {"kc_id": "K1"},
+    ]}, headers=tenant)
+    first, second = response.get_json()["results"]
+    assert "errors" not in first and second["errors"][0]["field"] == "student_id"
+    assert client.post("/analyze-response/batch", json=[{"kc_id": "K1"}], headers=tenant).status_code == 400
+
+
+@pytest.mark.parametrize("body", [[1, 2], "text", None])
+def test_json_routes_answer_400_for_non_object_bodies(backend, client, tenant, monkeypatch, body):
+    monkeypatch.setattr(backend, "WEBHOOK_ALLOWED_HOSTS", {"hooks.example"})
+    for path in ("/store-history", "/analyze-response", "/similar-responses", "/generate-reaction", "/webhooks"):
+        assert client.post(path, json=body, headers=tenant).status_code == 400
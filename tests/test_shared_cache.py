@@ -0,0 +1,37 @@
+import time
+
+from shared_cache import MISSING, SharedCache
+
+
+def test_values_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SharedCache(path).set("geocode:madrid", [40.4, -3.7, "Madrid", "Europe/Madrid"], ttl=60)
+    assert SharedCache(path).get("geocode:madrid") == [40.4, -3.7, "Madrid", "Europe/Madrid"]
+
+
+def test_expired_rows_are_never_returned(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("k", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("k") is MISSING
+    assert len(cache) == 0
+
+
+def test_get_or_load_does_not_cache_failed_loads(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    lookups, calls = [], []
+
+    def loader(value):
+        calls.append(value)
+        return value
+
+    assert cache.get_or_load("k", 60, lambda: loader(None), lookups.append) is None
+    assert cache.get_or_load("k", 60, lambda: loader(7), lookups.append) == 7
+    assert cache.get_or_load("k", 60, lambda: loader(8), lookups.append) == 7
+    assert calls == [None, 7] and lookups == [False, False, True]
+
+
+def test_unusable_database_is_a_miss(tmp_path):
+    cache = SharedCache(str(tmp_path / "missing-dir" / "cache.sqlite3"))
+    cache.set("k", 1, ttl=60)
+    assert cache.get("k") is MISSING
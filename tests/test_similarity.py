@@ -0,0 +1,44 @@
+from conftest import history_payload
+from similarity import SimilarityIndex
+
+
+def test_query_ranks_by_similarity_within_the_kc():
+    index = SimilarityIndex()
+    index.add("K1", "evaporation makes clouds and rain falls back to the sea", "close")
+    index.add("K1", "plants turn light into chemical energy", "far")
+    index.add("K2", "evaporation makes clouds and rain falls back to the sea", "other kc")
+
+    matches = index.query("K1", "evaporation makes clouds and then rain falls to the sea", k=5)
+    assert matches[0][1] == "close" and matches[0][0] > 0.5
+    assert "other kc" not in [record for _, record in matches]
+    assert index.query("K3", "anything") == []
+
+
+def test_low_scores_are_not_matches():
+    index = SimilarityIndex()
+    index.add("K1", "zzz qqq", "unrelated")
+    assert index.query("K1", "evaporation makes clouds", min_score=0.1) == []
+
+
+def test_replayed_signature_matches_hashing_the_text():
+    index = SimilarityIndex()
+    signature = index.signature("evaporation makes clouds")
+    replayed = SimilarityIndex()
+    replayed.add("K1", None, "record", signature=signature)
+    assert replayed.query("K1", "evaporation makes clouds")[0] == (1.0, "record")
+
+
+def test_similar_responses_leave_out_unrelated_answers(client, tenant):
+    client.post("/store-history", json=history_payload(
+        student_response="evaporation makes clouds and rain falls back to the sea"), headers=tenant)
+    client.post("/store-history", json=history_payload(student_id="s2", student_response="zzz qqq"), headers=tenant)
+    response = client.post("/similar-responses", json={
+        "kc_id": "K1", "student_response": "rain falls from clouds made by evaporation"}, headers=tenant)
+    assert response.status_code == 200
+    matches = response.get_json()["matches"]
+    assert len(matches) == 1 and matches[0]["similarity"] > 0
+
+
+def test_similar_responses_require_a_text(client, tenant):
+    response = client.post("/similar-responses", json={"kc_id": "K1"}, headers=tenant)
+    assert response.status_code == 400
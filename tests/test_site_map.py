@@ -0,0 +1,61 @@
+import threading
+import time
+
+from site_map import SiteMap
+
+SITE = {"place_id": "p1", "name": "Museum", "address": "Main St", "lat": 40.41, "lng": -3.7}
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_nearby_points_share_a_cell():
+    sites = SiteMap(fetch=None, cell_deg=0.01)
+    sites.put("museum", 40.4012, -3.7034, SITE, {"periods": []})
+    assert sites.lookup("museum", 40.4049, -3.7001).site == SITE
+    assert sites.lookup("museum", 40.42, -3.7034) is None
+    assert sites.lookup("park", 40.4012, -3.7034) is None
+
+
+def test_precompute_fetches_each_missing_cell_once_from_its_centre():
+    calls = []
+
+    def fetch(query, lat, lng):
+        calls.append((query, round(lat, 3), round(lng, 3)))
+        return SITE, {}
+
+    sites = SiteMap(fetch, cell_deg=0.01, fetch_interval_s=0)
+    assert sites.precompute("museum", [(40.401, -3.701), (40.402, -3.702), (40.411, -3.701)]) == 2
+    assert _wait_for(lambda: len(sites) == 2)
+    sites.close()
+    assert sorted(calls) == [("museum", 40.405, -3.705), ("museum", 40.415, -3.705)]
+    assert sites.precompute("museum", [(40.401, -3.701)]) == 0  # fresh
+
+
+def test_stale_cells_are_served_and_refreshed_in_the_background():
+    refreshed = threading.Event()
+
+    def fetch(query, lat, lng):
+        refreshed.set()
+        return dict(SITE, name="Museum (new)"), {}
+
+    sites = SiteMap(fetch, ttl_s=0.01, fetch_interval_s=0)
+    sites.put("museum", 40.4, -3.7, SITE, {})
+    time.sleep(0.02)
+    assert sites.lookup("museum", 40.4, -3.7).site["name"] == "Museum"
+    assert refreshed.wait(5)
+    assert _wait_for(lambda: sites.lookup("museum", 40.4, -3.7).site["name"] == "Museum (new)")
+    sites.close()
+
+
+def test_the_least_recently_used_cells_are_evicted():
+    sites = SiteMap(fetch=None, cell_deg=1.0, max_cells=2)
+    for lat in (1.5, 2.5):
+        sites.put("q", lat, 0.5, SITE, {})
+    sites.lookup("q", 1.5, 0.5)
+    sites.put("q", 3.5, 0.5, SITE, {})
+    assert sites.lookup("q", 2.5, 0.5) is None and sites.lookup("q", 1.5, 0.5) is not None
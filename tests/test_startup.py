@@ -0,0 +1,60 @@
+import os
+import runpy
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_lazy_loads_once_across_threads():
+    calls = []
+    value = startup.Lazy("test_asset", lambda: calls.append(1) or "asset")
+    threads = [threading.Thread(target=value.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert value.get() == "asset" and calls == [1] and value.loaded
+    assert "test_asset" in startup.phases()
+
+
+def test_unavailable_asset_is_remembered():
+    calls = []
+    value = startup.Lazy("missing_asset", lambda: calls.append(1))
+    assert value.get() is None and value.get() is None and calls == [1]
+
+
+def test_gunicorn_config_refuses_several_workers_with_a_wal(monkeypatch, tmp_path):
+    monkeypatch.setenv("WAL_DIR", str(tmp_path))
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with pytest.raises(RuntimeError):
+        runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+
+
+def test_preloaded_master_leaves_the_wal_to_the_worker(tmp_path):
+    script = """
+import app
+assert app.wal is None and not app.outbox.capture()[0]
+app.after_fork()
+assert app.wal is not None
+app.wal.wait(app.wal.append("kc", {"tenant": "t1", "kc": {"kc_id": "K1"}}), timeout=5)
+print("ok")
+"""
+    env = dict(os.environ, WAL_DIR=str(tmp_path / "wal"), WAL_OPEN_IN_WORKER="1", SHARED_CACHE_PATH="")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "ok"
+    assert any(name.endswith(".log") for name in os.listdir(tmp_path / "wal"))
+
+
+def test_lazy_assets_are_not_loaded_at_import():
+    script = "import sys, app; print(app.solo_model.loaded, app.gazetteer.loaded, 'requests' in sys.modules)"
+    env = dict(os.environ, WAL_DIR="", SHARED_CACHE_PATH="")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False False False"
@@ -0,0 +1,33 @@
+from conftest import history_payload
+
+
+def test_identical_resubmission_is_coalesced(client, tenant):
+    assert client.post("/store-history", json=history_payload(), headers=tenant).status_code == 200
+    again = client.post("/store-history", json=history_payload(student_response="A first   answer"), headers=tenant)
+    assert again.status_code == 200 and again.get_json()["status"] == "duplicate"
+    records = client.get("/get-student-history?student_id=s1", headers=tenant).get_json()["records"]
+    assert len(records) == 1
+
+
+def test_lightly_edited_resubmission_is_stored_as_a_near_duplicate(client, tenant):
+    text = "evaporation makes clouds and the rain falls back to the sea every single day"
+    client.post("/store-history", json=history_payload(student_response=text), headers=tenant)
+    client.post("/store-history", json=history_payload(student_response=text + "!"), headers=tenant)
+    records = client.get("/get-student-history?student_id=s1", headers=tenant).get_json()["records"]
+    assert len(records) == 2 and records[0]["near_duplicate"] is True
+
+
+def test_idempotency_key_is_bound_to_the_body(client, tenant):
+    headers = dict(tenant, **{"Idempotency-Key": "key-1"})
+    first = client.post("/store-history", json=history_payload(), headers=headers)
+    assert first.status_code == 200
+    retry = client.post("/store-history", json=history_payload(), headers=headers)
+    assert (retry.status_code, retry.get_json()) == (200, first.get_json())
+    other = client.post("/store-history", json=history_payload(student_response="something else"), headers=headers)
+    assert other.status_code == 422
+
+
+def test_rejected_request_releases_its_idempotency_key(client, tenant):
+    headers = dict(tenant, **{"Idempotency-Key": "key-2"})
+    assert client.post("/store-history", json=history_payload(kc_id=""), headers=headers).status_code == 400
+    assert client.post("/store-history", json=history_payload(), headers=headers).status_code == 200
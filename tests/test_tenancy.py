@@ -0,0 +1,50 @@
+import pytest
+
+from tenancy import HashRing, valid_tenant_id
+
+
+def test_placement_is_stable_and_covers_every_node():
+    ring = HashRing(["a", "b", "c"])
+    placement = {f"school-{i}": ring.node_for(f"school-{i}") for i in range(300)}
+    assert placement == {key: HashRing(["a", "b", "c"]).node_for(key) for key in placement}
+    assert set(placement.values()) == {"a", "b", "c"}
+
+
+def test_adding_a_node_only_moves_tenants_to_it():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    for i in range(300):
+        key = f"school-{i}"
+        assert after.node_for(key) in (before.node_for(key), "d")
+
+
+def test_ring_needs_a_node():
+    with pytest.raises(ValueError):
+        HashRing(["", ""])
+
+
+def test_tenant_ids():
+    assert valid_tenant_id("school-1.a_b")
+    assert not valid_tenant_id("../etc")
+    assert not valid_tenant_id("")
+
+
+def test_tenants_do_not_see_each_others_data(client):
+    kc = dict(approved=True, kc_id="K1", aligned_learning_objectives=[], aligned_competencies=[])
+    client.post("/submit_kc", json=kc, headers={"X-Tenant-ID": "school-a"})
+
+    def kc_ids(tenant_id):
+        return [k["kc_id"] for k in client.get("/list_kcs", headers={"X-Tenant-ID": tenant_id}).get_json()["kcs"]]
+
+    assert kc_ids("school-a") == ["K1"]
+    assert kc_ids("school-b") == []
+    assert client.get("/list_kcs", headers={"X-Tenant-ID": "../etc"}).status_code == 400
+
+
+def test_tenants_placed_on_another_node_are_redirected(backend, client, monkeypatch):
+    ring = HashRing(["node-a", "node-b"])
+    other = next(f"school-{i}" for i in range(100) if ring.node_for(f"school-{i}") == "node-b")
+    monkeypatch.setattr(backend, "tenant_ring", ring)
+    monkeypatch.setattr(backend, "NODE_ID", "node-a")
+    response = client.get("/list_kcs", headers={"X-Tenant-ID": other})
+    assert response.status_code == 421
@@ -0,0 +1,17 @@
+from textfeatures import content_hash, hamming, normalize_text, simhash
+
+
+def test_content_hash_normalizes_and_accepts_non_strings():
+    assert content_hash("Héllo  World", None) == content_hash("hello world", None)
+    assert content_hash(123, ["x"]) == content_hash("123", "['x']")
+
+
+def test_simhash_keeps_near_duplicates_close():
+    a = simhash("the water cycle moves water between the sea and the sky")
+    b = simhash("the water cycle moves water between the sea and the skies")
+    c = simhash("photosynthesis turns light into chemical energy in plants")
+    assert hamming(a, b) < hamming(a, c)
+
+
+def test_normalize_text():
+    assert normalize_text("  Árbol\tGRANDE ") == "arbol grande"
@@ -0,0 +1,72 @@
+import json
+
+import train_solo
+from conftest import history_payload
+from solo_model import SoloModel
+from wal import WriteAheadLog
+
+_ANSWERS = {
+    "Uni-structural": "water evaporates",
+    "Relational": "evaporation condenses into clouds because cooling air holds less vapour so rain returns water",
+}
+
+
+def _records(n, **overrides):
+    for i in range(n):
+        level = "Relational" if i % 2 else "Uni-structural"
+        record = {"approved": True, "kc_id": "K1", "SOLO_level": level, "student_response": _ANSWERS[level]}
+        record.update(overrides)
+        yield record
+
+
+def test_train_uses_only_approved_records_with_text():
+    model = SoloModel(n_features=256)
+    records = list(_records(40)) + [
+        {"approved": False, "kc_id": "K1", "SOLO_level": "Relational", "student_response": "x"},
+        {"approved": True, "kc_id": "K1", "SOLO_level": "Relational"},
+    ]
+    stats = train_solo.train(model, records, chunk_size=16)
+    assert stats == {"seen": 42, "used": 40, "chunks": 3}
+    assert model.n_samples("K1") == 40
+
+
+def test_trained_model_predicts_the_level_of_similar_answers():
+    model = SoloModel(n_features=256)
+    train_solo.train(model, _records(40))
+    level, probability = model.predict("K1", "clouds form because cooling air condenses vapour into rain")
+    assert level == "Relational" and 0.5 < probability <= 1.0
+    assert model.predict("K2", "anything") is None
+
+
+def test_cli_warm_starts_from_a_saved_artifact(tmp_path, capsys):
+    history = tmp_path / "history.jsonl"
+    history.write_text("\n".join(json.dumps(r) for r in _records(30)) + "\n", encoding="utf-8")
+    artifact = str(tmp_path / "solo_model.bin")
+
+    assert train_solo.main([str(history), "--output", artifact, "--features", "256"]) == 0
+    assert train_solo.main([str(history), "--warm-start", artifact, "--output", artifact]) == 0
+    stats = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert stats["revision"] == 2 and stats["kcs"] == {"K1": 60}
+    assert SoloModel.load(artifact).n_samples("K1") == 60
+
+
+def test_cli_trains_from_a_live_write_ahead_log(backend, client, tenant, monkeypatch, tmp_path, capsys):
+    wal = WriteAheadLog(str(tmp_path), group_commit_s=0)
+    monkeypatch.setattr(backend, "wal", wal)
+    long_answer = " ".join([_ANSWERS["Relational"]] * 20)  # offloaded to the blob pack
+    assert len(long_answer) > backend.BLOB_INLINE_MAX_BYTES
+    for i, record in enumerate(_records(6)):
+        answer = long_answer if i == 1 else f"{record['student_response']} {i}"
+        payload = history_payload(student_id=f"s{i}", SOLO_level=record["SOLO_level"], student_response=answer)
+        assert client.post("/store-history", json=payload, headers=tenant).status_code == 200
+    kc = {"approved": True, "kc_id": "K1", "aligned_learning_objectives": [], "aligned_competencies": []}
+    assert client.post("/submit_kc", json=kc, headers=tenant).status_code == 200
+
+    artifact = str(tmp_path / "solo_model.bin")
+    args = ["--from-wal", str(tmp_path), "--blob-dir", backend.BLOB_DIR, "--output", artifact, "--features", "256"]
+    assert train_solo.main(args) == 0  # the server still holds the log's lock
+    stats = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert stats["seen"] == 6 and stats["kcs"] == {"K1": 6}
+    records = list(train_solo._iter_wal(str(tmp_path), backend.BLOB_DIR))
+    assert records[1]["student_response"] == long_answer
+    wal.close()
@@ -0,0 +1,51 @@
+import json
+import zipfile
+
+import pytest
+
+import tz_lookup
+from tz_lookup import TimezoneIndex
+
+SQUARE = [[[-4.0, 40.0], [-3.0, 40.0], [-3.0, 41.0], [-4.0, 41.0], [-4.0, 40.0]]]
+
+
+def test_point_in_polygon_and_none_off_every_polygon():
+    index = TimezoneIndex()
+    index.add("Europe/Madrid", SQUARE)
+    assert index.timezone_at(40.4, -3.7) == "Europe/Madrid"
+    assert index.timezone_at(40.4, -2.5) is None   # no nautical or nearest-zone guess
+    assert index.timezone_at(0.0, -150.0) is None  # open sea
+    assert index.timezone_at(95.0, 0.0) is None
+
+
+def test_holes_are_excluded():
+    index = TimezoneIndex()
+    hole = [[-3.8, 40.3], [-3.6, 40.3], [-3.6, 40.5], [-3.8, 40.5], [-3.8, 40.3]]
+    index.add("Europe/Madrid", SQUARE + [hole])
+    assert index.timezone_at(40.4, -3.7) is None
+    assert index.timezone_at(40.9, -3.1) == "Europe/Madrid"
+
+
+def test_fetch_installs_the_export_from_a_release_zip(tmp_path, capsys):
+    collection = {"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": {"tzid": "Europe/Madrid"},
+        "geometry": {"type": "MultiPolygon", "coordinates": [SQUARE]},
+    }]}
+    release = tmp_path / "timezones.geojson.zip"
+    with zipfile.ZipFile(release, "w") as archive:
+        archive.writestr("combined.json", json.dumps(collection))
+    output = tmp_path / "data" / "timezones.geojson"
+
+    assert tz_lookup.main(["--fetch", "--url", release.as_uri(), "--path", str(output), "40.4", "-3.7"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "Europe/Madrid"
+    assert TimezoneIndex.load(str(output)).timezone_at(40.4, -3.7) == "Europe/Madrid"
+
+
+def test_fetch_keeps_the_previous_export_when_the_download_is_not_geojson(tmp_path):
+    output = tmp_path / "timezones.geojson"
+    output.write_text('{"features": []}')
+    broken = tmp_path / "broken.zip"
+    broken.write_text("not json")
+    with pytest.raises(ValueError):
+        tz_lookup.fetch(broken.as_uri(), str(output))
+    assert output.read_text() == '{"features": []}'
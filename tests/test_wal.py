@@ -0,0 +1,161 @@
+import os
+
+import pytest
+
+from conftest import history_payload
+from wal import WALUnavailable, WriteAheadLog, encode_frame, iter_frames, read_entries
+
+
+def _replay(directory):
+    wal = WriteAheadLog(directory, group_commit_s=0)
+    entries = []
+    wal.replay(lambda op, data: entries.append((op, data)))
+    return wal, entries
+
+
+def test_frames_round_trip_and_stop_at_damage():
+    buf = encode_frame(1, b'{"a":1}') + encode_frame(2, b'{"b":2}')
+    assert [(lsn, bytes(p)) for lsn, p, _ in iter_frames(buf)] == [(1, b'{"a":1}'), (2, b'{"b":2}')]
+    assert [lsn for lsn, _, _ in iter_frames(buf[:-1])] == [1]  # torn tail
+    damaged = bytearray(buf)
+    damaged[-1] ^= 0xFF
+    assert [lsn for lsn, _, _ in iter_frames(bytes(damaged))] == [1]  # crc mismatch
+
+
+def test_replay_restores_entries_and_continues_lsns(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    lsn = [wal.append("kc", {"kc_id": f"K{i}"}) for i in range(3)][-1]
+    wal.wait(lsn, timeout=5)
+    wal.close()
+
+    wal, entries = _replay(str(tmp_path))
+    assert entries == [("kc", {"kc_id": "K0"}), ("kc", {"kc_id": "K1"}), ("kc", {"kc_id": "K2"})]
+    assert wal.append("kc", {"kc_id": "K3"}) == 4
+    wal.close()
+
+
+def test_replay_truncates_a_torn_tail(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    wal.wait(wal.append("kc", {"kc_id": "K0"}), timeout=5)
+    wal.close()
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith(".log")]
+    path = tmp_path / segment
+    intact = path.stat().st_size
+    with open(path, "ab") as fh:
+        fh.write(encode_frame(2, b'{"op":"kc","data":{}}')[:-3])
+
+    wal, entries = _replay(str(tmp_path))
+    assert entries == [("kc", {"kc_id": "K0"})]
+    assert path.stat().st_size == intact
+    wal.close()
+
+
+def test_snapshot_replaces_older_entries(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    wal.wait(wal.append("kc", {"kc_id": "old"}), timeout=5)
+    wal.write_snapshot(wal.last_lsn, [("kc", {"kc_id": "snap"})])
+    wal.wait(wal.append("kc", {"kc_id": "new"}), timeout=5)
+    wal.close()
+
+    wal, entries = _replay(str(tmp_path))
+    assert entries == [("kc", {"kc_id": "snap"}), ("kc", {"kc_id": "new"})]
+    wal.close()
+
+
+def test_second_writer_is_refused(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        WriteAheadLog(str(tmp_path), lock_timeout_s=0.1)
+    wal.close()
+
+
+def test_close_is_idempotent(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    wal.close()
+    wal.close()  # e.g. explicit close, then the atexit hook
+    wal, _ = _replay(str(tmp_path))  # the lock was released
+    wal.close()
+
+
+def test_failed_log_rejects_appends(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    wal._error = OSError("disk full")
+    with pytest.raises(WALUnavailable):
+        wal.append("kc", {})
+    wal.close()
+
+
+def test_failed_wal_answers_503_and_applies_nothing(backend, client, tenant, monkeypatch, tmp_path):
+    failed = WriteAheadLog(str(tmp_path))
+    failed._error = OSError("disk full")
+    monkeypatch.setattr(backend, "wal", failed)
+    kc = dict(approved=True, kc_id="K-wal", aligned_learning_objectives=[], aligned_competencies=[])
+
+    response = client.post("/submit_kc", json=kc, headers=tenant)
+    assert response.status_code == 503 and response.get_json()["status"] == "error"
+    response = client.post("/store-history", json=history_payload(), headers=tenant)
+    assert response.status_code == 503 and "error" in response.get_json()
+    state = backend.tenants.get(tenant["X-Tenant-ID"])
+    assert state is None or "K-wal" not in state.kc_store
+    failed.close()
+
+
+def test_replay_skips_an_entry_it_cannot_apply(backend, tenant, tmp_path):
+    tenant_id = tenant["X-Tenant-ID"]
+    wal, _ = _replay(str(tmp_path))
+    wal.append("kc", {"tenant": tenant_id, "kc": {"kc_id": ["unhashable"]}})
+    wal.wait(wal.append("kc", {"tenant": tenant_id, "kc": {"kc_id": "K-after"}}), timeout=5)
+    wal.close()
+
+    wal = WriteAheadLog(str(tmp_path), group_commit_s=0)
+    assert wal.replay(backend._replay_entry) == 2
+    assert list(backend.tenants.get(tenant_id).kc_store) == ["K-after"]
+    wal.close()
+
+
+def test_refused_append_restores_the_previous_value(backend, client, tenant, monkeypatch, tmp_path):
+    kc = dict(approved=True, kc_id="K-keep", title="first", aligned_learning_objectives=[], aligned_competencies=[])
+    assert client.post("/submit_kc", json=kc, headers=tenant).status_code == 200
+    failed = WriteAheadLog(str(tmp_path))
+    failed._error = OSError("disk full")
+    monkeypatch.setattr(backend, "wal", failed)
+
+    response = client.post("/submit_kc", json=dict(kc, title="second"), headers=tenant)
+    assert response.status_code == 503
+    assert backend.tenants.get(tenant["X-Tenant-ID"]).kc_store["K-keep"]["title"] == "first"
+    failed.close()
+
+
+def test_commit_timeout_answers_503_but_the_change_is_visible(backend, client, tenant, monkeypatch, tmp_path):
+    stalled = WriteAheadLog(str(tmp_path), group_commit_s=0)
+
+    def wait(lsn, timeout=None):
+        raise OSError("WAL commit timed out")
+
+    monkeypatch.setattr(stalled, "wait", wait)
+    monkeypatch.setattr(backend, "wal", stalled)
+    kc = dict(approved=True, kc_id="K-slow", aligned_learning_objectives=[], aligned_competencies=[])
+
+    response = client.post("/submit_kc", json=kc, headers=tenant)
+    assert response.status_code == 503
+    assert "may be lost on restart" in response.get_json()["message"]
+    assert client.get("/get_kc?kc_id=K-slow", headers=tenant).status_code == 200
+    response = client.post("/store-history", json=history_payload(), headers=tenant)
+    assert response.status_code == 503 and "could not be made durable" in response.get_json()["error"]
+    stalled.close()
+
+
+def test_read_entries_is_read_only(tmp_path):
+    wal, _ = _replay(str(tmp_path))
+    wal.wait(wal.append("kc", {"kc_id": "old"}), timeout=5)
+    wal.write_snapshot(wal.last_lsn, [("kc", {"kc_id": "snap"})])
+    wal.wait(wal.append("kc", {"kc_id": "new"}), timeout=5)
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith(".log")]
+    with open(tmp_path / segment, "ab") as fh:
+        fh.write(encode_frame(9, b'{"op":"kc","data":{}}')[:-3])
+    size = (tmp_path / segment).stat().st_size
+
+    # The writer keeps its lock; the torn tail is skipped, not truncated.
+    assert list(read_entries(str(tmp_path))) == [("kc", {"kc_id": "snap"}), ("kc", {"kc_id": "new"})]
+    assert (tmp_path / segment).stat().st_size == size
+    wal.close()
@@ -0,0 +1,106 @@
+"""
+Text normalization and stable hashing helpers shared by the SOLO model,
+the similarity index and duplicate detection.
+
+Hashes are computed with blake2b so they are identical across processes and
+restarts (the builtin hash() is salted per interpreter).
+"""
+import hashlib
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def strip_accents(text: str) -> str:
+    """'Anotación' -> 'Anotacion'. Keeps ñ/ü-style letters comparable across keyboards."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_text(text: str | None) -> str:
+    """Lowercases, strips accents and collapses whitespace."""
+    if not text:
+        return ""
+    return " ".join(strip_accents(text).lower().split())
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Word tokens of the normalized text."""
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def hash64(value: str) -> int:
+    """Stable unsigned 64-bit hash of a string."""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hashed_features(text: str | None, n_features: int) -> dict[int, int]:
+    """
+    Bag of hashed unigrams and bigrams: {bucket: count}.
+    Bucket ids are in [0, n_features).
+    """
+    tokens = tokenize(text)
+    counts: dict[int, int] = {}
+    for i, tok in enumerate(tokens):
+        bucket = hash64(tok) % n_features
+        counts[bucket] = counts.get(bucket, 0) + 1
+        if i:
+            bucket = hash64(f"{tokens[i - 1]} {tok}") % n_features
+            counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+# ------------------------------ MinHash ------------------------------ #
+_MERSENNE_61 = (1 << 61) - 1
+
+
+def char_shingles(text: str | None, n: int = 4) -> set[int]:
+    """Hashed character n-grams of the normalized text."""
+    norm = normalize_text(text)
+    if not norm:
+        return set()
+    if len(norm) <= n:
+        return {hash64(norm)}
+    return {hash64(norm[i:i + n]) for i in range(len(norm) - n + 1)}
+
+
+def minhash_permutations(num_perm: int, seed: int = 1) -> list[tuple[int, int]]:
+    """Deterministic (a, b) pairs for the universal hashes (a*x + b) mod 2^61-1."""
+    perms = []
+    for i in range(num_perm):
+        a = hash64(f"minhash-a:{seed}:{i}") % (_MERSENNE_61 - 1) + 1
+        b = hash64(f"minhash-b:{seed}:{i}") % _MERSENNE_61
+        perms.append((a, b))
+    return perms
+
+
+def minhash_signature(shingles: set[int], perms: list[tuple[int, int]]) -> tuple[int, ...]:
+    """MinHash signature; equal positions estimate Jaccard similarity."""
+    if not shingles:
+        return ()
+    p = _MERSENNE_61
+    return tuple(min((a * h + b) % p for h in shingles) for a, b in perms)
+
+
+# ------------------------------ SimHash ------------------------------ #
+def content_hash(*parts: str | None) -> str:
+    """Exact fingerprint of the normalized text parts (order-sensitive)."""
+    joined = "\x1f".join(normalize_text(p if p is None or isinstance(p, str) else str(p)) for p in parts)
+    return hashlib.blake2b(joined.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(text: str | None) -> int:
+    """64-bit SimHash over character 4-grams; close texts differ in few bits."""
+    shingles = char_shingles(text)
+    if not shingles:
+        return 0
+    weights = [0] * 64
+    for h in shingles:
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
@@ -0,0 +1,136 @@
+"""
+Offline training for the per-KC SOLO-level classifier.
+
+Streams history records in fixed-size chunks, keeps only teacher-approved
+records and updates the model incrementally, so the full history never has to
+fit in memory. Records come from JSONL files (one object per line with the
+/store-history record fields) or straight from the server's write-ahead log
+(--from-wal, read-only; offloaded texts are read from the blob pack).
+
+Usage:
+  python train_solo.py --from-wal $WAL_DIR --output solo_model.bin
+  python train_solo.py history.jsonl [more.jsonl ...] --output solo_model.bin
+  python train_solo.py - --warm-start solo_model.bin --output solo_model.bin < new.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from itertools import chain, islice
+
+from blob_store import BlobStore
+from solo_model import DEFAULT_N_FEATURES, SoloModel
+from wal import read_entries
+
+_TEXT_FIELDS = ("student_response", "student_response_transcription")
+
+
+def _iter_jsonl(paths):
+    for path in paths:
+        fh = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+
+def _iter_wal(directory: str, blob_dir: str):
+    """History records of every tenant in a WAL directory, with offloaded texts resolved."""
+    blobs = None
+    try:
+        for op, data in read_entries(directory):
+            if op != "history":
+                continue
+            record = data["record"]
+            for field in _TEXT_FIELDS:
+                value = record.get(field)
+                if isinstance(value, dict) and "$blob" in value:
+                    if blobs is None and os.path.exists(os.path.join(blob_dir, "blobs.pack")):
+                        blobs = BlobStore(blob_dir)
+                    try:
+                        record[field] = blobs.get(bytes.fromhex(value["$blob"])) if blobs else None
+                    except KeyError:  # blob missing from the pack
+                        record[field] = None
+            yield record
+    finally:
+        if blobs is not None:
+            blobs.close()
+
+
+def _training_text(record: dict) -> str:
+    return " ".join(t for t in (record.get(field) for field in _TEXT_FIELDS) if t)
+
+
+def train(model: SoloModel, records, chunk_size: int = 5000) -> dict:
+    """
+    Fits `model` from an iterable of history records, `chunk_size` records at a time.
+    Returns {"seen": n, "used": n, "chunks": n}.
+    """
+    stats = {"seen": 0, "used": 0, "chunks": 0}
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        stats["chunks"] += 1
+        stats["seen"] += len(chunk)
+
+        by_kc = defaultdict(lambda: ([], []))
+        for r in chunk:
+            if r.get("approved") is not True or not r.get("kc_id"):
+                continue
+            text = _training_text(r)
+            if not text:
+                continue
+            texts, labels = by_kc[r["kc_id"]]
+            texts.append(text)
+            labels.append(r.get("SOLO_level"))
+
+        for kc_id, (texts, labels) in by_kc.items():
+            stats["used"] += model.partial_fit(kc_id, texts, labels)
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Train the per-KC SOLO-level classifier.")
+    parser.add_argument("inputs", nargs="*", help="JSONL history files ('-' for stdin)")
+    parser.add_argument("--from-wal", metavar="DIR", help="read history from a WAL directory (WAL_DIR)")
+    parser.add_argument("--blob-dir", help="blob pack of the WAL's offloaded texts (default: DIR/blobs)")
+    parser.add_argument("--output", default="solo_model.bin", help="artifact path to write")
+    parser.add_argument("--warm-start", help="existing artifact to continue training from")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--features", type=int, default=DEFAULT_N_FEATURES,
+                        help="hashed feature buckets (ignored with --warm-start)")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.from_wal:
+        parser.error("pass JSONL files and/or --from-wal DIR")
+
+    if args.warm_start:
+        model = SoloModel.load(args.warm_start)
+    else:
+        model = SoloModel(n_features=args.features)
+    model.revision += 1
+
+    records = _iter_jsonl(args.inputs)
+    if args.from_wal:
+        blob_dir = args.blob_dir or os.path.join(args.from_wal, "blobs")
+        records = chain(_iter_wal(args.from_wal, blob_dir), records)
+    stats = train(model, records, chunk_size=args.chunk_size)
+    model.save(args.output)
+
+    stats.update({
+        "output": args.output,
+        "revision": model.revision,
+        "kcs": {kc: model.n_samples(kc) for kc in model.kc_ids()},
+    })
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
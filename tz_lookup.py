@@ -0,0 +1,156 @@
+"""
+Offline coordinate -> IANA timezone lookup.
+
+Boundaries are read once from a GeoJSON FeatureCollection whose features carry
+`properties.tzid`: the combined export published by timezone-boundary-builder
+(https://github.com/evansiroky/timezone-boundary-builder/releases). The export
+is too large to keep in the repository; fetch it once per deployment:
+
+  python tz_lookup.py --fetch                  # -> data/timezones.geojson
+  python tz_lookup.py --fetch --release 2024b
+  python tz_lookup.py 40.4168 -3.7038          # check a lookup
+
+Approximate borders put border towns in the wrong zone, so without the export
+callers use provider data or UTC instead. Polygons are bucketed into a
+1-degree grid at load time, so a lookup is one dict access plus a few
+point-in-polygon tests; rings are kept as flat arrays of doubles.
+
+Features are tested in file order; put small zones before the larger zones
+they overlap. Points outside every polygon (e.g. at sea) have no zone: the
+lookup returns None rather than guessing.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import urllib.request
+import zipfile
+from array import array
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "timezones.geojson")
+DEFAULT_RELEASE = "2024b"
+# Land-only export: points at sea have no zone rather than an Etc/GMT offset.
+RELEASE_URL = "https://github.com/evansiroky/timezone-boundary-builder/releases/download/{release}/timezones.geojson.zip"
+
+
+def _point_in_polygon(x: float, y: float, rings) -> bool:
+    """Even-odd ray casting over every ring (flat x, y arrays), so holes are excluded."""
+    inside = False
+    for ring in rings:
+        n = len(ring)
+        xj, yj = ring[n - 2], ring[n - 1]
+        for i in range(0, n, 2):
+            xi, yi = ring[i], ring[i + 1]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            xj, yj = xi, yi
+    return inside
+
+
+class TimezoneIndex:
+    def __init__(self, cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self._polygons = []   # (tzid, (min_lng, min_lat, max_lng, max_lat), rings)
+        self._grid = {}       # (cell_x, cell_y) -> [polygon index], in file order
+
+    @classmethod
+    def load(cls, path: str, cell_degrees: float = 1.0) -> "TimezoneIndex":
+        with open(path, "r", encoding="utf-8") as fh:
+            collection = json.load(fh)
+        index = cls(cell_degrees)
+        for feature in collection.get("features", []):
+            tzid = (feature.get("properties") or {}).get("tzid")
+            geometry = feature.get("geometry") or {}
+            if not tzid:
+                continue
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            for rings in polygons:
+                index.add(tzid, rings)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._polygons)
+
+    def _cell(self, lng: float, lat: float) -> tuple:
+        return math.floor(lng / self.cell_degrees), math.floor(lat / self.cell_degrees)
+
+    def add(self, tzid: str, rings) -> None:
+        rings = [array("d", (float(c) for p in ring for c in p[:2])) for ring in rings]
+        xs, ys = rings[0][0::2], rings[0][1::2]
+        bbox = (min(xs), min(ys), max(xs), max(ys))
+        pos = len(self._polygons)
+        self._polygons.append((tzid, bbox, rings))
+        x0, y0 = self._cell(bbox[0], bbox[1])
+        x1, y1 = self._cell(bbox[2], bbox[3])
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self._grid.setdefault((cx, cy), []).append(pos)
+
+    def lookup(self, lat: float, lng: float) -> str | None:
+        """IANA zone of the first polygon containing the point, or None."""
+        for pos in self._grid.get(self._cell(lng, lat), ()):
+            tzid, (min_lng, min_lat, max_lng, max_lat), rings = self._polygons[pos]
+            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat and _point_in_polygon(lng, lat, rings):
+                return tzid
+        return None
+
+    def timezone_at(self, lat: float, lng: float) -> str | None:
+        """Zone of the polygon containing the point; None off every polygon or out of range."""
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            return None
+        return self.lookup(lat, lng)
+
+
+def fetch(url: str, output: str) -> int:
+    """Downloads a boundary export (.zip or plain GeoJSON) to `output`; returns its size in bytes."""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output))) as tmp:
+        download = os.path.join(tmp, "download")
+        with urllib.request.urlopen(url, timeout=60) as response, open(download, "wb") as fh:
+            shutil.copyfileobj(response, fh, 1 << 20)
+        partial = os.path.join(tmp, "timezones.geojson")
+        if zipfile.is_zipfile(download):
+            with zipfile.ZipFile(download) as archive:
+                members = [name for name in archive.namelist() if name.endswith((".json", ".geojson"))]
+                if not members:
+                    raise ValueError(f"{url} has no GeoJSON member")
+                with archive.open(members[0]) as src, open(partial, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+        else:
+            os.replace(download, partial)
+        TimezoneIndex.load(partial)  # refuse to install an export that does not load
+        os.replace(partial, output)
+    return os.path.getsize(output)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fetch timezone boundaries or look up a coordinate.")
+    parser.add_argument("--fetch", action="store_true", help="download a timezone-boundary-builder release")
+    parser.add_argument("--release", default=DEFAULT_RELEASE)
+    parser.add_argument("--url", help="export to download instead of the release asset")
+    parser.add_argument("--path", default=os.getenv("TZ_BOUNDARIES_PATH") or DEFAULT_PATH)
+    parser.add_argument("coordinates", nargs="*", type=float, metavar="LAT LNG")
+    args = parser.parse_args(argv)
+    if not args.fetch and len(args.coordinates) != 2:
+        parser.error("pass --fetch, or LAT LNG to look up")
+
+    if args.fetch:
+        url = args.url or RELEASE_URL.format(release=args.release)
+        size = fetch(url, args.path)
+        print(f"{args.path}: {size} bytes from {url}")
+    if len(args.coordinates) == 2:
+        lat, lng = args.coordinates
+        print(TimezoneIndex.load(args.path).timezone_at(lat, lng) or "-")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Write-ahead log with group commit and compact snapshots.
+
+Every state change is appended as a framed entry before the request is
+answered. Entries from concurrent requests are batched by one flusher thread
+and made durable with a single fsync per batch (group commit), so the fsync
+cost is shared instead of paid per request.
+
+Frame layout (little-endian): uint32 payload length | uint32 crc32 | uint64 lsn | payload.
+The CRC covers the lsn and payload; replay stops at the first torn or corrupt
+frame, and the active segment is truncated there before new appends.
+
+Files in the log directory:
+  wal-<first lsn>.log        log segments, rotated by size
+  snapshot-<lsn>.snap        full state as of <lsn>, same framing, written
+                             atomically (tmp + fsync + rename)
+  wal.lock                   flock held by the single writing process
+
+Startup memory-maps the newest snapshot, replays it, then replays only log
+entries with a higher lsn. Segments entirely covered by a snapshot are deleted.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_FRAME = struct.Struct("<IIQ")
+_LSN = struct.Struct("<Q")
+_SNAPSHOT_MAGIC = b"WALSNAP1"
+
+
+class WALUnavailable(OSError):
+    """The log failed earlier (e.g. disk full); no further entries are accepted."""
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(buf: bytes):
+    if orjson is not None:
+        return orjson.loads(buf)
+    return json.loads(buf)
+
+
+def encode_frame(lsn: int, payload: bytes) -> bytes:
+    crc = zlib.crc32(payload, zlib.crc32(_LSN.pack(lsn)))
+    return _FRAME.pack(len(payload), crc, lsn) + payload
+
+
+def iter_frames(buf, start: int = 0):
+    """Yields (lsn, payload bytes, end offset) for each intact frame from `start`."""
+    pos, end = start, len(buf)
+    while pos + _FRAME.size <= end:
+        length, crc, lsn = _FRAME.unpack_from(buf, pos)
+        body = pos + _FRAME.size
+        if body + length > end:
+            return
+        payload = buf[body:body + length]
+        if zlib.crc32(payload, zlib.crc32(_LSN.pack(lsn))) != crc:
+            return
+        pos = body + length
+        yield lsn, payload, pos
+
+
+def _numbered(directory: str, prefix: str, suffix: str) -> list[tuple[int, str]]:
+    out = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            try:
+                out.append((int(name[len(prefix):-len(suffix)]), os.path.join(directory, name)))
+            except ValueError:
+                continue
+    return sorted(out)
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_entries(directory: str):
+    """
+    Yields (op, data) from the newest snapshot and the log after it, read-only:
+    no lock is taken and a torn tail is skipped rather than truncated, so the
+    log of a running server can be read (e.g. by train_solo.py --from-wal).
+    """
+    snapshot_lsn = 0
+    snapshots = _numbered(directory, "snapshot-", ".snap")
+    if snapshots:
+        snapshot_lsn, path = snapshots[-1]
+        for _, entry in _read_frames(path, len(_SNAPSHOT_MAGIC)):
+            yield entry["op"], entry["data"]
+    for _, path in _numbered(directory, "wal-", ".log"):
+        for lsn, entry in _read_frames(path):
+            if lsn > snapshot_lsn:
+                yield entry["op"], entry["data"]
+
+
+def _read_frames(path: str, start: int = 0):
+    try:
+        fh = open(path, "rb")
+    except FileNotFoundError:
+        raise RuntimeError(f"{path} was compacted into a newer snapshot while reading; read again") from None
+    with fh:
+        size = os.fstat(fh.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ) as data:
+            if start and data[:start] != _SNAPSHOT_MAGIC:
+                raise RuntimeError(f"{path} is not a WAL snapshot")
+            for lsn, payload, _ in iter_frames(data, start):
+                yield lsn, _loads(payload)
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, group_commit_s: float = 0.002,
+                 segment_bytes: int = 64 * 1024 * 1024, before_sync=None, lock_timeout_s: float = 0.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.group_commit_s = group_commit_s
+        self.segment_bytes = segment_bytes
+        self.before_sync = before_sync     # e.g. flush a blob pack the entries refer to
+        self._lock_fd = os.open(os.path.join(directory, "wal.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + lock_timeout_s
+        while True:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(self._lock_fd)
+                    raise RuntimeError(f"WAL directory {directory} is in use by another process") from None
+                time.sleep(0.05)
+
+        self._cond = threading.Condition()
+        self._pending = []          # [(lsn, frame bytes)]
+        self._next_lsn = 1
+        self._durable_lsn = 0
+        self._snapshot_lsn = 0
+        self._error = None
+        self._closing = False
+        self._fd = None
+        self._segment_size = 0
+        self._thread = None
+        self._pid = None
+
+    # ----------------------------- startup ----------------------------- #
+    def replay(self, apply) -> int:
+        """Calls apply(op, data) for the snapshot and log tail; returns the number of entries applied."""
+        applied = 0
+        snapshots = _numbered(self.directory, "snapshot-", ".snap")
+        if snapshots:
+            self._snapshot_lsn, path = snapshots[-1]
+            applied += self._replay_snapshot(path, apply)
+
+        segments = _numbered(self.directory, "wal-", ".log")
+        last_lsn = self._snapshot_lsn
+        for i, (_, path) in enumerate(segments):
+            with open(path, "rb") as fh:
+                size = os.fstat(fh.fileno()).st_size
+                data = mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+            good_end = 0
+            for lsn, payload, good_end in iter_frames(data):
+                if lsn > last_lsn:
+                    entry = _loads(payload)
+                    apply(entry["op"], entry["data"])
+                    applied += 1
+                    last_lsn = lsn
+            if isinstance(data, mmap.mmap):
+                data.close()
+            if good_end < size:
+                if i != len(segments) - 1:
+                    raise RuntimeError(f"WAL segment {path} is corrupt before the last segment")
+                with open(path, "r+b") as fh:
+                    fh.truncate(good_end)
+
+        self._durable_lsn = last_lsn
+        self._next_lsn = last_lsn + 1
+        if segments:
+            self._open_segment(segments[-1][1])
+        return applied
+
+    def _replay_snapshot(self, path: str, apply) -> int:
+        applied = 0
+        with open(path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            with mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ) as data:
+                if data[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC:
+                    raise RuntimeError(f"{path} is not a WAL snapshot")
+                for _, payload, _ in iter_frames(data, len(_SNAPSHOT_MAGIC)):
+                    entry = _loads(payload)
+                    apply(entry["op"], entry["data"])
+                    applied += 1
+        return applied
+
+    def _open_segment(self, path: str) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_size = os.fstat(self._fd).st_size
+
+    # ----------------------------- appends ----------------------------- #
+    @property
+    def last_lsn(self) -> int:
+        return self._next_lsn - 1
+
+    @property
+    def durable_lsn(self) -> int:
+        """Highest lsn known to be on disk."""
+        return self._durable_lsn
+
+    @property
+    def entries_since_snapshot(self) -> int:
+        return self.last_lsn - self._snapshot_lsn
+
+    def append(self, op: str, data) -> int:
+        """
+        Queues an entry and returns its lsn without waiting for disk.
+        Call it inside the same lock that applies the change (so log order is
+        apply order), then wait(lsn) after releasing that lock.
+        """
+        payload = _dumps({"op": op, "data": data})
+        with self._cond:
+            if self._error is not None:
+                raise WALUnavailable(f"WAL unavailable: {self._error}")
+            self._ensure_flusher()
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._pending.append((lsn, encode_frame(lsn, payload)))
+            self._cond.notify_all()
+        return lsn
+
+    def wait(self, lsn: int, timeout: float | None = None) -> None:
+        """Blocks until `lsn` is on disk; raises OSError if the log failed or timed out."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._durable_lsn < lsn:
+                if self._error is not None:
+                    raise OSError(f"WAL write failed: {self._error}")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise OSError("WAL commit timed out")
+                self._cond.wait(remaining)
+
+    def _ensure_flusher(self) -> None:
+        # Started lazily and restarted in a forked child (threads do not survive fork).
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            if self.group_commit_s:
+                time.sleep(self.group_commit_s)  # let concurrent requests join this batch
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._durable_lsn = batch[-1][0]
+                self._cond.notify_all()
+
+    def _write_batch(self, batch) -> None:
+        if self._fd is None or self._segment_size >= self.segment_bytes:
+            self._open_segment(os.path.join(self.directory, f"wal-{batch[0][0]:020d}.log"))
+            _fsync_dir(self.directory)
+        data = b"".join(frame for _, frame in batch)
+        os.write(self._fd, data)
+        self._segment_size += len(data)
+        if self.before_sync is not None:
+            self.before_sync()
+        os.fsync(self._fd)
+
+    # ----------------------------- snapshots ----------------------------- #
+    def write_snapshot(self, lsn: int, entries) -> str:
+        """
+        Writes `entries` [(op, data)] as the full state at `lsn`, then removes
+        older snapshots and log segments whose entries are all <= lsn.
+        """
+        path = os.path.join(self.directory, f"snapshot-{lsn:020d}.snap")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(_SNAPSHOT_MAGIC)
+            for seq, (op, data) in enumerate(entries, 1):
+                fh.write(encode_frame(seq, _dumps({"op": op, "data": data})))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.directory)
+        self._snapshot_lsn = max(self._snapshot_lsn, lsn)
+
+        for snap_lsn, old in _numbered(self.directory, "snapshot-", ".snap"):
+            if snap_lsn < lsn:
+                os.remove(old)
+        segments = _numbered(self.directory, "wal-", ".log")
+        for (first, old), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= lsn:
+                os.remove(old)
+        return path
+
+    def close(self) -> None:
+        """Flushes pending entries and releases the lock; safe to call more than once."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None